@@ -1,10 +1,20 @@
 from django.contrib import admin
 from .models import Campaign, Application, UserProfile, Content 
-from . models import Plan
+from . models import Plan, Payment
+from .models import CampaignDailyStats, CreatorDailyStats, ViewBucket, ViewEvent
 
 # Register your models here.
-admin.site.register(Campaign)
+@admin.register(Campaign)
+class CampaignAdmin(admin.ModelAdmin):
+    # The spend ledger is moved with F() updates; Campaign.save() never writes it
+    readonly_fields = ('spent', 'remaining')
+
 admin.site.register(Application)
 admin.site.register(UserProfile)
 admin.site.register(Content) 
-admin.site.register(Plan) 
\ No newline at end of file
+admin.site.register(Plan)
+admin.site.register(Payment)
+admin.site.register(CampaignDailyStats)
+admin.site.register(CreatorDailyStats)
+admin.site.register(ViewEvent)
+admin.site.register(ViewBucket)
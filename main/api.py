@@ -0,0 +1,110 @@
+"""Read-only JSON for public campaigns, with validators cheap enough to check on every poll
+
+The list's validator is an ETag over one aggregate: the newest updated_at of any campaign plus
+the number of listed campaigns. Any edit bumps updated_at, including the ones that take a
+campaign out of the list, and the count catches deletions. The list sends no Last-Modified,
+since deleting its newest campaign moves no date forward. A detail's validators are its row's
+updated_at. Views answer If-None-Match / If-Modified-Since through django's condition
+decorator, so an unchanged poll costs that one query and returns an empty 304.
+
+Only columns of the campaign row are served, so updated_at alone says when a body changes.
+"""
+import hashlib
+
+from django.db.models import Count, Max, Q, Subquery
+
+from . import rates
+from .models import Campaign
+
+
+# API field: (campaign column, conversion applied to its value)
+CAMPAIGN_FIELDS = {
+    'id': ('id', None),
+    'title': ('title', None),
+    'description': ('description', None),
+    'requirements': ('requirements', None),
+    'status': ('status', None),
+    'budget': ('budget', None),
+    'cpm': ('cpm_paisa', rates.to_rupees),
+    'spent': ('spent', None),
+    'remaining': ('remaining', None),
+    'created_at': ('created_at', None),
+    'updated_at': ('updated_at', None),
+}
+
+
+# The campaigns the list serves, as on the campaigns page
+LISTED = Q(is_public=True, status='active')
+
+
+def selected_fields(request):
+    """The API fields asked for with ?fields=a,b (all by default), always including id
+
+    Raises ValueError naming the first unknown field.
+    """
+    requested = [name.strip() for name in request.GET.get('fields', '').split(',') if name.strip()]
+    for name in requested:
+        if name not in CAMPAIGN_FIELDS:
+            raise ValueError(f'Unknown field: {name}')
+    if not requested:
+        return list(CAMPAIGN_FIELDS)
+    return ['id'] + [name for name in dict.fromkeys(requested) if name != 'id']
+
+
+def columns(fields):
+    """Campaign columns to load for fields; created_at and updated_at are always needed"""
+    return list(dict.fromkeys([CAMPAIGN_FIELDS[name][0] for name in fields] + ['created_at', 'updated_at']))
+
+
+def serialize(campaign, fields):
+    data = {}
+    for name in fields:
+        column, convert = CAMPAIGN_FIELDS[name]
+        value = getattr(campaign, column)
+        data[name] = convert(value) if convert else value
+    return data
+
+
+def _etag(*parts):
+    return hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def list_etag(request):
+    """ETag for the campaign list, from one aggregate query
+
+    The query string is part of the ETag, since fields, cursor and search each change the body.
+    """
+    # Both come from indexes: the listed count from a covering partial index, and the
+    # newest edit from the updated_at index, through a subquery that runs once
+    newest = Campaign.objects.order_by('-updated_at').values('updated_at')[:1]
+    state = Campaign.objects.filter(LISTED).aggregate(
+        last_modified=Max(Subquery(newest)),
+        count=Count('pk'),
+    )
+    return _etag('list', state['count'], state['last_modified'], request.META.get('QUERY_STRING', ''))
+
+
+def detail_campaign(request, campaign_id):
+    """The public campaign with the requested columns, loaded once per request; None if missing
+
+    A field list naming an unknown field loads every column; the view answers it with a 400.
+    """
+    if not hasattr(request, '_api_campaign'):
+        try:
+            fields = selected_fields(request)
+        except ValueError:
+            fields = list(CAMPAIGN_FIELDS)
+        request._api_campaign = Campaign.objects.filter(pk=campaign_id, is_public=True).only(*columns(fields)).first()
+    return request._api_campaign
+
+
+def detail_etag(request, campaign_id):
+    campaign = detail_campaign(request, campaign_id)
+    if campaign is None:
+        return None
+    return _etag('detail', campaign.pk, campaign.updated_at, request.GET.get('fields', ''))
+
+
+def detail_last_modified(request, campaign_id):
+    campaign = detail_campaign(request, campaign_id)
+    return campaign.updated_at if campaign else None
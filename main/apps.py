@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class MainConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'main'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_migrate
+        from neptok.db import apply_sqlite_pragmas
+        from . import signals  # noqa: F401
+        from .metrics import install_query_timer
+        from .search import restore_index_triggers
+        
+        connection_created.connect(apply_sqlite_pragmas)
+        # After the pragmas, so they aren't counted as the first request's queries
+        connection_created.connect(install_query_timer)
+        post_migrate.connect(restore_index_triggers, sender=self)
@@ -0,0 +1,197 @@
+"""Static asset build: inline CSS and JS moved out of the templates into hashed, precompressed files
+
+build_templates() copies every template that carries inline <style> or <script> blocks into
+ASSET_BUILD_DIR/templates with each block swapped for a <link> or <script src> to a file
+under ASSET_BUILD_DIR/static. Blocks holding template syntax are rendered per request, so
+they stay inline. collectstatic with PrecompressedManifestStaticFilesStorage then gives the
+files content-hashed names and .gz/.br copies, which StaticAssetsMiddleware serves with
+far-future cache headers. USE_BUILT_ASSETS switches the site over to the built templates.
+"""
+import gzip
+import re
+import shutil
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.staticfiles.finders import BaseFinder
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.contrib.staticfiles.utils import get_files
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+INLINE_BLOCK = re.compile(r'<(style|script)(\s[^>]*)?>(.*?)</\1\s*>', re.S | re.I)
+EXTENDS_TAG = re.compile(r'{%\s*extends\s+["\']([^"\']+)["\']\s*%}')
+TEMPLATE_SYNTAX = ('{{', '{%', '{#')
+# Script types that hold data rather than code, and must stay in the page
+DATA_SCRIPT_TYPES = re.compile(r'\btype\s*=\s*["\']?(?!text/javascript|module)[\w/+.-]+', re.I)
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.json', '.map', '.svg', '.txt', '.xml', '.html'}
+# Compressed copies that don't save at least this fraction are not worth the extra file
+MIN_COMPRESSION_SAVING = 0.05
+# Suffix of each precompressed copy, in order of preference when serving
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def build_dir():
+    return Path(getattr(settings, 'ASSET_BUILD_DIR', Path(settings.BASE_DIR) / 'build'))
+
+
+class Extraction:
+    """One inline block moved to a static file"""
+
+    def __init__(self, kind, path, inline_bytes, attributes):
+        self.kind = kind
+        self.path = path
+        self.inline_bytes = inline_bytes
+        self.attributes = attributes
+
+    def tag(self, url):
+        if self.kind == 'style':
+            return f'<link rel="stylesheet" href="{url}">'
+        return f'<script src="{url}"{self.attributes}></script>'
+
+
+class BuiltTemplate:
+    """A template rewritten by build_templates(), with the blocks taken out of it"""
+
+    def __init__(self, name, source_bytes, parent, extractions):
+        self.name = name
+        self.source_bytes = source_bytes
+        self.parent = parent
+        self.extractions = extractions
+
+    def saved_bytes(self, url):
+        """Bytes this template no longer renders, given url(path) for the extracted files"""
+        return sum(
+            extraction.inline_bytes - len(extraction.tag(url(extraction.path)).encode())
+            for extraction in self.extractions
+        )
+
+
+def template_sources():
+    """(template name, path) for every template shipped with the main app"""
+    root = Path(apps.get_app_config('main').path) / 'templates'
+    for path in sorted(root.rglob('*.html')):
+        yield path.relative_to(root).as_posix(), path
+
+
+def _extractable(kind, attributes, body):
+    if not body.strip() or any(marker in body for marker in TEMPLATE_SYNTAX):
+        return False
+    if kind == 'script':
+        return 'src' not in re.findall(r'([\w-]+)\s*=', attributes.lower()) and not DATA_SCRIPT_TYPES.search(attributes)
+    return not attributes.strip()
+
+
+def rewrite(name, source):
+    """(built source, [(Extraction, file contents)]) for one template"""
+    counts = {'style': 0, 'script': 0}
+    extracted = []
+
+    def replace(match):
+        kind, attributes, body = match.group(1).lower(), match.group(2) or '', match.group(3)
+        if not _extractable(kind, attributes, body):
+            return match.group(0)
+        counts[kind] += 1
+        suffix = '' if counts[kind] == 1 else f'-{counts[kind]}'
+        path = f'build/{name.rsplit(".", 1)[0]}{suffix}.{"css" if kind == "style" else "js"}'
+        extraction = Extraction(kind, path, len(match.group(0).encode()), attributes)
+        extracted.append((extraction, body.strip() + '\n'))
+        return extraction.tag(f"{{% static '{path}' %}}")
+
+    built = INLINE_BLOCK.sub(replace, source)
+    if extracted:
+        # {% load %} has to follow {% extends %}, which must come first
+        extends = EXTENDS_TAG.search(built)
+        at = extends.end() if extends else 0
+        built = built[:at] + '{% load static %}' + built[at:]
+    return built, extracted
+
+
+def build_templates():
+    """Write the rewritten templates and extracted files under ASSET_BUILD_DIR
+
+    Clears the previous templates and extracted files first, so templates without inline
+    blocks fall back to their source. Returns a BuiltTemplate for every template.
+    """
+    root = build_dir()
+    shutil.rmtree(root / 'templates', ignore_errors=True)
+    shutil.rmtree(root / 'static' / 'build', ignore_errors=True)
+    built_templates = []
+    for name, path in template_sources():
+        source = path.read_text(encoding='utf-8')
+        built, extracted = rewrite(name, source)
+        if extracted:
+            target = root / 'templates' / name
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text(built, encoding='utf-8')
+            for extraction, contents in extracted:
+                asset = root / 'static' / extraction.path
+                asset.parent.mkdir(parents=True, exist_ok=True)
+                asset.write_text(contents, encoding='utf-8')
+        extends = EXTENDS_TAG.search(source)
+        built_templates.append(BuiltTemplate(
+            name, len(source.encode()), extends.group(1) if extends else None,
+            [extraction for extraction, _ in extracted],
+        ))
+    return built_templates
+
+
+def compressed_variants(data):
+    """{encoding: compressed bytes} for the encodings that make data meaningfully smaller"""
+    variants = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(data, quality=11)
+    return {
+        encoding: compressed for encoding, compressed in variants.items()
+        if len(compressed) <= len(data) * (1 - MIN_COMPRESSION_SAVING)
+    }
+
+
+class PrecompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage that also writes .gz and, with brotli installed, .br copies"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(set(paths) | set(self.hashed_files.values())):
+            if Path(name).suffix.lower() not in COMPRESSIBLE_EXTENSIONS or not self.exists(name):
+                continue
+            with self.open(name) as original:
+                data = original.read()
+            for encoding, compressed in compressed_variants(data).items():
+                compressed_name = name + ENCODING_SUFFIXES[encoding]
+                if self.exists(compressed_name):
+                    self.delete(compressed_name)
+                self._save(compressed_name, ContentFile(compressed))
+
+
+class BuildFinder(BaseFinder):
+    """Finds the files build_templates() extracted, once a build has been run"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.root = build_dir() / 'static'
+        self.storage = FileSystemStorage(location=self.root)
+
+    def check(self, **kwargs):
+        return []
+
+    def find(self, path, find_all=False, **kwargs):
+        find_all = find_all or kwargs.get('all', False)
+        match = (self.root / path).resolve()
+        if self.root.resolve() in match.parents and match.is_file():
+            return [str(match)] if find_all else str(match)
+        return [] if find_all else None
+
+    def list(self, ignore_patterns):
+        if self.root.is_dir():
+            for path in get_files(self.storage, ignore_patterns):
+                yield path, self.storage
@@ -0,0 +1,72 @@
+"""Request users loaded together with their profile, and role-checking view decorators
+
+ProfileBackend fetches the session's user and UserProfile in one joined query, so
+request.user.userprofile costs nothing once request.user is loaded. get_profile() reads
+it without the DoesNotExist dance, and advertiser_required / creator_required check the
+role before a view runs, leaving the profile on request.profile.
+"""
+from functools import wraps
+
+from django.contrib import messages
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ObjectDoesNotExist
+from django.shortcuts import redirect
+
+
+class ProfileBackend(ModelBackend):
+    """ModelBackend whose request users come with their UserProfile already joined in"""
+
+    def _users(self):
+        return get_user_model()._default_manager.select_related('userprofile')
+
+    def get_user(self, user_id):
+        try:
+            user = self._users().get(pk=user_id)
+        except ObjectDoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        try:
+            user = await self._users().aget(pk=user_id)
+        except ObjectDoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+
+def get_profile(request):
+    """The logged-in user's UserProfile, or None for anonymous users and users without one"""
+    if not request.user.is_authenticated:
+        return None
+    try:
+        return request.user.userprofile
+    except ObjectDoesNotExist:
+        return None
+
+
+def role_required(user_type, message, redirect_to='dashboard'):
+    """Only let logged-in users with this user_type through, flashing message to everyone else
+
+    Users without a profile are sent home. The checked profile is set as request.profile.
+    """
+    def decorator(view):
+        @wraps(view)
+        @login_required
+        def wrapper(request, *args, **kwargs):
+            profile = get_profile(request)
+            if profile is None:
+                messages.error(request, 'Profile not found.')
+                return redirect('home')
+            if profile.user_type != user_type:
+                messages.error(request, message)
+                return redirect(redirect_to)
+            request.profile = profile
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+advertiser_required = role_required('advertiser', 'Access denied. Advertiser account required.')
+creator_required = role_required('creator', 'Access denied. Creator account required.')
@@ -0,0 +1,111 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.http import HttpResponse
+
+
+# Seconds a rendered public page stays cached; signals invalidate it sooner when data changes
+PAGE_CACHE_TIMEOUT = getattr(settings, 'PAGE_CACHE_TIMEOUT', 300)
+# How long one worker may hold a rebuild lock, and how long others wait for its result
+REBUILD_LOCK_TIMEOUT = 10
+REBUILD_WAIT = 2.0
+REBUILD_POLL_INTERVAL = 0.05
+
+
+def _generation_key(page):
+    return f'page-generation:{page}'
+
+
+def _initial_generation():
+    # Time based, so a generation evicted from the cache never restarts at a value already used
+    return int(time.time() * 1000)
+
+
+def page_generation(page):
+    generation = cache.get(_generation_key(page))
+    if generation is None:
+        cache.add(_generation_key(page), _initial_generation(), None)
+        generation = cache.get(_generation_key(page), 0)
+    return generation
+
+
+def invalidate_pages(*pages):
+    """Bump each page's generation so every cached variant of it is ignored from now on"""
+    for page in pages:
+        try:
+            cache.incr(_generation_key(page))
+        except ValueError:
+            cache.add(_generation_key(page), _initial_generation(), None)
+
+
+def page_key(page, *parts):
+    digest = hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+    return f'page:{page}:{page_generation(page)}:{digest}'
+
+
+def get_or_build(key, build, timeout=PAGE_CACHE_TIMEOUT):
+    """Return the cached value for key, letting only one caller at a time run build() on a miss"""
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, REBUILD_LOCK_TIMEOUT):
+        try:
+            value = build()
+            cache.set(key, value, timeout)
+            return value
+        finally:
+            cache.delete(lock_key)
+
+    # Another request is rebuilding this entry; wait for it rather than piling onto the DB
+    deadline = time.monotonic() + REBUILD_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(REBUILD_POLL_INTERVAL)
+        value = cache.get(key)
+        if value is not None:
+            return value
+    return build()
+
+
+def _persona(request):
+    """Cache variant for the visitor, or None when the page is personalized and must not be cached"""
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    if request.user.is_authenticated:
+        # The navbar shows the username, so signed-in pages are rendered per request
+        return None
+    if len(get_messages(request)):
+        return None
+    return 'guest' if request.session.get('guest_mode', False) else 'anonymous'
+
+
+def cache_public_page(page, timeout=PAGE_CACHE_TIMEOUT):
+    """Cache a public page's rendered HTML per visitor persona and URL
+
+    Anonymous visitors and guests each get their own variant; signed-in users and requests
+    with pending flash messages bypass the cache.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            persona = _persona(request)
+            if persona is None:
+                return view_func(request, *args, **kwargs)
+
+            def build():
+                response = view_func(request, *args, **kwargs)
+                return {
+                    'status': response.status_code,
+                    'content': response.content,
+                    'content_type': response['Content-Type'],
+                }
+
+            entry = get_or_build(page_key(page, persona, request.get_full_path()), build, timeout)
+            return HttpResponse(entry['content'], status=entry['status'], content_type=entry['content_type'])
+        return wrapper
+    return decorator
@@ -0,0 +1,131 @@
+"""Responsive image variants: resized WebP/AVIF copies of the static images
+
+build_variants() writes each raster image in STATICFILES_DIRS at several widths under
+ASSET_BUILD_DIR/static/images and records them in ASSET_BUILD_DIR/images.json. The
+{% responsive_image %} tag reads that manifest to emit <picture> sources with srcset and
+sizes. Collecting the variants with build_assets gives them content-hashed names.
+
+Pillow is only needed to build the variants; without a manifest the tag falls back to a
+plain <img> of the original.
+"""
+import json
+import shutil
+from pathlib import Path
+
+from django.conf import settings
+
+from .assets import build_dir
+
+try:
+    from PIL import Image, features
+except ImportError:
+    Image = features = None
+
+
+IMAGE_WIDTHS = tuple(getattr(settings, 'RESPONSIVE_IMAGE_WIDTHS', (160, 320, 640, 960, 1280, 1920)))
+SOURCE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.webp'}
+# (format, MIME type, save options), most compact first; <picture> offers them in this order
+FORMATS = (
+    ('avif', 'image/avif', {'quality': 55}),
+    ('webp', 'image/webp', {'quality': 80, 'method': 6}),
+)
+
+
+def manifest_path():
+    return build_dir() / 'images.json'
+
+
+def available_formats():
+    """The FORMATS this Pillow build can write"""
+    if Image is None:
+        return ()
+    return tuple(entry for entry in FORMATS if features.check(entry[0]))
+
+
+def source_images():
+    """(static name, path) for every raster image in STATICFILES_DIRS"""
+    for entry in settings.STATICFILES_DIRS:
+        prefix, root = entry if isinstance(entry, tuple) else ('', entry)
+        for path in sorted(Path(root).rglob('*')):
+            if path.suffix.lower() in SOURCE_EXTENSIONS and path.is_file():
+                name = path.relative_to(root).as_posix()
+                yield (f'{prefix}/{name}' if prefix else name), path
+
+
+def variant_widths(width):
+    """IMAGE_WIDTHS narrower than an image, plus its own width; images are never upscaled"""
+    return sorted({size for size in IMAGE_WIDTHS if size < width} | {min(width, max(IMAGE_WIDTHS))})
+
+
+def build_variants():
+    """Write every variant of every source image, then the manifest describing them
+
+    Clears the previous variants first. Returns the manifest.
+    """
+    formats = available_formats()
+    if not formats:
+        raise RuntimeError('Pillow with WebP support is required to build image variants')
+    root = build_dir() / 'static' / 'images'
+    shutil.rmtree(root, ignore_errors=True)
+    manifest = {}
+    for name, path in source_images():
+        with Image.open(path) as original:
+            original.load()
+            mode = 'RGBA' if original.mode in ('RGBA', 'LA', 'P') else 'RGB'
+            original = original.convert(mode)
+            entry = {
+                'width': original.width,
+                'height': original.height,
+                'bytes': path.stat().st_size,
+                'variants': {},
+            }
+            for width in variant_widths(original.width):
+                height = max(1, round(original.height * width / original.width))
+                resized = original if width == original.width else original.resize((width, height), Image.LANCZOS)
+                for image_format, _, options in formats:
+                    variant = f'images/{name.rsplit(".", 1)[0]}-{width}w.{image_format}'
+                    target = root.parent / variant
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    resized.save(target, image_format.upper(), **options)
+                    entry['variants'].setdefault(image_format, []).append(
+                        {'name': variant, 'width': width, 'bytes': target.stat().st_size}
+                    )
+        manifest[name] = entry
+    manifest_path().write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding='utf-8')
+    _manifest_cache.clear()
+    return manifest
+
+
+_manifest_cache = {}
+
+
+def load_manifest():
+    """The images.json written by the last build, reread when it changes; {} before any build"""
+    path = manifest_path()
+    try:
+        modified = path.stat().st_mtime
+    except FileNotFoundError:
+        return {}
+    if _manifest_cache.get('key') != (path, modified):
+        _manifest_cache['key'] = (path, modified)
+        _manifest_cache['manifest'] = json.loads(path.read_text(encoding='utf-8'))
+    return _manifest_cache['manifest']
+
+
+def needed_width(sizes, viewport_width, pixel_ratio):
+    """Device pixels a browser fetches for a simple sizes value ('100vw', '96px'), or None"""
+    sizes = sizes.strip()
+    if sizes.endswith('vw'):
+        return viewport_width * float(sizes[:-2]) / 100 * pixel_ratio
+    if sizes.endswith('px'):
+        return float(sizes[:-2]) * pixel_ratio
+    return None
+
+
+def chosen_variant(entry, sizes, viewport_width, pixel_ratio):
+    """The variant of the best format a browser would pick from the srcset, as a manifest dict"""
+    variants = next(entry['variants'][name] for name, _, _ in FORMATS if name in entry['variants'])
+    needed = needed_width(sizes, viewport_width, pixel_ratio)
+    if needed is None:
+        return variants[-1]
+    return next((variant for variant in variants if variant['width'] >= needed), variants[-1])
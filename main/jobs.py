@@ -0,0 +1,148 @@
+"""Small database-backed job queue for work that doesn't need to finish inside a request
+
+Jobs are enqueued with enqueue() and processed by `manage.py run_worker`. Delivery is at
+least once: a worker claims a job with a conditional UPDATE that sets a visibility timeout,
+and the row is only deleted after its handler succeeds. If the worker dies, the claim
+expires and another worker picks the job up, so handlers must be idempotent.
+"""
+import logging
+from datetime import timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import view_history
+from .cache import invalidate_pages
+from .models import Job, UserProfile
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VISIBILITY_TIMEOUT = 60
+RETRY_BACKOFF = 5
+
+_handlers = {}
+
+
+def job_handler(kind):
+    """Register the decorated function as the handler for jobs of this kind"""
+    def decorator(func):
+        _handlers[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(kind, payload=None, dedupe_key=None, delay=0):
+    """Queue a job once the current transaction commits
+
+    With a dedupe_key, a job already queued under the same key absorbs this one.
+    """
+    def create():
+        if dedupe_key and Job.objects.filter(dedupe_key=dedupe_key, status='queued').exists():
+            return
+        try:
+            with transaction.atomic():
+                Job.objects.create(
+                    kind=kind,
+                    payload=payload or {},
+                    dedupe_key=dedupe_key,
+                    run_after=timezone.now() + timedelta(seconds=delay),
+                )
+        except IntegrityError:
+            pass  # Already queued under this key
+
+    transaction.on_commit(create)
+
+
+def _claimable(now):
+    return Q(status='queued', run_after__lte=now) | Q(status='running', locked_until__lt=now)
+
+
+def claim_jobs(worker_id, limit=10, visibility_timeout=DEFAULT_VISIBILITY_TIMEOUT):
+    """Claim up to limit ready jobs for this worker, including running jobs whose claim expired"""
+    now = timezone.now()
+    candidates = Job.objects.filter(_claimable(now)).order_by('run_after').values_list('pk', flat=True)[:limit]
+    claimed = []
+    for pk in candidates:
+        # The same condition in the UPDATE makes the claim safe against other workers
+        won = Job.objects.filter(_claimable(now), pk=pk).update(
+            status='running',
+            locked_until=now + timedelta(seconds=visibility_timeout),
+            locked_by=worker_id,
+            attempts=F('attempts') + 1,
+            updated_at=now,
+        )
+        if won:
+            claimed.append(pk)
+    return list(Job.objects.filter(pk__in=claimed, locked_by=worker_id))
+
+
+def run_job(job):
+    """Run a claimed job's handler, then delete it, or schedule a retry when it fails"""
+    handler = _handlers.get(job.kind)
+    try:
+        if handler is None:
+            raise LookupError(f'No handler registered for job kind {job.kind!r}')
+        handler(**job.payload)
+    except Exception as exc:
+        logger.exception('Job %s (%s) failed on attempt %s', job.pk, job.kind, job.attempts)
+        if job.attempts >= job.max_attempts:
+            Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(
+                status='failed', locked_until=None, last_error=repr(exc)
+            )
+        else:
+            try:
+                Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(
+                    status='queued',
+                    locked_until=None,
+                    last_error=repr(exc),
+                    run_after=timezone.now() + timedelta(seconds=RETRY_BACKOFF * 2 ** (job.attempts - 1)),
+                )
+            except IntegrityError:
+                # A newer job with the same key is already queued and will do the work
+                Job.objects.filter(pk=job.pk).delete()
+        return False
+    Job.objects.filter(pk=job.pk, locked_by=job.locked_by).delete()
+    return True
+
+
+@job_handler('invalidate_pages')
+def invalidate_pages_job(pages):
+    invalidate_pages(*pages)
+
+
+@job_handler('reconcile_profile_totals')
+def reconcile_profile_totals_job(profile_id):
+    UserProfile.objects.filter(pk=profile_id).recompute_totals()
+
+
+# Seconds between view event compaction runs
+VIEW_COMPACTION_INTERVAL = 3600
+
+
+def schedule_view_compaction(delay=VIEW_COMPACTION_INTERVAL):
+    enqueue('compact_view_events', dedupe_key='compact_view_events', delay=delay)
+
+
+@job_handler('compact_view_events')
+def compact_view_events_job():
+    # Scheduled first, so the cycle survives this run failing for good
+    schedule_view_compaction()
+    view_history.compact()
+
+
+# Seconds between purges of expired database sessions
+SESSION_PURGE_INTERVAL = 6 * 3600
+
+
+def schedule_session_purge(delay=SESSION_PURGE_INTERVAL):
+    enqueue('purge_expired_sessions', dedupe_key='purge_expired_sessions', delay=delay)
+
+
+@job_handler('purge_expired_sessions')
+def purge_expired_sessions_job():
+    schedule_session_purge()
+    import_module(settings.SESSION_ENGINE).SessionStore.clear_expired()
@@ -0,0 +1,238 @@
+"""Khalti payment verification client
+
+Verification runs on a module-level pooled requests.Session with connect/read timeouts,
+bounded retries with exponential backoff and a circuit breaker. The async entry point
+hands the blocking HTTP call to a worker thread, so under ASGI a slow Khalti response
+never blocks the event loop.
+
+verify_payment_once() adds idempotency on top: results are recorded in Payment rows keyed
+by token, verified tokens are answered from the cache or database, and concurrent
+verifications of one token share a single outbound request.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from .models import Payment
+
+
+class KhaltiUnavailable(Exception):
+    """Khalti could not be reached, timed out, or the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Fail fast after repeated upstream failures, then let one trial call through"""
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow_request(self):
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+breaker = CircuitBreaker(
+    failure_threshold=getattr(settings, 'KHALTI_BREAKER_THRESHOLD', 5),
+    reset_timeout=getattr(settings, 'KHALTI_BREAKER_RESET', 30),
+)
+
+_session = None
+_session_lock = threading.Lock()
+# Dedicated threads for the blocking HTTP calls, sized to the connection pool
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'KHALTI_POOL_SIZE', 20), thread_name_prefix='khalti'
+)
+
+
+def get_session():
+    """Shared keep-alive session; connections are pooled and reused across requests"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=4,
+                    pool_maxsize=getattr(settings, 'KHALTI_POOL_SIZE', 20),
+                    max_retries=0,  # retries are handled below, with backoff and the breaker
+                )
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+
+def _post_once(token, amount):
+    response = get_session().post(
+        settings.KHALTI_VERIFY_URL,
+        json={'token': token, 'amount': amount},
+        headers={
+            'Authorization': f'Bearer {settings.KHALTI_SECRET_KEY}',
+            'Content-Type': 'application/json',
+        },
+        timeout=(settings.KHALTI_CONNECT_TIMEOUT, settings.KHALTI_READ_TIMEOUT),
+    )
+    if response.status_code >= 500:
+        raise KhaltiUnavailable(f'Khalti returned {response.status_code}')
+    try:
+        data = response.json()
+    except ValueError:
+        data = {}
+    return response.status_code == 200 and data.get('status') == 'success', data
+
+
+def _retry_delays():
+    backoff = settings.KHALTI_RETRY_BACKOFF
+    return [backoff * (2 ** attempt) for attempt in range(settings.KHALTI_MAX_RETRIES)]
+
+
+async def verify_payment(token, amount):
+    """Verify a payment with Khalti, returning (verified, response_data)
+
+    Raises KhaltiUnavailable when Khalti cannot give an answer within the retry budget
+    or the circuit breaker is open.
+    """
+    delays = _retry_delays()
+    for attempt in range(len(delays) + 1):
+        if not breaker.allow_request():
+            raise KhaltiUnavailable('Khalti verification is temporarily unavailable')
+        try:
+            result = await sync_to_async(_post_once, thread_sensitive=False, executor=_executor)(token, amount)
+        except (requests.ConnectionError, requests.Timeout, KhaltiUnavailable) as exc:
+            breaker.record_failure()
+            if attempt == len(delays):
+                raise KhaltiUnavailable(str(exc)) from exc
+            await asyncio.sleep(delays[attempt])
+        else:
+            breaker.record_success()
+            return result
+
+
+VERIFIED_CACHE_TIMEOUT = 24 * 60 * 60
+CLAIM_POLL_INTERVAL = 0.1
+
+# In-process verifications by token, so concurrent requests on one event loop share a call
+_in_flight = {}
+
+
+def _verified_cache_key(token):
+    return f'khalti-verified:{token}'
+
+
+def _claim_ttl():
+    """Upper bound on how long one verification (all retries included) can take"""
+    per_attempt = settings.KHALTI_CONNECT_TIMEOUT + settings.KHALTI_READ_TIMEOUT
+    return timedelta(seconds=per_attempt * (settings.KHALTI_MAX_RETRIES + 1) + sum(_retry_delays()))
+
+
+async def verify_payment_once(token, amount, user_id=None):
+    """Idempotently verify a payment, returning True only for a verified token and matching amount"""
+    if await cache.aget(_verified_cache_key(token)) == amount:
+        return True
+    
+    loop = asyncio.get_running_loop()
+    task = _in_flight.get(token)
+    if task is None or task.get_loop() is not loop:
+        task = loop.create_task(_verify_and_record(token, amount, user_id))
+        _in_flight[token] = task
+        task.add_done_callback(lambda done: _in_flight.pop(token, None) if _in_flight.get(token) is done else None)
+    # Shielded so a cancelled client request doesn't abort the verification others are awaiting
+    verified, verified_amount = await asyncio.shield(task)
+    return verified and verified_amount == amount
+
+
+async def _verify_and_record(token, amount, user_id):
+    payment, _ = await Payment.objects.aget_or_create(token=token, defaults={'amount': amount, 'user_id': user_id})
+    if payment.status == 'verified':
+        await cache.aset(_verified_cache_key(token), payment.amount, VERIFIED_CACHE_TIMEOUT)
+        return True, payment.amount
+    if payment.amount != amount:
+        return False, payment.amount
+    
+    # Claim the token so other processes wait for this verification instead of repeating it
+    now = timezone.now()
+    claimed = await Payment.objects.filter(pk=payment.pk).exclude(status='verified').filter(
+        Q(claimed_until__isnull=True) | Q(claimed_until__lt=now)
+    ).aupdate(claimed_until=now + _claim_ttl())
+    if not claimed:
+        return await _wait_for_claim(payment.pk)
+    
+    try:
+        verified, _ = await verify_payment(token, amount)
+    except KhaltiUnavailable:
+        await Payment.objects.filter(pk=payment.pk).aupdate(claimed_until=None)
+        raise
+    
+    now = timezone.now()
+    await Payment.objects.filter(pk=payment.pk).aupdate(
+        status='verified' if verified else 'failed',
+        claimed_until=None,
+        verified_at=now if verified else None,
+        updated_at=now,
+    )
+    if verified:
+        await cache.aset(_verified_cache_key(token), amount, VERIFIED_CACHE_TIMEOUT)
+    return verified, amount
+
+
+async def _wait_for_claim(payment_id):
+    """Wait for the process holding the claim to record its result"""
+    deadline = time.monotonic() + _claim_ttl().total_seconds()
+    while time.monotonic() < deadline:
+        await asyncio.sleep(CLAIM_POLL_INTERVAL)
+        payment = await Payment.objects.only('status', 'amount', 'claimed_until').aget(pk=payment_id)
+        if payment.status == 'verified':
+            return True, payment.amount
+        if payment.claimed_until is None:
+            return False, payment.amount
+    raise KhaltiUnavailable('Payment verification is already in progress')
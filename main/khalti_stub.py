@@ -0,0 +1,61 @@
+"""Local stand-in for Khalti's verification API, for tests and offline benchmarks
+
+Tokens starting with "invalid" are rejected with 400; every other token verifies. Latency
+and a random 503 failure rate are configurable per server.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubKhaltiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+    wbufsize = -1  # send headers and body in one write, avoiding Nagle/delayed-ACK stalls
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            payload = {}
+        self.server.request_count += 1
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if self.server.random.random() < self.server.failure_rate:
+            self._reply(503, {'detail': 'Service unavailable'})
+        elif str(payload.get('token', '')).startswith('invalid'):
+            self._reply(400, {'status': 'failed', 'detail': 'Invalid token'})
+        else:
+            self._reply(200, {'status': 'success', 'token': payload.get('token'), 'amount': payload.get('amount')})
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host='127.0.0.1', port=0, latency=0.0, failure_rate=0.0, seed=None):
+    server = ThreadingHTTPServer((host, port), StubKhaltiHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.failure_rate = failure_rate
+    server.random = random.Random(seed)
+    server.request_count = 0
+    return server
+
+
+def start_in_thread(**kwargs):
+    """Start a stub server on a free port in a daemon thread, returning (server, verify_url)"""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f'http://{host}:{port}/api/v2/epayment/'
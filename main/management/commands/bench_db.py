@@ -0,0 +1,110 @@
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import F
+
+from main.models import Campaign, UserProfile
+from neptok.db import PROFILES, database_config
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare read, write and mixed throughput across database profiles. Each profile runs '
+        'against its own throwaway test database; SQLite ones live in a temporary directory.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profiles', default='sqlite,sqlite-wal',
+            help=f'Comma separated profiles to compare, from: {", ".join(PROFILES)}',
+        )
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=3.0, help='Duration of each workload')
+        parser.add_argument('--campaigns', type=int, default=500)
+
+    def handle(self, *args, **options):
+        profiles = [profile.strip() for profile in options['profiles'].split(',') if profile.strip()]
+        unknown = set(profiles) - set(PROFILES)
+        if unknown:
+            raise CommandError(f'Unknown profile(s): {", ".join(sorted(unknown))}')
+
+        with tempfile.TemporaryDirectory() as tmp:
+            for profile in profiles:
+                alias = f'bench_{profile.replace("-", "_")}'
+                config = database_config(profile)
+                if config['ENGINE'].endswith('sqlite3'):
+                    config['TEST'] = {'NAME': str(Path(tmp) / f'{alias}.sqlite3')}
+                connections.settings[alias] = connections.configure_settings({'default': config})['default']
+                creation = connections[alias].creation
+                old_name = creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+                try:
+                    campaign_ids = self.seed(alias, options['campaigns'])
+                    for workload in ('read', 'write', 'mixed'):
+                        ops, errors = self.run(alias, workload, campaign_ids, options['threads'], options['seconds'])
+                        self.stdout.write(
+                            f'{profile:<11} {workload:<6} {ops / options["seconds"]:>9.1f} ops/s'
+                            f'  ({ops} ops, {errors} errors, {options["threads"]} threads)'
+                        )
+                finally:
+                    connections[alias].close()
+                    creation.destroy_test_db(old_name, verbosity=0)
+                    del connections.settings[alias]
+
+    def seed(self, alias, count):
+        from django.contrib.auth.models import User
+
+        user = User.objects.db_manager(alias).create_user('bench-advertiser')
+        advertiser = UserProfile.objects.using(alias).create(user=user, user_type='advertiser')
+        Campaign.objects.using(alias).bulk_create(
+            Campaign(
+                advertiser=advertiser, title=f'Campaign {index}', description='-', requirements='-',
+                budget=100000, remaining=100000, status='active',
+            )
+            for index in range(count)
+        )
+        return list(Campaign.objects.using(alias).values_list('pk', flat=True))
+
+    def run(self, alias, workload, campaign_ids, threads, seconds):
+        ops = [0] * threads
+        errors = [0] * threads
+        start = threading.Barrier(threads)
+
+        def read():
+            list(
+                Campaign.objects.using(alias).filter(is_public=True, status='active')
+                .order_by('-created_at', '-id')[:20]
+            )
+
+        def write(rng):
+            with transaction.atomic(using=alias):
+                Campaign.objects.using(alias).filter(pk=rng.choice(campaign_ids)).update(
+                    spent=F('spent') + 1, remaining=F('remaining') - 1
+                )
+
+        def worker(index):
+            rng = random.Random(index)
+            # In the mixed workload one thread in four writes and the rest read
+            writer = workload == 'write' or (workload == 'mixed' and index % 4 == 0)
+            try:
+                start.wait()
+                deadline = time.perf_counter() + seconds
+                while time.perf_counter() < deadline:
+                    try:
+                        write(rng) if writer else read()
+                        ops[index] += 1
+                    except Exception:
+                        errors[index] += 1
+            finally:
+                connections[alias].close()
+
+        workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return sum(ops), sum(errors)
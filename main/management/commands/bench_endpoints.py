@@ -0,0 +1,58 @@
+import statistics
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from main import seeding
+from main.perf import ENDPOINTS, measure
+from neptok.testing import temporary_cache
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure wall time and SQL query count for every route at several seeded data sizes, '
+        'on a throwaway test database. Exits non-zero if a budget is exceeded or a query count '
+        'grows with the data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default='1,5,20', help='Comma separated seeding scales')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per endpoint; the median is reported')
+
+    def handle(self, *args, **options):
+        scales = [int(scale) for scale in options['scales'].split(',')]
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            results = {}
+            # measure() clears the cache before every request
+            with temporary_cache():
+                for scale in scales:
+                    seeding.clear()
+                    seeded = seeding.seed(scale)
+                    self.stdout.write(f'scale {scale}: {seeded.counts()}')
+                    for index, endpoint in enumerate(ENDPOINTS):
+                        runs = [measure(endpoint, seeded) for _ in range(options['repeat'])]
+                        status, queries, _ = runs[0]
+                        seconds = statistics.median(elapsed for _, _, elapsed in runs)
+                        # Keyed by position: one route can be listed with different users or data
+                        results.setdefault(index, (endpoint, []))[1].append((status, queries, seconds))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        header = ''.join(f'{f"scale {scale}":>22}' for scale in scales)
+        self.stdout.write(f'\n{"endpoint":<56}{"budget":>7}{header}')
+        failures = []
+        for endpoint, measurements in results.values():
+            label = repr(endpoint)
+            cells = ''.join(f'{f"{queries}q {seconds * 1000:7.1f}ms [{status}]":>22}' for status, queries, seconds in measurements)
+            self.stdout.write(f'{label:<56}{endpoint.budget:>7}{cells}')
+            counts = [queries for _, queries, _ in measurements]
+            if max(counts) > endpoint.budget:
+                failures.append(f'{label} issued {max(counts)} queries, over its budget of {endpoint.budget}')
+            if len(set(counts)) > 1:
+                failures.append(f'{label} query count grows with data: {counts}')
+        if failures:
+            raise CommandError('\n'.join(failures))
@@ -0,0 +1,60 @@
+import asyncio
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from main import khalti
+from main.khalti_stub import start_in_thread
+
+
+class Command(BaseCommand):
+    help = 'Benchmark Khalti verification latency and failure handling against the local stub'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--latency', type=float, default=0.05, help='Stub response latency in seconds')
+        parser.add_argument('--failure-rate', type=float, default=0.0, help='Fraction of stub responses that are 503')
+        parser.add_argument('--read-timeout', type=float, default=1.0)
+
+    def handle(self, *args, **options):
+        server, url = start_in_thread(latency=options['latency'], failure_rate=options['failure_rate'], seed=0)
+        try:
+            with override_settings(
+                KHALTI_VERIFY_URL=url, KHALTI_READ_TIMEOUT=options['read_timeout'], KHALTI_RETRY_BACKOFF=0.05
+            ):
+                khalti.breaker.reset()
+                started = time.perf_counter()
+                outcomes = asyncio.run(self.run(options['requests'], options['concurrency']))
+                elapsed = time.perf_counter() - started
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        latencies = sorted(latency for _, latency in outcomes)
+        counts = {}
+        for outcome, _ in outcomes:
+            counts[outcome] = counts.get(outcome, 0) + 1
+        self.stdout.write(f'{len(outcomes)} verifications in {elapsed:.2f}s ({len(outcomes) / elapsed:.1f}/s)')
+        self.stdout.write(
+            f'latency p50={statistics.median(latencies) * 1000:.1f}ms '
+            f'p95={latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f}ms max={latencies[-1] * 1000:.1f}ms'
+        )
+        self.stdout.write(f'outcomes: {counts}; upstream requests: {server.request_count}; breaker: {khalti.breaker.state}')
+
+    async def run(self, total, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(index):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    verified, _ = await khalti.verify_payment(f'token-{index}', 1000)
+                    outcome = 'verified' if verified else 'rejected'
+                except khalti.KhaltiUnavailable:
+                    outcome = 'unavailable'
+                return outcome, time.perf_counter() - started
+
+        return await asyncio.gather(*(one(index) for index in range(total)))
@@ -0,0 +1,135 @@
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Q
+
+from main.models import Campaign, UserProfile
+from main.search import query_terms, search_campaigns
+from neptok.db import database_config
+
+
+# The most frequent words, in order; a long tail of made-up words follows them
+COMMON_WORDS = (
+    'brand launch video post sale festival review food travel music phone fashion momo trek '
+    'kathmandu pokhara cafe fitness winter jacket'
+).split()
+SYLLABLES = 'ka ma ri to ne pa lu si go de'.split()
+VOCABULARY = COMMON_WORDS + [a + b + c + d for a in SYLLABLES for b in SYLLABLES for c in SYLLABLES for d in SYLLABLES]
+# Word frequencies follow Zipf's law, as in natural text
+ZIPF_WEIGHTS = [1 / (rank + 1) ** 1.1 for rank in range(len(VOCABULARY))]
+# (label, query): from terms in most campaigns down to rare terms and a term in none
+QUERIES = (
+    ('very common', 'brand'),
+    ('common', 'momo'),
+    ('common prefix', 'pokh'),
+    ('two common', 'winter jacket'),
+    ('uncommon', VOCABULARY[300]),
+    ('rare', VOCABULARY[5000]),
+    ('rare pair', f'{VOCABULARY[400]} {VOCABULARY[900]}'),
+    ('no match', 'zzzz'),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare FTS5 campaign search against an icontains scan on a throwaway SQLite database '
+        'filled with generated campaigns'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--campaigns', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=20, help='Runs of each query per method')
+
+    def handle(self, *args, **options):
+        alias = 'bench_search'
+        with tempfile.TemporaryDirectory() as tmp:
+            config = database_config('sqlite-wal')
+            config['TEST'] = {'NAME': str(Path(tmp) / f'{alias}.sqlite3')}
+            connections.settings[alias] = connections.configure_settings({'default': config})['default']
+            creation = connections[alias].creation
+            old_name = creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                started = time.perf_counter()
+                self.seed(alias, options['campaigns'])
+                self.stdout.write(
+                    f'Seeded {options["campaigns"]} campaigns in {time.perf_counter() - started:.1f}s'
+                )
+                self.compare(alias, options['repeat'])
+            finally:
+                connections[alias].close()
+                creation.destroy_test_db(old_name, verbosity=0)
+                del connections.settings[alias]
+
+    def seed(self, alias, count):
+        from django.contrib.auth.models import User
+
+        rng = random.Random(0)
+        user = User.objects.db_manager(alias).create_user('bench-advertiser')
+        advertiser = UserProfile.objects.using(alias).create(user=user, user_type='advertiser')
+
+        cumulative, total = [], 0
+        for weight in ZIPF_WEIGHTS:
+            total += weight
+            cumulative.append(total)
+
+        def text(words):
+            return ' '.join(rng.choices(VOCABULARY, cum_weights=cumulative, k=words))
+
+        batch = 5000
+        for offset in range(0, count, batch):
+            Campaign.objects.using(alias).bulk_create(
+                Campaign(
+                    advertiser=advertiser,
+                    title=text(4).title(),
+                    description=text(40),
+                    requirements=text(15),
+                    budget=1000,
+                    remaining=1000,
+                    status='active' if index % 5 else 'paused',
+                    is_public=index % 7 != 6,
+                )
+                for index in range(offset, min(offset + batch, count))
+            )
+
+    def compare(self, alias, repeat):
+        campaigns = Campaign.objects.using(alias).filter(is_public=True, status='active')
+
+        def icontains(query):
+            condition = Q()
+            for term in query_terms(query):
+                condition &= Q(title__icontains=term) | Q(description__icontains=term) | Q(requirements__icontains=term)
+            return list(campaigns.filter(condition).order_by('-created_at', '-id')[:20])
+
+        def fts(query):
+            # As the campaigns page does it: rank ids, then load the page
+            ids = list(search_campaigns(campaigns, query).values_list('pk', flat=True)[:20])
+            return list(Campaign.objects.using(alias).in_bulk(ids).values())
+
+        self.stdout.write(f'{"query":<28} {"ranked":>8} {"icontains ms":>13} {"fts5 ms":>9} {"speedup":>8}')
+        medians = {'icontains': [], 'fts5': []}
+        for label, query in QUERIES:
+            row = {}
+            for name, method in (('icontains', icontains), ('fts5', fts)):
+                method(query)  # Warm the page cache
+                timings = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    method(query)
+                    timings.append((time.perf_counter() - started) * 1000)
+                row[name] = statistics.median(timings)
+                medians[name].append(row[name])
+            # Capped at MAX_RANKED_MATCHES for broad queries
+            matches = search_campaigns(campaigns, query).count()
+            self.stdout.write(
+                f'{f"{label} ({query})":<28} {matches:>8} {row["icontains"]:>13.2f} {row["fts5"]:>9.2f}'
+                f' {row["icontains"] / row["fts5"]:>7.1f}x'
+            )
+        baseline, indexed = statistics.median(medians['icontains']), statistics.median(medians['fts5'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Median of medians: icontains {baseline:.2f} ms, fts5 {indexed:.2f} ms ({baseline / indexed:.1f}x)'
+        ))
@@ -0,0 +1,66 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.assets import template_sources
+from main.images import build_variants, chosen_variant, manifest_path
+
+IMAGE_TAG = re.compile(r'{%\s*responsive_image\s+["\']([^"\']+)["\'](.*?)%}')
+SIZES_ARGUMENT = re.compile(r'\bsizes=["\']([^"\']+)["\']')
+# (label, viewport width in CSS pixels, device pixel ratio) the page report is worked out for
+DEVICES = (('phone', 390, 2), ('desktop', 1440, 1))
+
+
+class Command(BaseCommand):
+    help = (
+        'Write resized AVIF/WebP variants of the static images for {% responsive_image %} and '
+        'report the image bytes each page saves. Run before build_assets, which collects the '
+        'variants under content-hashed names. Needs Pillow.'
+    )
+
+    def handle(self, *args, **options):
+        try:
+            manifest = build_variants()
+        except RuntimeError as exc:
+            raise CommandError(str(exc))
+        variants = sum(len(widths) for entry in manifest.values() for widths in entry['variants'].values())
+        self.stdout.write(f'Wrote {variants} variants of {len(manifest)} images and {manifest_path()}')
+
+        self.stdout.write(f'\n{"image":<20} {"size":>10} {"original B":>11}  largest variant B')
+        for name, entry in manifest.items():
+            largest = ', '.join(
+                f'{image_format} {widths[-1]["bytes"]}' for image_format, widths in entry['variants'].items()
+            )
+            self.stdout.write(
+                f'{name:<20} {entry["width"]:>5}x{entry["height"]:<4} {entry["bytes"]:>11}  {largest}'
+            )
+        self.report_pages(manifest)
+
+    def report_pages(self, manifest):
+        """Image bytes per page: every original eagerly before, against the variant each device picks
+
+        The first view loads only the images that are not lazy; the rest load as they
+        scroll or slide into view.
+        """
+        header = ''.join(f' {f"{label} first":>14} {f"{label} all":>12}' for label, _, _ in DEVICES)
+        self.stdout.write(f'\n{"page":<28} {"before B":>9}{header}')
+        for template, path in template_sources():
+            tags = [
+                (name, SIZES_ARGUMENT.search(arguments), 'lazy=False' not in arguments)
+                for name, arguments in IMAGE_TAG.findall(path.read_text(encoding='utf-8'))
+                if name in manifest
+            ]
+            if not tags:
+                continue
+            # Repeated images, like carousel clones, are downloaded once
+            before = sum(manifest[name]['bytes'] for name in {name for name, _, _ in tags})
+            columns = []
+            for _, viewport, ratio in DEVICES:
+                chosen = {
+                    name: chosen_variant(manifest[name], sizes.group(1) if sizes else '100vw', viewport, ratio)
+                    for name, sizes, _ in tags
+                }
+                first = {chosen[name]['name']: chosen[name]['bytes'] for name, _, lazy in tags if not lazy}
+                everything = {variant['name']: variant['bytes'] for variant in chosen.values()}
+                columns.append(f' {sum(first.values()):>14} {sum(everything.values()):>12}')
+            self.stdout.write(f'{template:<28} {before:>9}{"".join(columns)}')
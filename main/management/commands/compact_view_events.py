@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from main import view_history
+from main.jobs import schedule_view_compaction
+
+
+class Command(BaseCommand):
+    help = (
+        'Fold view events into hourly buckets, and old hourly buckets into daily ones, '
+        'deleting the compacted rows'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--schedule', action='store_true',
+            help='Instead queue a recurring compaction job for run_worker',
+        )
+
+    def handle(self, *args, **options):
+        if options['schedule']:
+            schedule_view_compaction(delay=0)
+            self.stdout.write(self.style.SUCCESS('Queued the recurring view compaction job.'))
+            return
+        events, hourly = view_history.compact()
+        self.stdout.write(self.style.SUCCESS(
+            f'Compacted {events} view event(s) and {hourly} hourly bucket(s).'
+        ))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from main.khalti_stub import make_server
+
+
+class Command(BaseCommand):
+    help = 'Run a local stub of the Khalti verification API (point KHALTI_VERIFY_URL at it)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency', type=float, default=0.0, help='Seconds to wait before each response')
+        parser.add_argument('--failure-rate', type=float, default=0.0, help='Fraction of requests answered with 503')
+
+    def handle(self, *args, **options):
+        server = make_server(
+            options['host'], options['port'], latency=options['latency'], failure_rate=options['failure_rate']
+        )
+        host, port = server.server_address[:2]
+        self.stdout.write(f'Stub Khalti listening on http://{host}:{port}/api/v2/epayment/ (Ctrl+C to stop)')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
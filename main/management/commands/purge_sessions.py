@@ -0,0 +1,27 @@
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from main.jobs import schedule_session_purge
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete expired sessions from the database in batches. Guest sessions are signed '
+        'cookies and never reach the table.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--schedule', action='store_true',
+            help='Instead queue a recurring purge job for run_worker',
+        )
+
+    def handle(self, *args, **options):
+        if options['schedule']:
+            schedule_session_purge(delay=0)
+            self.stdout.write(self.style.SUCCESS('Queued the recurring session purge job.'))
+            return
+        deleted = import_module(settings.SESSION_ENGINE).SessionStore.clear_expired()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted or 0} expired session(s).'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from main.cache import invalidate_pages
+from main.models import Campaign
+
+
+class Command(BaseCommand):
+    help = "Rebuild every campaign's spent/remaining ledger from approved application earnings"
+
+    def add_arguments(self, parser):
+        parser.add_argument('campaign_ids', nargs='*', type=int, help='Only rebuild these campaigns')
+
+    def handle(self, *args, **options):
+        campaigns = Campaign.objects.all()
+        if options['campaign_ids']:
+            campaigns = campaigns.filter(pk__in=options['campaign_ids'])
+        updated = campaigns.rebuild_ledger()
+        invalidate_pages('campaigns', 'campaign_detail')
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt ledger for {updated} campaign(s).'))
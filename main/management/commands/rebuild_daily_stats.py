@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from main.models import Campaign, CampaignDailyStats, CreatorDailyStats, UserProfile
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the daily campaign and creator rollups from applications and content. '
+        'Raw rows only keep running totals, so each is dated at its last update and earlier '
+        'day-by-day history is replaced.'
+    )
+
+    def handle(self, *args, **options):
+        campaign_rows = CampaignDailyStats.rebuild(Campaign.objects.all())
+        creator_rows = CreatorDailyStats.rebuild(UserProfile.objects.filter(user_type='creator'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {len(campaign_rows)} campaign and {len(creator_rows)} creator daily rows.'
+        ))
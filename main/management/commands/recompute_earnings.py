@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from main.cache import invalidate_pages
+from main.models import Application, Campaign, Content, UserProfile
+
+
+def pk_chunks(queryset, size):
+    """Split a queryset into consecutive primary key ranges of at most size rows"""
+    queryset = queryset.order_by('pk')
+    last = None
+    while True:
+        remaining = queryset if last is None else queryset.filter(pk__gt=last)
+        upper = next(iter(remaining.values_list('pk', flat=True)[size - 1:size]), None)
+        if upper is None:
+            if remaining.exists():
+                yield remaining
+            return
+        yield remaining.filter(pk__lte=upper)
+        last = upper
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute application and content earnings from each campaign's rate card, "
+        'then rebuild campaign ledgers and profile totals'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows updated per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the rows whose earnings would change')
+
+    def handle(self, *args, **options):
+        models = [('applications', Application), ('content', Content)]
+        if options['dry_run']:
+            for label, model in models:
+                self.stdout.write(f'{model.objects.stale_earnings().count()} {label} would change.')
+            return
+
+        for label, model in models:
+            updated = 0
+            for chunk in pk_chunks(model.objects.all(), options['chunk_size']):
+                with transaction.atomic():
+                    updated += chunk.recompute_earnings()
+            self.stdout.write(f'Recomputed earnings for {updated} {label}.')
+
+        Campaign.objects.rebuild_ledger()
+        UserProfile.objects.recompute_totals()
+        invalidate_pages('campaigns', 'campaign_detail')
+
+        for campaign in Campaign.objects.filter(remaining__lt=0).only('title', 'remaining'):
+            self.stdout.write(self.style.WARNING(
+                f'Campaign {campaign.pk} "{campaign.title}" is over budget by Rs {-campaign.remaining}.'
+            ))
+        self.stdout.write(self.style.SUCCESS('Rebuilt campaign ledgers and profile totals.'))
@@ -0,0 +1,71 @@
+import os
+import socket
+import threading
+
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from main.jobs import DEFAULT_VISIBILITY_TIMEOUT, claim_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = 'Process queued background jobs with a pool of worker threads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--batch-size', type=int, default=10, help='Jobs claimed per poll, per thread')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument(
+            '--visibility-timeout', type=int, default=DEFAULT_VISIBILITY_TIMEOUT,
+            help='Seconds before a claimed but unfinished job is handed to another worker',
+        )
+        parser.add_argument('--once', action='store_true', help='Drain the ready jobs and exit')
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        self.processed = 0
+        self.failed = 0
+        self.counter_lock = threading.Lock()
+        prefix = f'{socket.gethostname()}:{os.getpid()}'
+
+        threads = [
+            threading.Thread(target=self.work, args=(f'{prefix}:{index}', options), daemon=True)
+            for index in range(options['threads'])
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f"Worker {prefix} started with {options['threads']} thread(s)")
+        if isinstance(caches['default'], LocMemCache):
+            # Jobs such as invalidate_pages only reach the web servers through a shared cache
+            self.stderr.write(self.style.WARNING(
+                'The default cache is local to this process; cache updates made by jobs will not reach other processes.'
+            ))
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=0.5)
+        except KeyboardInterrupt:
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+        self.stdout.write(f'Processed {self.processed} job(s), {self.failed} failed')
+
+    def work(self, worker_id, options):
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                jobs = claim_jobs(worker_id, options['batch_size'], options['visibility_timeout'])
+                if not jobs:
+                    if options['once']:
+                        return
+                    self.stop.wait(options['poll_interval'])
+                    continue
+                for job in jobs:
+                    succeeded = run_job(job)
+                    with self.counter_lock:
+                        self.processed += 1
+                        self.failed += not succeeded
+        finally:
+            connection.close()
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from main import seeding
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed deterministic sample advertisers, creators, campaigns, applications and content. '
+        f'Seeded users log in with the password "{seeding.SEED_PASSWORD}".'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=1, help='Data size multiplier')
+        parser.add_argument('--prefix', default='seed', help='Username prefix for the seeded users')
+        parser.add_argument('--clear', action='store_true', help='First delete users previously seeded with this prefix')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            seeding.clear(prefix=options['prefix'])
+        seeded = seeding.seed(options['scale'], prefix=options['prefix'])
+        summary = ', '.join(f'{count} {name}' for name, count in seeded.counts().items())
+        self.stdout.write(self.style.SUCCESS(f'Seeded {summary}.'))
@@ -0,0 +1,121 @@
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.db.models import Sum
+
+from main.models import Application, Campaign, UserProfile
+
+
+class Command(BaseCommand):
+    help = (
+        'Hammer campaign budgets with concurrent view updates from many threads, check that no '
+        'campaign is overspent and report updates per second per campaign. Uses throwaway data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--campaigns', type=int, default=2)
+        parser.add_argument('--threads', type=int, default=8, help='Threads (and creators) per campaign')
+        parser.add_argument('--updates', type=int, default=25, help='View updates per thread')
+        parser.add_argument('--budget', default='100.00', help='Budget per campaign, in Rs')
+        parser.add_argument('--step', type=int, default=10, help='Views added per update (10 views = Rs 1)')
+        parser.add_argument('--keep', action='store_true', help='Keep the generated data afterwards')
+
+    def handle(self, *args, **options):
+        run = uuid.uuid4().hex[:8]
+        users = []
+        try:
+            campaigns, applications = self.create_fixtures(run, users, options)
+            stats = {campaign.pk: {'updates': 0, 'rejected': 0, 'errors': 0} for campaign in campaigns}
+            stats_lock = threading.Lock()
+            failures = []
+            start = threading.Barrier(len(applications))
+
+            def worker(application):
+                counts = {'updates': 0, 'rejected': 0, 'errors': 0}
+                try:
+                    start.wait()
+                    views = 0
+                    for _ in range(options['updates']):
+                        views += options['step']
+                        try:
+                            application.update_views_and_earnings(views)
+                            counts['updates'] += 1
+                        except ValidationError:
+                            counts['rejected'] += 1
+                        except Exception as exc:
+                            counts['errors'] += 1
+                            failures.append(repr(exc))
+                finally:
+                    with stats_lock:
+                        for key, value in counts.items():
+                            stats[application.campaign_id][key] += value
+                    close_old_connections()
+                    connection.close()
+
+            threads = [threading.Thread(target=worker, args=(application,)) for application in applications]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+
+            overspent = []
+            for campaign in Campaign.objects.filter(pk__in=stats).order_by('pk'):
+                earned = campaign.applications.aggregate(total=Sum('earnings'))['total'] or Decimal('0.00')
+                counts = stats[campaign.pk]
+                self.stdout.write(
+                    f'campaign {campaign.pk}: {counts["updates"]} updates, {counts["rejected"]} rejected, '
+                    f'{counts["errors"]} errors in {elapsed:.2f}s ({counts["updates"] / elapsed:.1f} updates/s); '
+                    f'budget {campaign.budget} spent {campaign.spent} remaining {campaign.remaining} earned {earned}'
+                )
+                if (
+                    campaign.remaining < 0
+                    or campaign.spent > campaign.budget
+                    or campaign.spent != earned
+                    or campaign.spent + campaign.remaining != campaign.budget
+                ):
+                    overspent.append(campaign.pk)
+            if overspent:
+                raise CommandError(f'Budget ledger is inconsistent for campaign(s) {overspent}')
+            if any(counts['errors'] for counts in stats.values()):
+                raise CommandError(f'Some updates failed with errors: {failures[:3]}')
+            self.stdout.write('No campaign was overspent.')
+        finally:
+            if not options['keep']:
+                # Profiles, campaigns and applications cascade from the users
+                User.objects.filter(pk__in=users).delete()
+
+    def create_fixtures(self, run, users, options):
+        advertiser_user = User.objects.create_user(f'stress-advertiser-{run}')
+        users.append(advertiser_user.pk)
+        advertiser = UserProfile.objects.create(user=advertiser_user, user_type='advertiser')
+        creators = []
+        for index in range(options['threads']):
+            user = User.objects.create_user(f'stress-creator-{run}-{index}')
+            users.append(user.pk)
+            creators.append(UserProfile.objects.create(user=user, user_type='creator'))
+
+        campaigns, applications = [], []
+        for index in range(options['campaigns']):
+            campaign = Campaign.objects.create(
+                advertiser=advertiser,
+                title=f'Stress test {run} #{index}',
+                description='Generated by stress_campaign_budget',
+                requirements='-',
+                budget=Decimal(options['budget']),
+                status='active',
+                is_public=False,
+            )
+            campaigns.append(campaign)
+            for creator in creators:
+                applications.append(Application.objects.create(
+                    campaign=campaign, creator=creator, proposal='-', estimated_views=1000, status='approved'
+                ))
+        return campaigns, applications
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+
+from main.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = "Find creator profiles whose total_views/total_earnings drifted from their content and approved applications"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', action='store_true', help='Rewrite drifted totals with the recomputed values')
+
+    def handle(self, *args, **options):
+        profiles = UserProfile.objects.with_expected_totals().filter(
+            ~Q(total_views=F('expected_views')) | ~Q(total_earnings=F('expected_earnings'))
+        ).select_related('user')
+
+        drifted = []
+        for profile in profiles.iterator():
+            drifted.append(profile.pk)
+            self.stdout.write(
+                f'{profile.user.username}: views {profile.total_views} != {profile.expected_views}, '
+                f'earnings {profile.total_earnings} != {profile.expected_earnings}'
+            )
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS('All profile totals are consistent.'))
+        elif options['repair']:
+            UserProfile.objects.filter(pk__in=drifted).recompute_totals()
+            self.stdout.write(self.style.SUCCESS(f'Repaired {len(drifted)} profile(s).'))
+        else:
+            self.stdout.write(self.style.WARNING(f'{len(drifted)} profile(s) drifted; rerun with --repair to fix.'))
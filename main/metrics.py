@@ -0,0 +1,210 @@
+"""In-process request metrics: per-view histograms and Prometheus text exposition
+
+RequestMetricsMiddleware (main/middleware.py) fills a RequestStats for each sampled request
+and hands it to registry.observe(). SQL is timed by time_query, an execute wrapper on every
+database connection, and template render time by the TimedDjangoTemplates backend; both add
+to the RequestStats of the request being served, which follows the request's context into
+the threads sync_to_async runs its queries on.
+Aggregates live in this process only; with several workers, scrape each one.
+"""
+import contextvars
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import Counter
+
+from django.template.backends.django import DjangoTemplates
+
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+# Bounds the number of (view, fingerprint) series kept for duplicate queries
+MAX_DUPLICATE_SERIES = 500
+
+_current = contextvars.ContextVar('request_stats', default=None)
+
+
+def fingerprint(sql):
+    """Short stable id for a parameterized SQL statement"""
+    normalized = re.sub(r'\s+', ' ', sql).strip()
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+
+class RequestStats:
+    """SQL and template timings for one request"""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.statements = Counter()
+
+    def record_query(self, sql, duration):
+        self.queries += 1
+        self.sql_time += duration
+        self.statements[sql] += 1
+
+    def duplicates(self):
+        """{sql: executions} for statements run more than once in this request"""
+        return {sql: count for sql, count in self.statements.items() if count > 1}
+
+    def activate(self):
+        return _current.set(self)
+
+    @staticmethod
+    def deactivate(token):
+        _current.reset(token)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Thread-safe per-view aggregates"""
+
+    HISTOGRAMS = {
+        'neptok_request_duration_seconds': ('Time spent in the view, templates included', DURATION_BUCKETS),
+        'neptok_request_sql_seconds': ('Time spent executing SQL per sampled request', DURATION_BUCKETS),
+        'neptok_request_template_seconds': ('Time spent rendering templates per sampled request', DURATION_BUCKETS),
+        'neptok_request_queries': ('SQL queries per sampled request', QUERY_COUNT_BUCKETS),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {name: {} for name in self.HISTOGRAMS}
+            self._requests = Counter()
+            self._duplicates = Counter()
+            self._duplicate_sql = {}
+
+    def _observe(self, name, view, value):
+        histogram = self._histograms[name].get(view)
+        if histogram is None:
+            histogram = self._histograms[name][view] = Histogram(self.HISTOGRAMS[name][1])
+        histogram.observe(value)
+
+    def observe(self, view, status, duration, stats=None):
+        duplicates = stats.duplicates() if stats is not None else {}
+        with self._lock:
+            self._requests[view, status] += 1
+            self._observe('neptok_request_duration_seconds', view, duration)
+            if stats is None:
+                return
+            self._observe('neptok_request_sql_seconds', view, stats.sql_time)
+            self._observe('neptok_request_template_seconds', view, stats.template_time)
+            self._observe('neptok_request_queries', view, stats.queries)
+            for sql, count in duplicates.items():
+                key = (view, fingerprint(sql))
+                if key not in self._duplicates:
+                    if len(self._duplicates) >= MAX_DUPLICATE_SERIES:
+                        continue
+                    self._duplicate_sql[key[1]] = sql
+                    logger.info('Duplicate query %s in %s: %s', key[1], view, sql)
+                self._duplicates[key] += count - 1
+
+    def duplicate_statements(self):
+        """{fingerprint: sql} for every duplicate query seen, to look up a metric's fingerprint label"""
+        with self._lock:
+            return dict(self._duplicate_sql)
+
+    def render(self):
+        """The aggregates in the Prometheus text exposition format"""
+        with self._lock:
+            lines = [
+                '# HELP neptok_requests_total Requests handled, by view and status code',
+                '# TYPE neptok_requests_total counter',
+            ]
+            for (view, status), count in sorted(self._requests.items()):
+                lines.append(f'neptok_requests_total{{view="{_escape(view)}",status="{status}"}} {count}')
+
+            for name, (help_text, _) in self.HISTOGRAMS.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for view, histogram in sorted(self._histograms[name].items()):
+                    label = f'view="{_escape(view)}"'
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{label},le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_bucket{{{label},le="+Inf"}} {histogram.count}')
+                    lines.append(f'{name}_sum{{{label}}} {histogram.sum:.6f}')
+                    lines.append(f'{name}_count{{{label}}} {histogram.count}')
+
+            lines.append('# HELP neptok_duplicate_queries_total Repeated executions of one SQL statement within a request')
+            lines.append('# TYPE neptok_duplicate_queries_total counter')
+            for (view, digest), count in sorted(self._duplicates.items()):
+                lines.append(f'neptok_duplicate_queries_total{{view="{_escape(view)}",fingerprint="{digest}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
+
+
+def time_query(execute, sql, params, many, context):
+    """Database execute wrapper adding each statement's time to the current request's stats"""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.record_query(sql, time.perf_counter() - started)
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """connection_created receiver adding time_query to the connection, once"""
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+class TimedTemplate:
+    """Wraps a backend template so its render time is added to the current request's stats"""
+
+    def __init__(self, template):
+        self.template = template
+        self.origin = template.origin
+
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None:
+            return self.template.render(context, request)
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            stats.template_time += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, with render time measured for request metrics"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
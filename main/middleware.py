@@ -0,0 +1,156 @@
+import mimetypes
+import random
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed, SuspiciousFileOperation
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+from .assets import ENCODING_SUFFIXES
+from .metrics import RequestStats, registry
+
+
+class RequestMetricsMiddleware:
+    """Record per-view latency, SQL and template timings and expose them as Server-Timing
+
+    Every request adds its duration to the in-process histograms. A METRICS_SAMPLE_RATE
+    fraction of requests is also sampled: their SQL and template render time are measured,
+    and statements repeated within the request are spotted. Sampled responses carry a
+    Server-Timing header. Works in sync and async middleware chains alike.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.enabled = getattr(settings, 'METRICS_ENABLED', True)
+        self.sample_rate = getattr(settings, 'METRICS_SAMPLE_RATE', 1.0)
+        self.server_timing = getattr(settings, 'METRICS_SERVER_TIMING', True)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        stats = self.sample()
+        started = time.perf_counter()
+        token = stats.activate() if stats else None
+        try:
+            response = self.get_response(request)
+        finally:
+            if token:
+                RequestStats.deactivate(token)
+        return self.record(request, response, stats, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+
+        stats = self.sample()
+        started = time.perf_counter()
+        token = stats.activate() if stats else None
+        try:
+            response = await self.get_response(request)
+        finally:
+            if token:
+                RequestStats.deactivate(token)
+        return self.record(request, response, stats, time.perf_counter() - started)
+
+    def sample(self):
+        """A RequestStats to fill if this request is sampled, else None"""
+        return RequestStats() if self.sample_rate >= 1 or random.random() < self.sample_rate else None
+
+    def record(self, request, response, stats, duration):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unmatched'
+        registry.observe(view, response.status_code, duration, stats)
+        if stats is not None and self.server_timing:
+            response['Server-Timing'] = ', '.join([
+                f'view;dur={duration * 1000:.1f}',
+                f'sql;dur={stats.sql_time * 1000:.1f};desc="{stats.queries} queries"',
+                f'tpl;dur={stats.template_time * 1000:.1f}',
+            ])
+        return response
+
+
+class StaticAssetsMiddleware:
+    """Serve collected static files precompressed, caching content-hashed names for a year
+
+    Active with USE_BUILT_ASSETS, after build_assets has filled STATIC_ROOT. Names from the
+    staticfiles manifest change whenever their content does, so they are sent as immutable;
+    other files may change in place and are cached for STATIC_MAX_AGE seconds. The .br or
+    .gz copy written by collectstatic is sent to clients that accept it.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'USE_BUILT_ASSETS', False) or not settings.STATIC_ROOT:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefix = urlsplit(settings.STATIC_URL).path
+        self.root = Path(settings.STATIC_ROOT)
+        self.hashed_names = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+        self.max_age = getattr(settings, 'STATIC_MAX_AGE', 60)
+
+    def __call__(self, request):
+        if request.method not in ('GET', 'HEAD') or not request.path_info.startswith(self.prefix):
+            return self.get_response(request)
+        name = request.path_info[len(self.prefix):]
+        try:
+            path = Path(safe_join(self.root, name))
+        except SuspiciousFileOperation:
+            return self.get_response(request)
+        if not path.is_file():
+            return self.get_response(request)
+
+        variants = {
+            encoding: path.with_name(path.name + suffix) for encoding, suffix in ENCODING_SUFFIXES.items()
+            if path.with_name(path.name + suffix).is_file()
+        }
+        accepted = self.accepted_encodings(request)
+        encoding = next((encoding for encoding in variants if encoding in accepted), None)
+        served = variants[encoding] if encoding else path
+
+        modified = path.stat().st_mtime
+        if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), modified):
+            response = HttpResponseNotModified()
+        else:
+            content_type, _ = mimetypes.guess_type(path.name)
+            response = FileResponse(
+                served.open('rb'), filename=path.name, content_type=content_type or 'application/octet-stream'
+            )
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['Last-Modified'] = http_date(modified)
+        if variants:
+            response['Vary'] = 'Accept-Encoding'
+        if name in self.hashed_names:
+            response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        else:
+            response['Cache-Control'] = f'public, max-age={self.max_age}'
+        return response
+
+    @staticmethod
+    def accepted_encodings(request):
+        accepted = set()
+        for token in request.headers.get('Accept-Encoding', '').split(','):
+            coding, _, params = token.partition(';')
+            quality = params.strip().removeprefix('q=')
+            try:
+                if params and float(quality) == 0:
+                    continue
+            except ValueError:
+                continue
+            accepted.add(coding.strip().lower())
+        return accepted
@@ -0,0 +1,55 @@
+# Campaign spend ledger: spent and remaining columns, filled from approved earnings.
+# Hand-written; reversing it folds spent back out of budget.
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def populate_ledger(apps, schema_editor):
+    Campaign = apps.get_model('main', 'Campaign')
+    Application = apps.get_model('main', 'Application')
+    db_alias = schema_editor.connection.alias
+    approved_earnings = Application.objects.using(db_alias).filter(
+        campaign=models.OuterRef('pk'), status='approved'
+    ).values('campaign').annotate(total=models.Sum('earnings')).values('total')
+    spent = Coalesce(
+        models.Subquery(approved_earnings),
+        models.Value(Decimal('0.00')),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+    )
+    # decrease_budget_by_earnings_increase took approved earnings out of budget in place, so
+    # add them back to recover the original budget; the SET clause sees the old budget, which
+    # is what remains
+    Campaign.objects.using(db_alias).update(
+        spent=spent, budget=models.F('budget') + spent, remaining=models.F('budget')
+    )
+
+
+def unpopulate_ledger(apps, schema_editor):
+    # Take approved earnings back out of budget, as decrease_budget_by_earnings_increase kept it
+    Campaign = apps.get_model('main', 'Campaign')
+    db_alias = schema_editor.connection.alias
+    Campaign.objects.using(db_alias).update(budget=models.F('budget') - models.F('spent'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_remove_plan_is_popular_plan_description'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='campaign',
+            name='spent',
+            field=models.DecimalField(decimal_places=2, default=0.0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='campaign',
+            name='remaining',
+            field=models.DecimalField(decimal_places=2, default=0.0, max_digits=10),
+        ),
+        migrations.RunPython(populate_ledger, unpopulate_ledger),
+    ]
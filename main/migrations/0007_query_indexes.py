@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:06
+
+from django.db import migrations, models
+
+
+def remove_duplicate_applications(apps, schema_editor):
+    """Keep one application per creator and campaign, so the unique constraint can be added
+
+    The kept row is the approved one, else the one with the most earnings, else the oldest.
+    Approved rows removed give their earnings back to the campaign ledger and their views and
+    earnings back out of the creator's totals.
+    """
+    Application = apps.get_model('main', 'Application')
+    Campaign = apps.get_model('main', 'Campaign')
+    UserProfile = apps.get_model('main', 'UserProfile')
+    db_alias = schema_editor.connection.alias
+    applications = Application.objects.using(db_alias)
+    duplicated = applications.values('creator', 'campaign').annotate(count=models.Count('id')).filter(count__gt=1)
+    for pair in duplicated:
+        rows = sorted(
+            applications.filter(creator=pair['creator'], campaign=pair['campaign']),
+            key=lambda application: (application.status != 'approved', -application.earnings, application.pk),
+        )
+        for application in rows[1:]:
+            if application.status == 'approved':
+                Campaign.objects.using(db_alias).filter(pk=application.campaign_id).update(
+                    spent=models.F('spent') - application.earnings,
+                    remaining=models.F('remaining') + application.earnings,
+                )
+                UserProfile.objects.using(db_alias).filter(pk=application.creator_id).update(
+                    total_views=models.F('total_views') - application.views,
+                    total_earnings=models.F('total_earnings') - application.earnings,
+                )
+            application.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_campaign_spend_ledger'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['campaign', 'status'], name='application_campaign_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['creator', 'status'], name='application_creator_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['creator', 'applied_at', 'id'], name='application_creator_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['campaign', 'applied_at', 'id'], name='application_campaign_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='campaign',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['status', 'created_at', 'id'], name='campaign_public_listing_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='campaign',
+            index=models.Index(fields=['advertiser', 'created_at', 'id'], name='campaign_advertiser_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='content',
+            index=models.Index(fields=['creator', 'created_at', 'id'], name='content_creator_time_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_applications, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='application',
+            constraint=models.UniqueConstraint(fields=('creator', 'campaign'), name='unique_application_per_campaign'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='campaign',
+            name='cpm_paisa',
+            field=models.PositiveIntegerField(default=10000),
+        ),
+    ]
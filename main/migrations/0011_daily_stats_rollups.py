@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_campaign_rate_card'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CampaignDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('views', models.BigIntegerField(default=0)),
+                ('spend', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('campaign', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='main.campaign')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('campaign', 'date'), name='campaign_daily_stats_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CreatorDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('views', models.BigIntegerField(default=0)),
+                ('earnings', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('campaign', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='creator_daily_stats', to='main.campaign')),
+                ('creator', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='main.userprofile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='creator_stats_date_idx'), models.Index(fields=['campaign', 'date'], name='creator_stats_campaign_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('campaign__isnull', False)), fields=('creator', 'campaign', 'date'), name='creator_daily_stats_unique'), models.UniqueConstraint(condition=models.Q(('campaign__isnull', True)), fields=('creator', 'date'), name='creator_daily_content_stats_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:31
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0011_daily_stats_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ViewBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('start', models.DateTimeField()),
+                ('views', models.BigIntegerField(default=0)),
+                ('updates', models.PositiveIntegerField(default=0)),
+                ('application', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='view_buckets', to='main.application')),
+                ('content', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='view_buckets', to='main.content')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['resolution', 'start'], name='view_bucket_time_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(models.Q(('application__isnull', True), ('content__isnull', False)), models.Q(('application__isnull', False), ('content__isnull', True)), _connector='OR'), name='view_bucket_one_target'), models.UniqueConstraint(condition=models.Q(('content__isnull', False)), fields=('content', 'resolution', 'start'), name='view_bucket_content_unique'), models.UniqueConstraint(condition=models.Q(('application__isnull', False)), fields=('application', 'resolution', 'start'), name='view_bucket_application_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ViewEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField()),
+                ('recorded_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('application', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='view_events', to='main.application')),
+                ('content', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='view_events', to='main.content')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['recorded_at'], name='view_event_time_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(models.Q(('application__isnull', True), ('content__isnull', False)), models.Q(('application__isnull', False), ('content__isnull', True)), _connector='OR'), name='view_event_one_target')],
+            },
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Campaign full-text search index: an FTS5 table kept in sync with main_campaign by triggers.
+# SQLite only; other databases search with icontains filters (main/search.py).
+
+from django.db import migrations
+
+
+CREATE_INDEX = [
+    """
+    CREATE VIRTUAL TABLE main_campaign_fts USING fts5(
+        title, description, requirements,
+        content='main_campaign', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER main_campaign_fts_insert AFTER INSERT ON main_campaign BEGIN
+        INSERT INTO main_campaign_fts (rowid, title, description, requirements)
+        VALUES (new.id, new.title, new.description, new.requirements);
+    END
+    """,
+    """
+    CREATE TRIGGER main_campaign_fts_delete AFTER DELETE ON main_campaign BEGIN
+        INSERT INTO main_campaign_fts (main_campaign_fts, rowid, title, description, requirements)
+        VALUES ('delete', old.id, old.title, old.description, old.requirements);
+    END
+    """,
+    # Only text columns: the ledger's frequent spent/remaining updates leave the index alone
+    """
+    CREATE TRIGGER main_campaign_fts_update AFTER UPDATE OF title, description, requirements ON main_campaign BEGIN
+        INSERT INTO main_campaign_fts (main_campaign_fts, rowid, title, description, requirements)
+        VALUES ('delete', old.id, old.title, old.description, old.requirements);
+        INSERT INTO main_campaign_fts (rowid, title, description, requirements)
+        VALUES (new.id, new.title, new.description, new.requirements);
+    END
+    """,
+    "INSERT INTO main_campaign_fts (main_campaign_fts) VALUES ('rebuild')",
+]
+
+DROP_INDEX = [
+    'DROP TRIGGER IF EXISTS main_campaign_fts_update',
+    'DROP TRIGGER IF EXISTS main_campaign_fts_delete',
+    'DROP TRIGGER IF EXISTS main_campaign_fts_insert',
+    'DROP TABLE IF EXISTS main_campaign_fts',
+]
+
+
+def run_on_sqlite(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0012_view_event_log'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_sqlite(CREATE_INDEX), run_on_sqlite(DROP_INDEX)),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_campaign_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='creatordailystats',
+            index=models.Index(fields=['creator', 'date'], name='creator_stats_creator_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0015_campaign_list_validator_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='viewevent',
+            index=models.Index(fields=['content', 'recorded_at'], name='view_event_content_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='viewevent',
+            index=models.Index(fields=['application', 'recorded_at'], name='view_event_application_idx'),
+        ),
+    ]
@@ -1,8 +1,12 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Coalesce, TruncDate
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+from . import rates
 
 class Plan(models.Model):
     name=models.CharField(max_length=100, unique=True)
@@ -16,6 +20,108 @@ class Plan(models.Model):
         return self.name
 
 
+class Payment(models.Model):
+    """Khalti payment, recorded once per token so verification is idempotent"""
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('verified', 'Verified'),
+        ('failed', 'Failed'),
+    ]
+    
+    token = models.CharField(max_length=255, unique=True)
+    amount = models.PositiveIntegerField(help_text="Amount in paisa")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='payments')
+    # Set while one worker is verifying the token with Khalti; others wait for its result
+    claimed_until = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    verified_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.token} - {self.status}"
+
+
+class Job(models.Model):
+    """Queued background work, processed by `manage.py run_worker` with at-least-once delivery"""
+    
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('failed', 'Failed'),
+    ]
+    
+    kind = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    # Enqueueing a key that is already queued is a no-op
+    dedupe_key = models.CharField(max_length=200, null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    # Visibility timeout: a running job whose lock expired is handed to another worker
+    locked_until = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedupe_key'], condition=models.Q(status='queued'), name='unique_queued_job_key'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_ready_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} ({self.status})"
+
+
+def _creator_sum(model, field, output_field, **filters):
+    """Per-creator SUM(field) over model as a correlated subquery, zero when there are no rows"""
+    totals = model.objects.filter(creator=models.OuterRef('pk'), **filters).values('creator').annotate(
+        total=models.Sum(field)
+    ).values('total')
+    zero = Decimal('0.00') if isinstance(output_field, models.DecimalField) else 0
+    return Coalesce(models.Subquery(totals), models.Value(zero), output_field=output_field)
+
+class UserProfileQuerySet(models.QuerySet):
+    """Custom queryset for user profiles"""
+    
+    def _expected_totals(self):
+        money = models.DecimalField(max_digits=10, decimal_places=2)
+        views = (
+            _creator_sum(Content, 'views', models.IntegerField())
+            + _creator_sum(Application, 'views', models.IntegerField(), status='approved')
+        )
+        earnings = (
+            _creator_sum(Content, 'earnings', money)
+            + _creator_sum(Application, 'earnings', money, status='approved')
+        )
+        return views, earnings
+    
+    def with_expected_totals(self):
+        """Annotate the totals recomputed from content and approved applications"""
+        views, earnings = self._expected_totals()
+        return self.annotate(expected_views=views, expected_earnings=earnings)
+    
+    def recompute_totals(self):
+        """Rewrite totals from content and approved applications in a single UPDATE"""
+        views, earnings = self._expected_totals()
+        return self.update(total_views=views, total_earnings=earnings, updated_at=timezone.now())
+
+def _per_row(values, output_field):
+    """CASE expression giving each primary key in values its own value, for one UPDATE over many rows"""
+    return models.Case(
+        *[models.When(pk=pk, then=models.Value(value)) for pk, value in values.items()],
+        default=models.Value(0),
+        output_field=output_field,
+    )
+
 class UserProfile(models.Model):
     """Extended user profile with user type and additional information"""
     
@@ -34,12 +140,76 @@ class UserProfile(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = UserProfileQuerySet.as_manager()
+    
     def __str__(self):
         return f"{self.user.username} - {self.user_type}"
     
     def calculate_earnings(self):
-        """Calculate earnings based on views using fixed rate of 100 Rs per 1000 views"""
-        return (self.total_views / 1000) * 100
+        """Earnings for the profile's total views at the default rate"""
+        return rates.earnings(self.total_views)
+    
+    @classmethod
+    def add_to_totals(cls, profile_id, views=0, earnings=0):
+        """Apply signed deltas to a profile's totals with F() expressions"""
+        if not views and not earnings:
+            return
+        cls.objects.filter(pk=profile_id).update(
+            total_views=models.F('total_views') + views,
+            total_earnings=models.F('total_earnings') + earnings,
+            updated_at=timezone.now(),
+        )
+    
+    @classmethod
+    def add_many_to_totals(cls, deltas):
+        """Apply {profile_id: (views, earnings)} signed deltas to many profiles in one UPDATE"""
+        deltas = {profile_id: delta for profile_id, delta in deltas.items() if any(delta)}
+        if not deltas:
+            return
+        views = _per_row({profile_id: views for profile_id, (views, _) in deltas.items()}, models.IntegerField())
+        earnings = _per_row(
+            {profile_id: earnings for profile_id, (_, earnings) in deltas.items()},
+            models.DecimalField(max_digits=10, decimal_places=2),
+        )
+        cls.objects.filter(pk__in=deltas).update(
+            total_views=models.F('total_views') + views,
+            total_earnings=models.F('total_earnings') + earnings,
+            updated_at=timezone.now(),
+        )
+    
+    def recompute_totals(self):
+        """Rebuild total views and earnings from content and approved applications"""
+        # One UPDATE with subqueries, so it can't overwrite a concurrent delta it didn't see
+        UserProfile.objects.filter(pk=self.pk).recompute_totals()
+        self.refresh_from_db(fields=['total_views', 'total_earnings', 'updated_at'])
+
+class CampaignQuerySet(models.QuerySet):
+    """Custom queryset for campaigns"""
+    
+    def with_stats(self):
+        """Annotate the application count so listings don't issue a COUNT per campaign
+        
+        A correlated subquery rather than JOIN + GROUP BY, so a paginated listing walks its
+        index in order and counts only the rows on the page.
+        """
+        applications_count = Application.objects.filter(
+            campaign=models.OuterRef('pk')
+        ).values('campaign').annotate(count=models.Count('pk')).values('count')
+        return self.annotate(
+            stats_applications_count=Coalesce(models.Subquery(applications_count), models.Value(0))
+        )
+    
+    def rebuild_ledger(self):
+        """Recompute spent and remaining from approved application earnings in one UPDATE"""
+        approved_earnings = Application.objects.filter(
+            campaign=models.OuterRef('pk'), status='approved'
+        ).values('campaign').annotate(total=models.Sum('earnings')).values('total')
+        spent = Coalesce(
+            models.Subquery(approved_earnings),
+            models.Value(Decimal('0.00')),
+            output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        )
+        return self.update(spent=spent, remaining=models.F('budget') - spent, updated_at=timezone.now())
 
 class Campaign(models.Model):
     """Campaign model for advertisers to create campaigns"""
@@ -55,23 +225,79 @@ class Campaign(models.Model):
     description = models.TextField()
     requirements = models.TextField()
     budget = models.DecimalField(max_digits=10, decimal_places=2)
+    # Rate card: what creators earn per 1000 views, in paisa
+    cpm_paisa = models.PositiveIntegerField(default=rates.DEFAULT_CPM_PAISA)
+    # Spend ledger, maintained with F() updates; rebuild with `manage.py rebuild_campaign_ledger`
+    spent = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    remaining = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft')
     is_public = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = CampaignQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            # Public listing: filter on status, keyset-ordered by (created_at, id). Partial on
+            # is_public because boolean filters compile to a bare `WHERE is_public` predicate.
+            models.Index(
+                fields=['status', 'created_at', 'id'],
+                condition=models.Q(is_public=True),
+                name='campaign_public_listing_idx',
+            ),
+            # Advertiser dashboard
+            models.Index(fields=['advertiser', 'created_at', 'id'], name='campaign_advertiser_idx'),
+            # The API list's validator (main/api.py): the newest edit, and a count of listed
+            # campaigns. is_public is a column of the second so the count never reads the table.
+            models.Index(fields=['updated_at'], name='campaign_updated_idx'),
+            models.Index(
+                fields=['status', 'is_public'], condition=models.Q(is_public=True), name='campaign_listed_count_idx'
+            ),
+        ]
+    
     def __str__(self):
         return self.title
     
+    def save(self, *args, **kwargs):
+        """Keep remaining in step with budget without writing back a stale spent value"""
+        if self._state.adding:
+            self.remaining = Decimal(self.budget) - Decimal(self.spent)
+            super().save(*args, **kwargs)
+            return
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            update_fields = [field.name for field in self._meta.concrete_fields if not field.primary_key]
+        update_fields = set(update_fields) - {'spent', 'remaining'}
+        if 'budget' in update_fields:
+            update_fields.add('remaining')
+            # The SET clause sees the old budget, so compute from the new value
+            self.remaining = models.Value(
+                Decimal(self.budget), output_field=models.DecimalField(max_digits=10, decimal_places=2)
+            ) - models.F('spent')
+        kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+        if 'remaining' in update_fields:
+            self.refresh_from_db(fields=['spent', 'remaining'])
+    
     def get_applications_count(self):
+        if hasattr(self, 'stats_applications_count'):
+            return self.stats_applications_count
         return self.applications.count()
     
+    @property
+    def cpm_rate(self):
+        """Rate card CPM in rupees"""
+        return rates.to_rupees(self.cpm_paisa)
+    
+    def earnings_for(self, views):
+        """Creator earnings for views at this campaign's rate"""
+        return rates.earnings(views, self.cpm_paisa)
+    
     def get_remaining_budget(self):
-        """Calculate remaining budget by subtracting total earnings from approved applications"""
-        total_spent = self.applications.filter(status='approved').aggregate(
-            total=models.Sum('earnings')
-        )['total'] or Decimal('0.00')
-        return self.budget - total_spent
+        """Remaining budget from the spend ledger"""
+        return self.remaining
     
     def can_pay_earnings_increase(self, current_earnings, new_earnings):
         """Check if campaign budget can accommodate earnings increase"""
@@ -79,19 +305,116 @@ class Campaign(models.Model):
             return True  # No increase, always allowed
         
         earnings_increase = new_earnings - current_earnings
-        remaining_budget = self.get_remaining_budget()
-        return remaining_budget >= earnings_increase
+        return self.remaining >= earnings_increase
+    
+    def record_spend(self, amount):
+        """Apply a signed spend delta to the ledger with F() expressions"""
+        if not amount:
+            return
+        Campaign.objects.filter(pk=self.pk).update(
+            spent=models.F('spent') + amount,
+            remaining=models.F('remaining') - amount,
+            updated_at=timezone.now(),
+        )
+        self.refresh_from_db(fields=['spent', 'remaining', 'updated_at'])
+    
+    def spend_within_budget(self, amount):
+        """Record spend only if the remaining budget covers it, returning whether it was recorded
+        
+        The check and the deduction are one conditional UPDATE, so concurrent spenders
+        can never take the campaign below zero and no row lock is held across a read.
+        """
+        spent = Campaign.objects.filter(pk=self.pk, remaining__gte=amount).update(
+            spent=models.F('spent') + amount,
+            remaining=models.F('remaining') - amount,
+            updated_at=timezone.now(),
+        )
+        if spent:
+            self.refresh_from_db(fields=['spent', 'remaining', 'updated_at'])
+        return bool(spent)
     
     def decrease_budget_by_earnings_increase(self, current_earnings, new_earnings):
-        """Decrease campaign budget by the earnings increase amount"""
+        """Record the earnings increase as spend against the campaign budget"""
         if new_earnings > current_earnings:
-            earnings_increase = new_earnings - current_earnings
-            if self.can_pay_earnings_increase(current_earnings, new_earnings):
-                self.budget = self.budget - earnings_increase
-                self.save()
-                return True
+            return self.spend_within_budget(new_earnings - current_earnings)
         return False
 
+def campaign_cpm(field='campaign'):
+    """The rate of the campaign referenced by field, as a subquery usable in UPDATE statements"""
+    rate = Campaign.objects.filter(pk=models.OuterRef(field)).values('cpm_paisa')[:1]
+    return Coalesce(models.Subquery(rate), models.Value(rates.DEFAULT_CPM_PAISA))
+
+
+class ApplicationQuerySet(models.QuerySet):
+    """Custom queryset for applications"""
+    
+    def _rated_earnings(self):
+        rate = campaign_cpm()
+        return rates.earnings_expression('views', rate), rates.earnings_expression('estimated_views', rate)
+    
+    def stale_earnings(self):
+        """Applications whose stored amounts differ from their campaign's rate card"""
+        earnings, estimated_earnings = self._rated_earnings()
+        return self.filter(~models.Q(earnings=earnings) | ~models.Q(estimated_earnings=estimated_earnings))
+    
+    def recompute_earnings(self):
+        """Recompute earnings and estimated earnings at each campaign's rate in one UPDATE
+        
+        Only rows whose amounts change are written. The campaign ledgers and profile totals
+        are not touched; rebuild them afterwards.
+        """
+        earnings, estimated_earnings = self._rated_earnings()
+        return self.stale_earnings().update(
+            earnings=earnings, estimated_earnings=estimated_earnings, updated_at=timezone.now()
+        )
+    
+    def set_status(self, status):
+        """Move every application in the queryset to status with one UPDATE, returning the ids changed
+        
+        Already-earned money moves in or out of the campaign ledgers, creator totals and
+        rollups as in Application.set_status. The spend of every affected campaign is checked
+        and recorded by one conditional UPDATE: if any campaign can't cover its share, nothing
+        changes and ValidationError names the campaigns.
+        """
+        with transaction.atomic():
+            rows = list(
+                self.exclude(status=status).select_for_update(of=('self',))
+                .values_list('pk', 'campaign_id', 'creator_id', 'status', 'views', 'earnings')
+            )
+            if not rows:
+                return []
+            spend, creator_totals, rollups = {}, {}, {}
+            for _, campaign_id, creator_id, current, views, earnings in rows:
+                sign = (status == 'approved') - (current == 'approved')
+                if not sign or not (views or earnings):
+                    continue
+                spend[campaign_id] = spend.get(campaign_id, 0) + sign * earnings
+                creator_views, creator_earnings = creator_totals.get(creator_id, (0, 0))
+                creator_totals[creator_id] = (creator_views + sign * views, creator_earnings + sign * earnings)
+                rollup_views, rollup_earnings = rollups.get((creator_id, campaign_id), (0, 0))
+                rollups[(creator_id, campaign_id)] = (rollup_views + sign * views, rollup_earnings + sign * earnings)
+            
+            if spend:
+                amount = _per_row(spend, models.DecimalField(max_digits=10, decimal_places=2))
+                refunds = [campaign_id for campaign_id, total in spend.items() if total <= 0]
+                charged = Campaign.objects.filter(
+                    models.Q(remaining__gte=amount) | models.Q(pk__in=refunds), pk__in=spend
+                ).update(
+                    spent=models.F('spent') + amount, remaining=models.F('remaining') - amount, updated_at=timezone.now()
+                )
+                if charged != len(spend):
+                    short = Campaign.objects.filter(pk__in=spend, remaining__lt=amount).values_list('title', flat=True)
+                    raise ValidationError(
+                        f"Campaign budget insufficient to pay already-earned amounts: {', '.join(short)}"
+                    )
+            
+            ids = [row[0] for row in rows]
+            self.filter(pk__in=ids).update(status=status, updated_at=timezone.now())
+            UserProfile.add_many_to_totals(creator_totals)
+            record_many_daily_stats(rollups)
+        return ids
+
+
 class Application(models.Model):
     """Application model for creators to apply for campaigns"""
     STATUS_CHOICES = [
@@ -101,8 +424,9 @@ class Application(models.Model):
         ('completed', 'Completed'),
     ]
     
-    campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE, related_name='applications')
-    creator = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='applications')
+    # The (campaign, status) and (creator, status) indexes in Meta lead with these columns
+    campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE, related_name='applications', db_index=False)
+    creator = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='applications', db_index=False)
     proposal = models.TextField()
     estimated_views = models.IntegerField(validators=[MinValueValidator(0)])
     estimated_earnings = models.DecimalField(max_digits=10, decimal_places=2)
@@ -113,20 +437,32 @@ class Application(models.Model):
     applied_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ApplicationQuerySet.as_manager()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['creator', 'campaign'], name='unique_application_per_campaign'),
+        ]
+        indexes = [
+            models.Index(fields=['campaign', 'status'], name='application_campaign_idx'),
+            models.Index(fields=['creator', 'status'], name='application_creator_idx'),
+            # Keyset-ordered listings for creators and advertisers
+            models.Index(fields=['creator', 'applied_at', 'id'], name='application_creator_time_idx'),
+            models.Index(fields=['campaign', 'applied_at', 'id'], name='application_campaign_time_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.creator.user.username} - {self.campaign.title}"
     
     def save(self, *args, **kwargs):
-        """Calculate estimated earnings before saving using fixed rate of 100 Rs per 1000 views"""
-        if self.estimated_views:
-            self.estimated_earnings = Decimal(self.estimated_views) / Decimal('1000') * Decimal('100')
+        """Calculate estimated earnings at the campaign's rate before saving"""
+        if self.estimated_views is not None:
+            self.estimated_earnings = self.campaign.earnings_for(self.estimated_views)
         super().save(*args, **kwargs)
 
     def calculate_earnings(self):
-        """Calculate actual earnings from actual views using fixed rate of 100 Rs per 1000 views"""
-        if self.views > 0:
-            return Decimal(self.views) / Decimal('1000') * Decimal('100')
-        return Decimal('0.00')
+        """Calculate actual earnings from actual views at the campaign's rate"""
+        return self.campaign.earnings_for(self.views)
     
     def update_views_and_earnings(self, new_views):
         """Update views and earnings with budget validation"""
@@ -136,22 +472,47 @@ class Application(models.Model):
         if self.status != 'approved':
             raise ValidationError("Can only update views for approved applications")
         
-        old_earnings = self.earnings
-        new_earnings = Decimal(new_views) / Decimal('1000') * Decimal('100')
-        
-        # Check if campaign budget can accommodate the earnings increase
-        if not self.campaign.can_pay_earnings_increase(old_earnings, new_earnings):
-            raise ValidationError("Campaign budget insufficient to pay the earnings increase")
+        new_earnings = self.campaign.earnings_for(new_views)
         
-        # Update views and earnings
-        self.views = new_views
-        self.earnings = new_earnings
-        self.save()
-        
-        # Decrease campaign budget by the earnings increase
-        self.campaign.decrease_budget_by_earnings_increase(old_earnings, new_earnings)
+        with transaction.atomic():
+            # Deltas are taken against the locked row, not this possibly stale instance
+            current = Application.objects.select_for_update().only('status', 'views', 'earnings').get(pk=self.pk)
+            if current.status != 'approved':
+                raise ValidationError("Can only update views for approved applications")
+            increase = new_earnings - current.earnings
+            if increase > 0:
+                if not self.campaign.spend_within_budget(increase):
+                    raise ValidationError("Campaign budget insufficient to pay the earnings increase")
+            else:
+                self.campaign.record_spend(increase)
+            
+            self.views = new_views
+            self.earnings = new_earnings
+            self.save(update_fields=['views', 'earnings', 'updated_at'])
+            UserProfile.add_to_totals(self.creator_id, views=new_views - current.views, earnings=increase)
+            record_daily_stats(self.creator_id, self.campaign_id, views=new_views - current.views, earnings=increase)
+            ViewEvent.record(new_views - current.views, application=self)
         
         return self.earnings
+    
+    def set_status(self, status):
+        """Change status, moving already-earned money in or out of the ledger and creator totals"""
+        Application.objects.filter(pk=self.pk).set_status(status)
+        self.refresh_from_db(fields=['status', 'views', 'earnings', 'updated_at'])
+        if Application.campaign.is_cached(self):
+            self.campaign.refresh_from_db(fields=['spent', 'remaining', 'updated_at'])
+
+class ContentQuerySet(models.QuerySet):
+    """Custom queryset for content"""
+    
+    def stale_earnings(self):
+        """Content whose stored earnings differ from its rate"""
+        return self.filter(~models.Q(earnings=rates.earnings_expression('views', campaign_cpm())))
+    
+    def recompute_earnings(self):
+        """Recompute earnings at the linked campaign's rate, or the default rate, in one UPDATE"""
+        return self.stale_earnings().update(earnings=rates.earnings_expression('views', campaign_cpm()))
+
 
 class Content(models.Model):
     """Content model to track TikTok content and views"""
@@ -163,12 +524,299 @@ class Content(models.Model):
     earnings = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = ContentQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['creator', 'created_at', 'id'], name='content_creator_time_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.title} - {self.creator.user.username}"
     
     def calculate_earnings(self):
-        """Calculate earnings based on views using fixed rate of 100 Rs per 1000 views"""
-        if self.views > 0:
-            return Decimal(self.views) / Decimal('1000') * Decimal('100')
-        return Decimal('0.00')
+        """Calculate earnings at the linked campaign's rate, or the default rate"""
+        if self.campaign_id:
+            return self.campaign.earnings_for(self.views)
+        return rates.earnings(self.views)
+    
+    def update_views_and_earnings(self, new_views):
+        """Update views and earnings, applying the change to the creator's totals"""
+        if new_views < 0:
+            raise ValidationError("Views must be non-negative")
+        
+        with transaction.atomic():
+            # Deltas are taken against the locked row, not this possibly stale instance
+            current = Content.objects.select_for_update().only('views', 'earnings').get(pk=self.pk)
+            self.views = new_views
+            self.earnings = self.calculate_earnings()
+            self.save(update_fields=['views', 'earnings'])
+            views_delta, earnings_delta = self.views - current.views, self.earnings - current.earnings
+            UserProfile.add_to_totals(self.creator_id, views=views_delta, earnings=earnings_delta)
+            record_daily_stats(self.creator_id, views=views_delta, earnings=earnings_delta)
+            ViewEvent.record(views_delta, content=self)
+        return self.earnings
+
+
+def _add_to_rollup(model, keys, **deltas):
+    """Apply signed deltas to the rollup row for keys with F() expressions, creating it on first use"""
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    changes = {field: models.F(field) + delta for field, delta in deltas.items()}
+    if model.objects.filter(**keys).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**keys, **deltas)
+    except IntegrityError:
+        # Another request created the row after our UPDATE found nothing
+        model.objects.filter(**keys).update(**changes)
+
+
+def _add_many_to_rollup(model, deltas):
+    """Apply {keys: {field: signed delta}} to many rollup rows with one CASE UPDATE
+    
+    keys is a tuple of (field, value) pairs naming a row, with the same fields for every row.
+    Rows that don't exist yet are inserted empty, skipping any that another request created
+    meanwhile, and updated again.
+    """
+    deltas = {keys: changes for keys, changes in deltas.items() if any(changes.values())}
+    if not deltas:
+        return
+    
+    def rows(keys_list):
+        match = models.Q()
+        for keys in keys_list:
+            match |= models.Q(**dict(keys))
+        return model.objects.filter(match)
+    
+    def update(keys_list):
+        fields = next(iter(deltas.values()))
+        return rows(keys_list).update(**{
+            field: models.F(field) + models.Case(
+                *[models.When(**dict(keys), then=models.Value(deltas[keys][field])) for keys in keys_list],
+                default=models.Value(0),
+                output_field=model._meta.get_field(field),
+            )
+            for field in fields
+        })
+    
+    if update(deltas) == len(deltas):
+        return
+    key_fields = [field for field, _ in next(iter(deltas))]
+    existing = {tuple(zip(key_fields, values)) for values in rows(deltas).values_list(*key_fields)}
+    missing = [keys for keys in deltas if keys not in existing]
+    model.objects.bulk_create([model(**dict(keys)) for keys in missing], ignore_conflicts=True)
+    update(missing)
+
+
+class CampaignDailyStats(models.Model):
+    """Approved application views and spend on a campaign, per day
+    
+    Each row holds the changes made that day. Rows are updated incrementally as views and
+    statuses change, so analytics read a row per day instead of scanning applications.
+    """
+    
+    campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE, related_name='daily_stats')
+    date = models.DateField()
+    views = models.BigIntegerField(default=0)
+    spend = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['campaign', 'date'], name='campaign_daily_stats_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.campaign_id} {self.date}: {self.views} views"
+    
+    @classmethod
+    def rebuild(cls, campaigns):
+        """Replace the campaigns' rollups with one row per campaign and day of last update
+        
+        Applications only keep running totals, so each one's views and earnings are dated at
+        its last update; the day-by-day history is lost.
+        """
+        with transaction.atomic():
+            cls.objects.filter(campaign__in=campaigns).delete()
+            rows = Application.objects.filter(campaign__in=campaigns, status='approved').values(
+                'campaign', day=TruncDate('updated_at')
+            ).annotate(total_views=models.Sum('views'), total_spend=models.Sum('earnings'))
+            return cls.objects.bulk_create(
+                (cls(campaign_id=row['campaign'], date=row['day'], views=row['total_views'], spend=row['total_spend'])
+                 for row in rows),
+                batch_size=500,
+            )
 
+
+class CreatorDailyStats(models.Model):
+    """A creator's views and earnings per day, per campaign for applications
+    
+    Content rows have no campaign. Like CampaignDailyStats, rows hold the changes made that
+    day and are updated incrementally.
+    """
+    
+    creator = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='daily_stats')
+    campaign = models.ForeignKey(
+        Campaign, on_delete=models.CASCADE, related_name='creator_daily_stats', null=True, blank=True
+    )
+    date = models.DateField()
+    views = models.BigIntegerField(default=0)
+    earnings = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    
+    class Meta:
+        constraints = [
+            # NULLs are distinct in a unique index, so content rows need their own constraint
+            models.UniqueConstraint(
+                fields=['creator', 'campaign', 'date'], condition=models.Q(campaign__isnull=False),
+                name='creator_daily_stats_unique',
+            ),
+            models.UniqueConstraint(
+                fields=['creator', 'date'], condition=models.Q(campaign__isnull=True),
+                name='creator_daily_content_stats_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='creator_stats_date_idx'),
+            models.Index(fields=['campaign', 'date'], name='creator_stats_campaign_idx'),
+            # A creator's daily history on their dashboard
+            models.Index(fields=['creator', 'date'], name='creator_stats_creator_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.creator_id} {self.date}: {self.views} views"
+    
+    @classmethod
+    def rebuild(cls, creators):
+        """Replace the creators' rollups, dating applications at their last update and content at creation"""
+        with transaction.atomic():
+            cls.objects.filter(creator__in=creators).delete()
+            sums = {'total_views': models.Sum('views'), 'total_earnings': models.Sum('earnings')}
+            rows = list(Application.objects.filter(creator__in=creators, status='approved').values(
+                'creator', 'campaign', day=TruncDate('updated_at')
+            ).annotate(**sums))
+            rows += Content.objects.filter(creator__in=creators).values(
+                'creator', day=TruncDate('created_at')
+            ).annotate(**sums)
+            return cls.objects.bulk_create(
+                (cls(
+                    creator_id=row['creator'], campaign_id=row.get('campaign'), date=row['day'],
+                    views=row['total_views'], earnings=row['total_earnings'],
+                ) for row in rows),
+                batch_size=500,
+            )
+
+
+def record_daily_stats(creator_id, campaign_id=None, views=0, earnings=0):
+    """Add today's view and earnings deltas to the rollups
+    
+    Pass campaign_id for approved application work, whose earnings are campaign spend, and
+    leave it out for content.
+    """
+    today = timezone.localdate()
+    if campaign_id is not None:
+        _add_to_rollup(CampaignDailyStats, {'campaign_id': campaign_id, 'date': today}, views=views, spend=earnings)
+    _add_to_rollup(
+        CreatorDailyStats, {'creator_id': creator_id, 'campaign_id': campaign_id, 'date': today},
+        views=views, earnings=earnings,
+    )
+
+
+def record_many_daily_stats(deltas):
+    """Add today's {(creator_id, campaign_id): (views, earnings)} deltas for application work
+    
+    The batch form of record_daily_stats: a fixed number of queries however many creators and
+    campaigns are involved.
+    """
+    today = timezone.localdate()
+    campaigns, creators = {}, {}
+    for (creator_id, campaign_id), (views, earnings) in deltas.items():
+        campaign = campaigns.setdefault((('campaign_id', campaign_id), ('date', today)), {'views': 0, 'spend': 0})
+        campaign['views'] += views
+        campaign['spend'] += earnings
+        creators[(('creator_id', creator_id), ('campaign_id', campaign_id), ('date', today))] = {
+            'views': views, 'earnings': earnings,
+        }
+    _add_many_to_rollup(CampaignDailyStats, campaigns)
+    _add_many_to_rollup(CreatorDailyStats, creators)
+
+
+def _one_view_target():
+    return (
+        models.Q(content__isnull=False, application__isnull=True)
+        | models.Q(content__isnull=True, application__isnull=False)
+    )
+
+
+class ViewEvent(models.Model):
+    """One change to the views of a piece of content or an application
+    
+    Events are append-only and short-lived: compaction (main/view_history.py) folds them into
+    hourly ViewBuckets once they are old enough and deletes them.
+    """
+    
+    content = models.ForeignKey(Content, on_delete=models.CASCADE, null=True, blank=True, related_name='view_events')
+    application = models.ForeignKey(
+        Application, on_delete=models.CASCADE, null=True, blank=True, related_name='view_events'
+    )
+    delta = models.IntegerField()
+    recorded_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        constraints = [
+            models.CheckConstraint(condition=_one_view_target(), name='view_event_one_target'),
+        ]
+        indexes = [
+            models.Index(fields=['recorded_at'], name='view_event_time_idx'),
+            # Recent history of one content or application (view_history.growth_rates)
+            models.Index(fields=['content', 'recorded_at'], name='view_event_content_idx'),
+            models.Index(fields=['application', 'recorded_at'], name='view_event_application_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.content_id or self.application_id} {self.delta:+d} at {self.recorded_at}"
+    
+    @classmethod
+    def record(cls, delta, content=None, application=None):
+        """Append an event for a views change; unchanged views aren't recorded"""
+        if delta:
+            cls.objects.create(content=content, application=application, delta=delta)
+
+
+class ViewBucket(models.Model):
+    """Views gained by a piece of content or an application over one hour or one day"""
+    
+    RESOLUTIONS = [
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+    
+    content = models.ForeignKey(Content, on_delete=models.CASCADE, null=True, blank=True, related_name='view_buckets')
+    application = models.ForeignKey(
+        Application, on_delete=models.CASCADE, null=True, blank=True, related_name='view_buckets'
+    )
+    resolution = models.CharField(max_length=4, choices=RESOLUTIONS)
+    start = models.DateTimeField()
+    views = models.BigIntegerField(default=0)
+    # Number of view updates folded into the bucket
+    updates = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.CheckConstraint(condition=_one_view_target(), name='view_bucket_one_target'),
+            models.UniqueConstraint(
+                fields=['content', 'resolution', 'start'], condition=models.Q(content__isnull=False),
+                name='view_bucket_content_unique',
+            ),
+            models.UniqueConstraint(
+                fields=['application', 'resolution', 'start'], condition=models.Q(application__isnull=False),
+                name='view_bucket_application_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['resolution', 'start'], name='view_bucket_time_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.content_id or self.application_id} {self.resolution} {self.start}: {self.views}"
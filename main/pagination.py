@@ -0,0 +1,117 @@
+from datetime import datetime
+
+from django.core import signing
+from django.db.models import Q
+
+
+CURSOR_SALT = 'main.pagination.cursor'
+DEFAULT_PAGE_SIZE = 20
+
+
+class KeysetPage:
+    """One page of a keyset-paginated queryset, newest first"""
+
+    def __init__(self, object_list, next_query=None, previous_query=None):
+        self.object_list = object_list
+        self.next_query = next_query
+        self.previous_query = previous_query
+
+    @property
+    def has_next(self):
+        return self.next_query is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_query is not None
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def encode_cursor(obj, field, direction):
+    """Build an opaque, signed token pointing just past obj in the given direction"""
+    return signing.dumps(
+        {'v': getattr(obj, field).isoformat(), 'id': obj.pk, 'd': direction},
+        salt=CURSOR_SALT,
+        compress=True,
+    )
+
+
+def decode_cursor(token):
+    """Return (value, id, direction) for a cursor token, or None if it is missing or tampered with"""
+    if not token:
+        return None
+    try:
+        data = signing.loads(token, salt=CURSOR_SALT)
+        return datetime.fromisoformat(data['v']), int(data['id']), data['d']
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        return None
+
+
+def paginate_keyset(request, queryset, field='created_at', param='cursor', page_size=DEFAULT_PAGE_SIZE):
+    """Paginate a queryset on (field, id) descending using cursor tokens from request.GET[param]
+
+    Each page is fetched with a range filter on the indexed sort key rather than OFFSET,
+    so deep pages cost the same as the first one.
+    """
+    cursor = decode_cursor(request.GET.get(param))
+    if cursor and cursor[2] == 'prev':
+        value, pk, _ = cursor
+        rows = list(
+            queryset.filter(Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': pk}))
+            .order_by(field, 'pk')[:page_size + 1]
+        )
+        has_previous = len(rows) > page_size
+        rows = rows[:page_size][::-1]
+        has_next = True
+    else:
+        if cursor:
+            value, pk, _ = cursor
+            queryset = queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk}))
+        rows = list(queryset.order_by(f'-{field}', '-pk')[:page_size + 1])
+        has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        has_previous = cursor is not None
+
+    def query_for(obj, direction):
+        params = request.GET.copy()
+        params[param] = encode_cursor(obj, field, direction)
+        return params.urlencode()
+
+    return KeysetPage(
+        rows,
+        next_query=query_for(rows[-1], 'next') if rows and has_next else None,
+        previous_query=query_for(rows[0], 'prev') if rows and has_previous else None,
+    )
+
+
+def paginate_offset(request, queryset, param='page', page_size=DEFAULT_PAGE_SIZE):
+    """Paginate an already ordered queryset by page number from request.GET[param]
+
+    For orderings with no indexed key to seek on, such as search relevance. Deep pages cost
+    more than early ones, so keep it to small, filtered result sets.
+    """
+    try:
+        number = max(int(request.GET.get(param, 1)), 1)
+    except ValueError:
+        number = 1
+    start = (number - 1) * page_size
+    rows = list(queryset[start:start + page_size + 1])
+    has_next = len(rows) > page_size
+
+    def query_for(target):
+        params = request.GET.copy()
+        params[param] = str(target)
+        return params.urlencode()
+
+    return KeysetPage(
+        rows[:page_size],
+        next_query=query_for(number + 1) if has_next else None,
+        previous_query=query_for(number - 1) if number > 1 else None,
+    )
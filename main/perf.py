@@ -0,0 +1,156 @@
+"""Per-endpoint performance measurements: SQL query count and wall time
+
+ENDPOINTS describes one request for every route in main/urls.py: who makes it, how, and the
+most queries it may issue. Budgets are declared for a cold page cache. A page's query count
+must also stay the same as the seeded data grows, since a count that rises with row count is
+an N+1 in a view or template.
+"""
+import json
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+
+class Endpoint:
+    """One request against a named route
+
+    as_user is 'advertiser', 'creator' or None for an anonymous visitor. args and data may be
+    callables taking the SeededData, for requests that need ids of seeded rows.
+    """
+
+    def __init__(self, name, budget, as_user=None, method='get', args=None, data=None, json_body=False, headers=None):
+        self.name = name
+        self.budget = budget
+        self.as_user = as_user
+        self.method = method
+        self.args = args
+        self.data = data
+        self.json_body = json_body
+        self.headers = headers or {}
+
+    def __repr__(self):
+        method = '' if self.method == 'get' else f' {self.method.upper()}'
+        return f'<Endpoint {self.name}{method} as {self.as_user or "anonymous"}>'
+
+    def resolve(self, seeded):
+        args = self.args(seeded) if callable(self.args) else self.args
+        data = self.data(seeded) if callable(self.data) else self.data
+        return reverse(self.name, args=args), data
+
+
+def _creator_campaigns(seeded):
+    creator = seeded.creators[0]
+    return {application.campaign_id for application in seeded.applications if application.creator_id == creator.pk}
+
+
+def _campaign_to_apply_for(seeded):
+    applied = _creator_campaigns(seeded)
+    return [next(campaign.pk for campaign in seeded.campaigns if campaign.is_public and campaign.pk not in applied)]
+
+
+def _public_campaign(seeded):
+    return [next(campaign.pk for campaign in seeded.campaigns if campaign.is_public)]
+
+
+def _own_content(seeded):
+    return next(content for content in seeded.contents if content.creator_id == seeded.creators[0].pk)
+
+
+def _own_approved_application(seeded):
+    return next(
+        application for application in seeded.applications
+        if application.creator_id == seeded.creators[0].pk and application.status == 'approved'
+    )
+
+
+def _bulk_updates(seeded):
+    contents = [content for content in seeded.contents if content.creator_id == seeded.creators[0].pk][:5]
+    applications = [
+        application for application in seeded.applications
+        if application.creator_id == seeded.creators[0].pk and application.status == 'approved'
+    ][:5]
+    return (
+        [{'type': 'content', 'id': content.pk, 'views': content.views + 100} for content in contents]
+        + [{'type': 'application', 'id': application.pk, 'views': application.views + 100} for application in applications]
+    )
+
+
+def _pending_applications(seeded):
+    # Every pending applicant of the advertiser: the selection grows with scale, the queries must not
+    campaigns = {campaign.pk for campaign in seeded.campaigns if campaign.advertiser_id == seeded.advertisers[0].pk}
+    return {
+        'action': 'approve',
+        'application_id': [
+            application.pk for application in seeded.applications
+            if application.campaign_id in campaigns and application.status == 'pending'
+        ],
+    }
+
+
+ENDPOINTS = [
+    Endpoint('home', budget=0),
+    Endpoint('login', budget=0),
+    Endpoint('register', budget=0),
+    Endpoint('logout', budget=4, as_user='creator'),
+    Endpoint('guest_login', budget=0),
+    Endpoint('campaigns', budget=1),
+    Endpoint('campaigns', budget=3, as_user='creator'),
+    Endpoint('campaigns', budget=2, data={'q': 'brand campaign'}),
+    Endpoint('dashboard', budget=5, as_user='advertiser'),
+    Endpoint('advertiser_dashboard', budget=5, as_user='advertiser'),
+    Endpoint('creator_dashboard', budget=12, as_user='creator'),
+    Endpoint('my_applications', budget=3, as_user='creator'),
+    Endpoint('advertiser_applications', budget=3, as_user='advertiser'),
+    Endpoint(
+        'advertiser_applications', budget=6, as_user='advertiser', method='post', data=_pending_applications,
+        headers={'X-Requested-With': 'XMLHttpRequest'},
+    ),
+    Endpoint('get_withdraw', budget=0),
+    Endpoint('verify_khalti_payment', budget=0, method='post', data={}, json_body=True),
+    Endpoint('carousel', budget=0),
+    Endpoint('explore', budget=1),
+    Endpoint('create_campaign', budget=2, as_user='advertiser'),
+    Endpoint('campaign_detail', budget=1, args=_public_campaign),
+    Endpoint('apply_campaign', budget=4, as_user='creator', args=_campaign_to_apply_for),
+    Endpoint('campaign_analytics', budget=5, as_user='advertiser', args=lambda seeded: [seeded.campaigns[0].pk]),
+    Endpoint('leaderboard', budget=1),
+    Endpoint('api_campaigns', budget=2),
+    Endpoint('api_campaign_detail', budget=1, args=_public_campaign),
+    Endpoint('add_content', budget=2, as_user='creator'),
+    Endpoint(
+        'update_views', budget=14, as_user='creator', method='post', json_body=True,
+        args=lambda seeded: [_own_content(seeded).pk],
+        data=lambda seeded: {'views': _own_content(seeded).views + 100},
+    ),
+    Endpoint(
+        'update_application_views', budget=18, as_user='creator', method='post', json_body=True,
+        args=lambda seeded: [_own_approved_application(seeded).pk],
+        data=lambda seeded: {'views': _own_approved_application(seeded).views + 100},
+    ),
+    Endpoint('metrics', budget=0),
+    Endpoint('update_views_bulk', budget=30, as_user='creator', method='post', json_body=True, data=_bulk_updates),
+]
+
+
+def measure(endpoint, seeded):
+    """Make the endpoint's request on a cold page cache, returning (status, queries, seconds)"""
+    client = Client()
+    if endpoint.as_user:
+        client.force_login(getattr(seeded, f'{endpoint.as_user}s')[0].user)
+    url, data = endpoint.resolve(seeded)
+    cache.clear()
+
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        if endpoint.json_body:
+            response = getattr(client, endpoint.method)(
+                url, json.dumps(data), content_type='application/json', headers=endpoint.headers
+            )
+        else:
+            response = getattr(client, endpoint.method)(url, data, headers=endpoint.headers)
+        elapsed = time.perf_counter() - started
+    return response.status_code, len(queries), elapsed
@@ -0,0 +1,68 @@
+"""Earnings rate engine
+
+Creators earn a campaign's rate card: a CPM, the amount paid per 1000 views, stored in
+integer paisa. Earnings are computed in whole paisa, rounded down so a creator is never paid
+for a fraction of a paisa, and only converted to rupees at the edge, for the DecimalField
+columns. The same rule is available as Python functions for single rows and as database
+expressions for bulk annotations and updates, and the two always agree.
+"""
+from decimal import Decimal
+
+from django.db import models
+
+
+PAISA_PER_RUPEE = 100
+# Rs 100 per 1000 views, the platform rate for content not tied to a campaign
+DEFAULT_CPM_PAISA = 100 * PAISA_PER_RUPEE
+
+
+def earnings_paisa(views, cpm_paisa=DEFAULT_CPM_PAISA):
+    """Earnings for views at a CPM, in whole paisa"""
+    if views <= 0:
+        return 0
+    return views * cpm_paisa // 1000
+
+
+def to_rupees(paisa):
+    return Decimal(paisa).scaleb(-2)
+
+
+def earnings(views, cpm_paisa=DEFAULT_CPM_PAISA):
+    """Earnings for views at a CPM, in rupees with two decimal places"""
+    return to_rupees(earnings_paisa(views, cpm_paisa))
+
+
+class EarningsPaisa(models.Func):
+    """Database form of earnings_paisa(): views * cpm_paisa / 1000 in integer arithmetic"""
+
+    output_field = models.BigIntegerField()
+
+    def __init__(self, views, cpm_paisa, **extra):
+        super().__init__(views, cpm_paisa, **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        (views, views_params), (rate, rate_params) = (
+            compiler.compile(expression) for expression in self.get_source_expressions()
+        )
+        if connection.vendor == 'mysql':
+            sql = f'(CAST({views} AS SIGNED) * {rate} DIV 1000)'
+        else:
+            # Widen before multiplying so large view counts can't overflow a 32-bit integer
+            sql = f'(CAST({views} AS BIGINT) * {rate} / 1000)'
+        return f'(CASE WHEN {views} > 0 THEN {sql} ELSE 0 END)', [*views_params, *views_params, *rate_params]
+
+
+class PaisaToRupees(models.Func):
+    """Database form of to_rupees()"""
+
+    template = 'CAST(%(expressions)s / 100.0 AS DECIMAL(12, 2))'
+    output_field = models.DecimalField(max_digits=12, decimal_places=2)
+
+
+def earnings_expression(views, cpm_paisa):
+    """Database expression for earnings(views, cpm_paisa), in rupees"""
+    if isinstance(views, str):
+        views = models.F(views)
+    if isinstance(cpm_paisa, int):
+        cpm_paisa = models.Value(cpm_paisa)
+    return PaisaToRupees(EarningsPaisa(views, cpm_paisa))
@@ -0,0 +1,115 @@
+"""Campaign full-text search
+
+On SQLite, campaigns are indexed in the main_campaign_fts FTS5 table, which triggers from
+migration 0013 keep in sync with main_campaign. Django alters SQLite tables by rebuilding them,
+which drops their triggers, so restore_index_triggers() recreates them after every migrate.
+
+Every search term must match, as a word prefix, and results are ranked by BM25 with title
+matches weighted highest. A broad query keeps only its best MAX_RANKED_MATCHES matches among
+the campaigns searched, so the sort keeps a bounded set however many campaigns match. Other
+databases fall back to icontains filters, newest first.
+"""
+import re
+
+from django.db import connections
+from django.db.models import Q
+
+from .models import Campaign
+
+
+FTS_TABLE = 'main_campaign_fts'
+# BM25 column weights for title, description and requirements
+BM25_WEIGHTS = (10.0, 4.0, 1.0)
+MAX_QUERY_TERMS = 8
+MAX_RANKED_MATCHES = 1000
+
+
+# The triggers of migration 0013, by name
+INDEX_TRIGGERS = {
+    f'{FTS_TABLE}_insert': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON main_campaign BEGIN
+            INSERT INTO {FTS_TABLE} (rowid, title, description, requirements)
+            VALUES (new.id, new.title, new.description, new.requirements);
+        END
+    """,
+    f'{FTS_TABLE}_delete': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON main_campaign BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, title, description, requirements)
+            VALUES ('delete', old.id, old.title, old.description, old.requirements);
+        END
+    """,
+    f'{FTS_TABLE}_update': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update
+        AFTER UPDATE OF title, description, requirements ON main_campaign BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, title, description, requirements)
+            VALUES ('delete', old.id, old.title, old.description, old.requirements);
+            INSERT INTO {FTS_TABLE} (rowid, title, description, requirements)
+            VALUES (new.id, new.title, new.description, new.requirements);
+        END
+    """,
+}
+
+
+def missing_index_triggers(connection):
+    """Names of the index triggers absent from a SQLite database that has the index table"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT type, name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existing = cursor.fetchall()
+    if ('table', FTS_TABLE) not in existing:
+        return []
+    return [name for name in INDEX_TRIGGERS if ('trigger', name) not in existing]
+
+
+def restore_index_triggers(sender, using, **kwargs):
+    """post_migrate receiver recreating missing index triggers and reindexing what they missed"""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    missing = missing_index_triggers(connection)
+    if not missing:
+        return
+    with connection.cursor() as cursor:
+        for name in missing:
+            cursor.execute(INDEX_TRIGGERS[name])
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def query_terms(query):
+    """The words of a search box query, without FTS5 syntax characters"""
+    return re.findall(r'\w+', query or '')[:MAX_QUERY_TERMS]
+
+
+def match_expression(terms):
+    """FTS5 MATCH expression requiring every term as a prefix, e.g. "bran"* "launc"*"""
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_campaigns(queryset, query):
+    """Narrow a campaign queryset to matches for a search box query, best match first
+
+    Only the best MAX_RANKED_MATCHES matches of the queryset are returned, so apply any
+    filters before searching; the result is sliced and can't be filtered further.
+    """
+    terms = query_terms(query)
+    if not terms:
+        return queryset.none()
+
+    if connections[queryset.db].vendor != 'sqlite':
+        condition = Q()
+        for term in terms:
+            condition &= Q(title__icontains=term) | Q(description__icontains=term) | Q(requirements__icontains=term)
+        return queryset.filter(condition).order_by('-created_at', '-id')[:MAX_RANKED_MATCHES]
+
+    # extra() because the ORM can't join a table it has no model for; bm25() is only valid in
+    # a query that joins the FTS table and filters it with MATCH. The unary + keeps SQLite from
+    # looking the FTS table up by rowid inside a loop over campaigns, which reruns the full-text
+    # query for every campaign: it has to run MATCH once and fetch the matches by primary key.
+    # The cap is the outer LIMIT, so it counts matches that pass the caller's filters.
+    campaign_table = Campaign._meta.db_table
+    return queryset.extra(
+        select={'search_rank': f'bm25({FTS_TABLE}, %s, %s, %s)'},
+        select_params=BM25_WEIGHTS,
+        tables=[FTS_TABLE],
+        where=[f'+{FTS_TABLE}.rowid = {campaign_table}.id', f'{FTS_TABLE} MATCH %s'],
+        params=[match_expression(terms)],
+    ).order_by('search_rank', '-id')[:MAX_RANKED_MATCHES]
@@ -0,0 +1,148 @@
+"""Deterministic sample data for benchmarks, query-budget tests and local development
+
+seed(scale) bulk-creates advertisers, creators, campaigns, applications, content and plans
+whose row counts grow with scale, so the same endpoints can be measured at several sizes.
+The same scale and rng_seed always produce the same data.
+"""
+import random
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from . import rates
+from .models import (
+    Application, Campaign, CampaignDailyStats, Content, CreatorDailyStats, Job, Payment, Plan, UserProfile,
+)
+
+
+SEED_PASSWORD = 'neptok-seed'
+APPLICATIONS_PER_CAMPAIGN = 3
+# Rate cards cycled across seeded campaigns, in paisa per 1000 views
+CPM_RATES = (rates.DEFAULT_CPM_PAISA, 7500, 12550, 5000)
+
+
+class SeededData:
+    """The profiles and rows created by one seed() call, in creation order"""
+
+    def __init__(self, advertisers, creators, campaigns, applications, contents, plans):
+        self.advertisers = advertisers
+        self.creators = creators
+        self.campaigns = campaigns
+        self.applications = applications
+        self.contents = contents
+        self.plans = plans
+
+    def counts(self):
+        return {
+            'advertisers': len(self.advertisers),
+            'creators': len(self.creators),
+            'campaigns': len(self.campaigns),
+            'applications': len(self.applications),
+            'contents': len(self.contents),
+            'plans': len(self.plans),
+        }
+
+
+def _profiles(user_type, count, prefix, password):
+    users = User.objects.bulk_create(
+        User(username=f'{prefix}-{user_type}-{index}', email=f'{prefix}-{user_type}-{index}@example.com', password=password)
+        for index in range(count)
+    )
+    return UserProfile.objects.bulk_create(
+        UserProfile(user=user, user_type=user_type, tiktok_handle=f'@{user.username}' if user_type == 'creator' else None)
+        for user in users
+    )
+
+
+@transaction.atomic
+def seed(scale=1, prefix='seed', rng_seed=0):
+    """Create a deterministic data set whose size grows linearly with scale
+
+    Per scale unit: 2 advertisers with 5 campaigns each, 4 creators with 5 pieces of
+    content each, and 3 applications per campaign (mostly approved, with real views).
+    """
+    rng = random.Random(rng_seed)
+    password = make_password(SEED_PASSWORD)
+    advertisers = _profiles('advertiser', 2 * scale, prefix, password)
+    creators = _profiles('creator', 4 * scale, prefix, password)
+
+    campaigns = Campaign.objects.bulk_create(
+        Campaign(
+            advertiser=advertiser,
+            title=f'{advertiser.user.username} campaign {index}',
+            description='Seeded campaign for performance measurements.',
+            requirements='Post one TikTok video mentioning the brand.',
+            budget=Decimal('100000.00'),
+            remaining=Decimal('100000.00'),
+            cpm_paisa=CPM_RATES[index % len(CPM_RATES)],
+            status='active' if index % 5 else 'paused',
+            is_public=index % 7 != 6,
+        )
+        for advertiser in advertisers
+        for index in range(5 * scale)
+    )
+
+    applications = []
+    for campaign_index, campaign in enumerate(campaigns):
+        for offset in range(min(APPLICATIONS_PER_CAMPAIGN, len(creators))):
+            status = 'pending' if offset == 1 else 'approved'
+            views = rng.randrange(0, 50000) if status == 'approved' else 0
+            estimated_views = rng.randrange(1000, 100000)
+            applications.append(Application(
+                campaign=campaign,
+                creator=creators[(campaign_index + offset) % len(creators)],
+                proposal='Seeded application.',
+                estimated_views=estimated_views,
+                estimated_earnings=campaign.earnings_for(estimated_views),
+                views=views,
+                earnings=campaign.earnings_for(views),
+                status=status,
+            ))
+    applications = Application.objects.bulk_create(applications)
+
+    contents = []
+    for creator in creators:
+        for index in range(5 * scale):
+            views = rng.randrange(0, 200000)
+            campaign = campaigns[rng.randrange(len(campaigns))] if index % 2 else None
+            contents.append(Content(
+                creator=creator,
+                campaign=campaign,
+                title=f'{creator.user.username} video {index}',
+                description='Seeded content.',
+                views=views,
+                earnings=campaign.earnings_for(views) if campaign else rates.earnings(views),
+            ))
+    contents = Content.objects.bulk_create(contents)
+
+    plans = [
+        Plan.objects.get_or_create(name=name, defaults={
+            'description': f'{name} plan', 'price': price, 'duration': 'Monthly', 'features': 'Campaigns\nAnalytics',
+        })[0]
+        for name, price in (('Basic', Decimal('999.00')), ('Pro', Decimal('2999.00')), ('Enterprise', Decimal('9999.00')))
+    ]
+
+    # bulk_create skips the ledger, profile total and rollup bookkeeping; rebuild them from the rows
+    Campaign.objects.filter(pk__in=[campaign.pk for campaign in campaigns]).rebuild_ledger()
+    UserProfile.objects.filter(pk__in=[profile.pk for profile in advertisers + creators]).recompute_totals()
+    CampaignDailyStats.rebuild(campaigns)
+    CreatorDailyStats.rebuild(creators)
+    return SeededData(advertisers, creators, campaigns, applications, contents, plans)
+
+
+def clear(prefix=None):
+    """Delete seeded users, and by cascade their profiles, campaigns, applications and content
+    
+    With no prefix every user, plan, payment and job is deleted, which is only meant for
+    throwaway benchmark and test databases.
+    """
+    if prefix:
+        User.objects.filter(username__startswith=f'{prefix}-').delete()
+        return
+    Payment.objects.all().delete()
+    Plan.objects.all().delete()
+    User.objects.all().delete()
+    # Last, and outside a transaction, so jobs queued by the cascade's delete signals go too
+    Job.objects.all().delete()
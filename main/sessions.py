@@ -0,0 +1,128 @@
+"""Session engine keeping guest sessions in signed cookies and logged-in sessions in the database
+
+Sessions without a logged-in user (guest browsing, anonymous flash data) are stored in the
+session cookie itself, signed like Django's signed_cookies backend, so they never write or
+read a django_session row. Once a user logs in, the session moves to the database, where it
+lasts until it expires or is revoked server-side. Logging out moves it back to a cookie.
+Guest data that grows past GUEST_SESSION_MAX_BYTES is kept in the database as well.
+
+Database keys are 32 lowercase letters and digits; cookie keys are signed payloads, which
+always contain a ':' separator, so the key alone tells the two apart.
+"""
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.contrib.sessions.backends import db
+from django.core import signing
+from django.utils import timezone
+
+
+GUEST_SESSION_MAX_BYTES = getattr(settings, 'GUEST_SESSION_MAX_BYTES', 2048)
+PURGE_BATCH_SIZE = 5000
+SALT = 'main.sessions'
+
+
+def is_cookie_key(session_key):
+    return bool(session_key) and ':' in session_key
+
+
+class SessionStore(db.SessionStore):
+    """Database sessions for logged-in users, signed cookie sessions for everyone else"""
+
+    def _signed(self):
+        return signing.dumps(self._session, compress=True, salt=SALT, serializer=self.serializer)
+
+    def _cookie_payload(self):
+        """The signed cookie to store this session in, or None when it belongs in the database"""
+        if SESSION_KEY in self._session:
+            return None
+        payload = self._signed()
+        return payload if len(payload) <= GUEST_SESSION_MAX_BYTES else None
+
+    def load(self):
+        if not is_cookie_key(self.session_key):
+            return super().load()
+        try:
+            return signing.loads(
+                self.session_key, serializer=self.serializer, max_age=self.get_session_cookie_age(), salt=SALT
+            )
+        except Exception:
+            # Bad signature or expired: start a new session, as the signed_cookies backend does
+            self._session_key = None
+            self.modified = True
+            return {}
+
+    async def aload(self):
+        if not is_cookie_key(self.session_key):
+            return await super().aload()
+        return self.load()
+
+    def create(self):
+        if self._cookie_payload() is None:
+            return super().create()
+        # The key is the payload, written by save() once the request is done with the session
+        self._session_key = None
+        self.modified = True
+
+    async def acreate(self):
+        if self._cookie_payload() is None:
+            return await super().acreate()
+        return self.create()
+
+    def _save_cookie(self, payload):
+        if self.session_key and not is_cookie_key(self.session_key):
+            # A guest session leaving the database, e.g. on logout, takes its row with it
+            super().delete(self.session_key)
+        self._session_key = payload
+        self.modified = True
+
+    def save(self, must_create=False):
+        payload = self._cookie_payload()
+        if payload is not None:
+            return self._save_cookie(payload)
+        if is_cookie_key(self.session_key):
+            self._session_key = None
+        return super().save(must_create=must_create)
+
+    async def asave(self, must_create=False):
+        payload = self._cookie_payload()
+        if payload is not None:
+            return self._save_cookie(payload)
+        if is_cookie_key(self.session_key):
+            self._session_key = None
+        return await super().asave(must_create=must_create)
+
+    def exists(self, session_key):
+        return not is_cookie_key(session_key) and super().exists(session_key)
+
+    async def aexists(self, session_key):
+        return not is_cookie_key(session_key) and await super().aexists(session_key)
+
+    def delete(self, session_key=None):
+        if is_cookie_key(session_key or self.session_key):
+            # Nothing is stored server-side; the middleware replaces or clears the cookie
+            self.modified = True
+            return
+        super().delete(session_key)
+
+    async def adelete(self, session_key=None):
+        if is_cookie_key(session_key or self.session_key):
+            self.modified = True
+            return
+        await super().adelete(session_key)
+
+    @classmethod
+    def clear_expired(cls, batch_size=PURGE_BATCH_SIZE):
+        """Delete expired database sessions in batches, returning how many were deleted
+
+        Batches keep each delete's write lock short on a large table. Cookie sessions expire
+        on their own.
+        """
+        model = cls.get_model_class()
+        deleted = 0
+        while True:
+            keys = list(
+                model.objects.filter(expire_date__lt=timezone.now()).values_list('session_key', flat=True)[:batch_size]
+            )
+            if not keys:
+                return deleted
+            deleted += model.objects.filter(session_key__in=keys).delete()[0]
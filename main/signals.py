@@ -0,0 +1,29 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_pages
+from .jobs import enqueue
+from .models import Application, Campaign, Plan
+
+
+# Cached public pages that render each model's data
+CACHED_PAGES_BY_MODEL = {
+    Campaign: ('campaigns', 'campaign_detail'),
+    Application: ('campaigns', 'campaign_detail'),
+    Plan: ('explore',),
+}
+
+
+@receiver(post_save, sender=Campaign)
+@receiver(post_delete, sender=Campaign)
+@receiver(post_save, sender=Plan)
+@receiver(post_delete, sender=Plan)
+def invalidate_cached_pages(sender, **kwargs):
+    invalidate_pages(*CACHED_PAGES_BY_MODEL[sender])
+
+
+@receiver(post_save, sender=Application)
+@receiver(post_delete, sender=Application)
+def queue_cached_page_invalidation(sender, **kwargs):
+    # Applications change on every view update; a burst of them collapses into one queued job
+    enqueue('invalidate_pages', {'pages': CACHED_PAGES_BY_MODEL[sender]}, dedupe_key='invalidate_pages:application')
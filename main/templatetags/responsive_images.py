@@ -0,0 +1,35 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from ..images import FORMATS, load_manifest
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(name, alt, sizes='100vw', lazy=True, **attributes):
+    """<picture> offering the AVIF and WebP variants of a static image at every built width
+
+    Images are lazy loaded unless lazy=False, which is meant for the first image in view.
+    Extra keyword arguments become attributes of the <img>. Before build_images has run this
+    is a plain <img> of the original.
+    """
+    attributes = {'alt': alt, **attributes, 'decoding': 'async'}
+    if lazy:
+        attributes['loading'] = 'lazy'
+    img = format_html(
+        '<img src="{}"{}>', static(name), format_html_join('', ' {}="{}"', attributes.items())
+    )
+    entry = load_manifest().get(name)
+    if entry is None:
+        return img
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (mime_type, ', '.join(f'{static(variant["name"])} {variant["width"]}w' for variant in entry['variants'][image_format]), sizes)
+            for image_format, mime_type, _ in FORMATS
+            if image_format in entry['variants']
+        ),
+    )
+    return format_html('<picture>{}{}</picture>', sources, img)
@@ -1,3 +1,1208 @@
-from django.test import TestCase
+import asyncio
+import copy
+import gzip
+import json
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.models import QuerySet, Sum, Value
+from django.http import HttpResponse, QueryDict
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+from django.utils.http import http_date
+from unittest import mock, skipIf, skipUnless
+from urllib.parse import urlencode
+
+from neptok.cache import cache_config
+
+from . import images, khalti, rates, seeding, view_history
+from .api import list_etag
+from .assets import rewrite
+from .cache import get_or_build
+from .jobs import claim_jobs, enqueue, run_job
+from .khalti_stub import start_in_thread
+from .metrics import fingerprint, registry
+from .middleware import RequestMetricsMiddleware
+from .pagination import encode_cursor, paginate_keyset
+from .perf import ENDPOINTS, measure
+from .search import INDEX_TRIGGERS, missing_index_triggers, restore_index_triggers, search_campaigns
+from .sessions import SessionStore
+from .models import (
+    Application, Campaign, CampaignDailyStats, Content, CreatorDailyStats, Job, Payment, Plan,
+    UserProfile, ViewBucket, ViewEvent,
+)
+
+
+def create_profile(user_type, username=None):
+    """A profile whose user is named after its type, unless username is given"""
+    return UserProfile.objects.create(user=User.objects.create_user(username or user_type), user_type=user_type)
+
+
+def create_campaign(advertiser, title='Launch', **fields):
+    """A campaign with placeholder copy and a 1000 budget, unless fields say otherwise"""
+    fields = {'description': 'd', 'requirements': 'r', 'budget': 1000, **fields}
+    return Campaign.objects.create(advertiser=advertiser, title=title, **fields)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN assertions are SQLite specific')
+class QueryPlanTests(TestCase):
+    """Guard the hot query shapes against index regressions"""
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(f'INDEX {index_name}', plan, plan)
+
+    def test_public_campaign_listing(self):
+        queryset = Campaign.objects.filter(is_public=True, status='active').order_by('-created_at', '-id')[:21]
+        self.assertUsesIndex(queryset, 'campaign_public_listing_idx')
+        self.assertNotIn('TEMP B-TREE', queryset.explain())
+
+    def test_public_campaign_listing_with_stats(self):
+        queryset = (
+            Campaign.objects.filter(is_public=True, status='active').with_stats().order_by('-created_at', '-id')[:21]
+        )
+        self.assertUsesIndex(queryset, 'campaign_public_listing_idx')
+        self.assertNotIn('TEMP B-TREE', queryset.explain())
+
+    def test_advertiser_campaigns(self):
+        queryset = Campaign.objects.filter(advertiser_id=1).order_by('-created_at', '-id')[:21]
+        self.assertUsesIndex(queryset, 'campaign_advertiser_idx')
+        self.assertNotIn('TEMP B-TREE', queryset.explain())
+
+    def test_applications_by_campaign_and_status(self):
+        queryset = Application.objects.filter(campaign_id=1, status='approved')
+        self.assertUsesIndex(queryset, 'application_campaign_idx')
+
+    def test_applications_by_creator_and_status(self):
+        queryset = Application.objects.filter(creator_id=1, status='approved')
+        self.assertUsesIndex(queryset, 'application_creator_idx')
+
+    def test_creator_applications_listing(self):
+        queryset = Application.objects.filter(creator_id=1).order_by('-applied_at', '-id')[:21]
+        self.assertUsesIndex(queryset, 'application_creator_time_idx')
+        self.assertNotIn('TEMP B-TREE', queryset.explain())
+
+    def test_advertiser_applications_listing(self):
+        queryset = Application.objects.filter(campaign__advertiser_id=1).order_by('-applied_at', '-id')[:21]
+        self.assertUsesIndex(queryset, 'application_campaign_time_idx')
+
+    def test_creator_content_listing(self):
+        queryset = Content.objects.filter(creator_id=1).order_by('-created_at', '-id')[:21]
+        self.assertUsesIndex(queryset, 'content_creator_time_idx')
+        self.assertNotIn('TEMP B-TREE', queryset.explain())
+
+    def test_campaign_list_validator(self):
+        with CaptureQueriesContext(connection) as queries:
+            list_etag(RequestFactory().get('/'))
+        [query] = queries
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {query["sql"]}')
+            plan = '\n'.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('COVERING INDEX campaign_listed_count_idx', plan)
+        self.assertIn('COVERING INDEX campaign_updated_idx', plan)
+        self.assertNotIn('SCAN main_campaign', plan)
+
+    def test_view_history_of_one_target(self):
+        since = timezone.now()
+        self.assertUsesIndex(
+            ViewBucket.objects.filter(content__in=[1, 2], resolution__in=('hour', 'day'), start__gte=since),
+            'view_bucket_content_unique',
+        )
+        self.assertUsesIndex(
+            ViewEvent.objects.filter(application__in=[1, 2], recorded_at__gte=since), 'view_event_application_idx'
+        )
+
+    def test_creator_daily_history(self):
+        queryset = CreatorDailyStats.objects.filter(creator_id=1, date__gte=timezone.localdate()).values('date')
+        self.assertUsesIndex(queryset.annotate(total=Sum('views')), 'creator_stats_creator_idx')
+
+
+class ApplicationConstraintTests(TestCase):
+    def test_one_application_per_creator_and_campaign(self):
+        advertiser = create_profile('advertiser')
+        creator = create_profile('creator')
+        campaign = create_campaign(advertiser)
+        Application.objects.create(campaign=campaign, creator=creator, proposal='p', estimated_views=10)
+        with self.assertRaises(IntegrityError):
+            Application.objects.create(campaign=campaign, creator=creator, proposal='p', estimated_views=10)
+
+
+class BulkApplicationStatusTests(TestCase):
+    def setUp(self):
+        self.advertiser = create_profile('advertiser')
+        other = create_profile('advertiser', 'other')
+        self.campaign = create_campaign(self.advertiser)
+        other_campaign = create_campaign(other, 'Other')
+        self.creators = [
+            create_profile('creator', f'creator-{index}')
+            for index in range(3)
+        ]
+        self.applications = [
+            Application.objects.create(campaign=self.campaign, creator=creator, proposal='p', estimated_views=10)
+            for creator in self.creators
+        ]
+        self.foreign = Application.objects.create(
+            campaign=other_campaign, creator=self.creators[0], proposal='p', estimated_views=10
+        )
+        self.client.force_login(self.advertiser.user)
+
+    def post(self, action, applications, partial=True):
+        headers = {'X-Requested-With': 'XMLHttpRequest'} if partial else {}
+        return self.client.post(
+            reverse('advertiser_applications'),
+            {'action': action, 'application_id': [application.pk for application in applications]},
+            headers=headers,
+        )
+
+    def test_selection_changes_in_one_update_limited_to_own_campaigns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post('approve', self.applications[:2] + [self.foreign])
+        self.assertEqual(response.json(), {
+            'success': True, 'status': 'approved', 'updated': [application.pk for application in self.applications[:2]],
+        })
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "main_application"')]
+        self.assertEqual(len(updates), 1)
+        statuses = dict(Application.objects.values_list('pk', 'status'))
+        self.assertEqual(
+            [statuses[application.pk] for application in self.applications + [self.foreign]],
+            ['approved', 'approved', 'pending', 'pending'],
+        )
+
+    def test_earned_money_moves_with_status_and_budget_is_checked_once(self):
+        for application in self.applications[:2]:
+            application.set_status('approved')
+            application.update_views_and_earnings(3000)
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.remaining, Decimal('400.00'))
+
+        self.assertTrue(self.post('reject', self.applications).json()['success'])
+        self.campaign.refresh_from_db()
+        self.assertEqual((self.campaign.spent, self.campaign.remaining), (Decimal('0.00'), Decimal('1000.00')))
+        self.assertEqual(UserProfile.objects.get(pk=self.creators[0].pk).total_earnings, Decimal('0.00'))
+
+        # Re-approving both would move 600 back into the ledger, more than is left
+        Campaign.objects.filter(pk=self.campaign.pk).update(remaining=Decimal('500.00'))
+        response = self.post('approve', self.applications[:2])
+        self.assertEqual(response.json()['success'], False)
+        self.assertIn('Launch', response.json()['error'])
+        self.assertEqual(set(Application.objects.filter(campaign=self.campaign).values_list('status', flat=True)), {'rejected'})
+        self.assertEqual(Campaign.objects.get(pk=self.campaign.pk).remaining, Decimal('500.00'))
+
+        self.assertEqual(self.post('approve', self.applications[:1]).json()['updated'], [self.applications[0].pk])
+        self.assertEqual(Campaign.objects.get(pk=self.campaign.pk).remaining, Decimal('200.00'))
+
+    def test_rollups_change_in_one_update_per_table(self):
+        for application in self.applications:
+            application.set_status('approved')
+            application.update_views_and_earnings(1000)
+        self.foreign.set_status('approved')
+        self.foreign.update_views_and_earnings(2000)
+        
+        rejected = [self.applications[0].pk, self.applications[1].pk, self.foreign.pk]
+        with CaptureQueriesContext(connection) as queries:
+            Application.objects.filter(pk__in=rejected).set_status('rejected')
+        rollup_writes = [
+            query['sql'] for query in queries if re.match(r'(UPDATE|INSERT INTO) "main_\w+dailystats"', query['sql'])
+        ]
+        self.assertEqual(len(rollup_writes), 2)
+        today = timezone.localdate()
+        self.assertEqual(
+            dict(CampaignDailyStats.objects.filter(date=today).values_list('campaign', 'views')),
+            {self.campaign.pk: 1000, self.foreign.campaign_id: 0},
+        )
+        self.assertEqual(
+            sorted(CreatorDailyStats.objects.filter(date=today).values_list('creator', 'campaign', 'views')),
+            sorted([
+                (self.creators[0].pk, self.campaign.pk, 0), (self.creators[1].pk, self.campaign.pk, 0),
+                (self.creators[2].pk, self.campaign.pk, 1000), (self.creators[0].pk, self.foreign.campaign_id, 0),
+            ]),
+        )
+
+    def test_rollup_rows_are_created_on_first_use(self):
+        for application in self.applications:
+            Application.objects.filter(pk=application.pk).update(views=1000, earnings=Decimal('100.00'))
+        Application.objects.filter(campaign=self.campaign).set_status('approved')
+        self.assertEqual(
+            list(CampaignDailyStats.objects.values_list('views', 'spend')), [(3000, Decimal('300.00'))]
+        )
+        self.assertEqual(
+            sorted(CreatorDailyStats.objects.values_list('creator', 'views')),
+            [(creator.pk, 1000) for creator in self.creators],
+        )
+
+    def test_form_post_redirects_with_message(self):
+        response = self.post('reject', self.applications, partial=False)
+        self.assertRedirects(response, reverse('advertiser_applications'), fetch_redirect_response=False)
+        self.assertEqual(Application.objects.filter(status='rejected').count(), 3)
+        response = self.client.get(reverse('advertiser_applications'))
+        self.assertContains(response, '3 application(s) rejected.')
+        self.assertEqual(self.post('archive', self.applications).json(), {'success': False, 'error': 'Unknown action'})
+
+
+class EarningsRateTests(TestCase):
+    def setUp(self):
+        self.advertiser = create_profile('advertiser')
+        self.creator = create_profile('creator')
+
+    def test_database_expression_matches_python(self):
+        for cpm_paisa in (rates.DEFAULT_CPM_PAISA, 12550, 1):
+            for views in (0, 1, 7, 999, 1001, 123457, 3_000_000_000):
+                expression = rates.earnings_expression(Value(views), Value(cpm_paisa))
+                annotated = UserProfile.objects.annotate(amount=expression).values_list('amount', flat=True)[:1]
+                with self.subTest(views=views, cpm_paisa=cpm_paisa):
+                    self.assertEqual(annotated.get(), rates.earnings(views, cpm_paisa))
+
+    def test_database_expression_params_follow_its_sql(self):
+        compiler = UserProfile.objects.all().query.get_compiler(connection=connection)
+        sql, params = rates.EarningsPaisa(Value(7), Value(12550)).as_sql(compiler, connection)
+        # Placeholders in order: the CASE test on views, the widened views, the rate
+        self.assertEqual(sql, '(CASE WHEN %s > 0 THEN (CAST(%s AS BIGINT) * %s / 1000) ELSE 0 END)')
+        self.assertEqual(params, [7, 7, 12550])
+
+    def test_recompute_command_applies_new_rate(self):
+        campaign = create_campaign(self.advertiser)
+        application = Application.objects.create(
+            campaign=campaign, creator=self.creator, proposal='p', estimated_views=1000, status='approved'
+        )
+        application.update_views_and_earnings(2000)
+        Campaign.objects.filter(pk=campaign.pk).update(cpm_paisa=5050)
+
+        out = StringIO()
+        call_command('recompute_earnings', chunk_size=1, stdout=out)
+        application.refresh_from_db()
+        campaign.refresh_from_db()
+        self.creator.refresh_from_db()
+        self.assertIn('Recomputed earnings for 1 applications.', out.getvalue())
+        self.assertEqual(application.earnings, Decimal('101.00'))
+        self.assertEqual(application.estimated_earnings, Decimal('50.50'))
+        self.assertEqual(campaign.spent, Decimal('101.00'))
+        self.assertEqual(campaign.remaining, Decimal('899.00'))
+        self.assertEqual(self.creator.total_earnings, Decimal('101.00'))
+
+
+class BulkViewUpdateTests(TestCase):
+    def setUp(self):
+        advertiser = create_profile('advertiser')
+        self.creator = create_profile('creator')
+        self.campaign = create_campaign(advertiser)
+        self.application = Application.objects.create(
+            campaign=self.campaign, creator=self.creator, proposal='p', estimated_views=10, status='approved'
+        )
+        self.client.force_login(self.creator.user)
+
+    def post(self, entries):
+        return self.client.post(reverse('update_views_bulk'), json.dumps(entries), content_type='application/json')
+
+    def test_repeated_application_counts_once(self):
+        results = self.post([
+            {'type': 'application', 'id': self.application.pk, 'views': 100},
+            {'type': 'application', 'id': self.application.pk, 'views': 200},
+        ]).json()['results']
+        self.assertEqual([result['views'] for result in results], [100, 200])
+        profile = UserProfile.objects.get(pk=self.creator.pk)
+        self.assertEqual((profile.total_views, profile.total_earnings), (200, Decimal('20.00')))
+        self.assertEqual(CampaignDailyStats.objects.get().views, 200)
+        self.assertEqual(list(ViewEvent.objects.values_list('delta', flat=True)), [200])
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.spent, Decimal('20.00'))
+
+    def test_contents_and_applications_are_locked(self):
+        content = Content.objects.create(creator=self.creator, title='Video')
+        with mock.patch.object(
+            QuerySet, 'select_for_update', autospec=True, side_effect=QuerySet.select_for_update
+        ) as select_for_update:
+            self.post([
+                {'type': 'content', 'id': content.pk, 'views': 100},
+                {'type': 'application', 'id': self.application.pk, 'views': 100},
+            ])
+        self.assertEqual({call.args[0].model for call in select_for_update.call_args_list}, {Content, Application})
+
+    def test_mixed_batch_updates_totals_ledger_and_rollups(self):
+        content = Content.objects.create(creator=self.creator, title='Video')
+        results = self.post([
+            {'type': 'content', 'id': content.pk, 'views': 1500},
+            {'type': 'application', 'id': self.application.pk, 'views': 3000},
+        ]).json()['results']
+        self.assertEqual(results[0], {'success': True, 'views': 1500, 'earnings': 150.0})
+        self.assertEqual(results[1]['earnings'], 300.0)
+        self.assertEqual(results[1]['remaining_budget'], 700.0)
+
+        content.refresh_from_db()
+        self.application.refresh_from_db()
+        self.campaign.refresh_from_db()
+        self.assertEqual((content.views, content.earnings), (1500, Decimal('150.00')))
+        self.assertEqual((self.application.views, self.application.earnings), (3000, Decimal('300.00')))
+        self.assertEqual((self.campaign.spent, self.campaign.remaining), (Decimal('300.00'), Decimal('700.00')))
+        profile = UserProfile.objects.get(pk=self.creator.pk)
+        self.assertEqual((profile.total_views, profile.total_earnings), (4500, Decimal('450.00')))
+        self.assertEqual(
+            sorted(CreatorDailyStats.objects.values_list('campaign', 'views', 'earnings'), key=str),
+            sorted([(None, 1500, Decimal('150.00')), (self.campaign.pk, 3000, Decimal('300.00'))], key=str),
+        )
+
+        # Lowering views refunds the campaign
+        self.post([{'type': 'application', 'id': self.application.pk, 'views': 1000}])
+        self.campaign.refresh_from_db()
+        self.assertEqual((self.campaign.spent, self.campaign.remaining), (Decimal('100.00'), Decimal('900.00')))
+
+    def test_spend_over_the_remaining_budget_is_refused(self):
+        results = self.post([{'type': 'application', 'id': self.application.pk, 'views': 20000}]).json()['results']
+        self.assertEqual(results, [{'success': False, 'error': 'Campaign budget insufficient to pay the earnings increase'}])
+        self.application.refresh_from_db()
+        self.campaign.refresh_from_db()
+        self.assertEqual((self.application.views, self.campaign.spent), (0, Decimal('0.00')))
+
+    def test_other_creators_objects_and_unapproved_applications_are_refused(self):
+        other = create_profile('creator', 'other')
+        foreign_content = Content.objects.create(creator=other, title='Theirs')
+        foreign_application = Application.objects.create(
+            campaign=self.campaign, creator=other, proposal='p', estimated_views=10, status='approved'
+        )
+        self.application.set_status('pending')
+        results = self.post([
+            {'type': 'content', 'id': foreign_content.pk, 'views': 10},
+            {'type': 'application', 'id': foreign_application.pk, 'views': 10},
+            {'type': 'application', 'id': self.application.pk, 'views': 10},
+        ]).json()['results']
+        self.assertEqual([result['error'] for result in results], [
+            'Content not found', 'Application not found', 'Can only update views for approved applications',
+        ])
+        foreign_content.refresh_from_db()
+        foreign_application.refresh_from_db()
+        self.assertEqual((foreign_content.views, foreign_application.views), (0, 0))
+        self.assertFalse(ViewEvent.objects.exists())
+
+    def test_bad_payloads(self):
+        response = self.client.post(reverse('update_views_bulk'), 'not json', content_type='application/json')
+        self.assertEqual(response.json(), {'success': False, 'error': 'Invalid data format'})
+        self.assertEqual(self.post({'type': 'content'}).json()['error'], 'Expected a list of updates')
+        with mock.patch('main.views.BULK_UPDATE_MAX_ITEMS', 1):
+            self.assertEqual(self.post([{}, {}]).json()['error'], 'At most 1 updates per request')
+        results = self.post([
+            {'type': 'content', 'id': 'x', 'views': 1},
+            {'type': 'video', 'id': 1, 'views': 1},
+            {'type': 'application', 'id': self.application.pk, 'views': -1},
+            'entry',
+        ]).json()['results']
+        self.assertEqual([result['error'] for result in results], [
+            'Invalid data', 'Unknown type', 'Views must be non-negative', 'Invalid data',
+        ])
+
+
+class DailyStatsRollupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.advertiser = create_profile('advertiser')
+        self.creator = create_profile('creator')
+        self.campaign = create_campaign(self.advertiser)
+        self.application = Application.objects.create(
+            campaign=self.campaign, creator=self.creator, proposal='p', estimated_views=1000
+        )
+
+    def rollups(self):
+        campaign_rows = list(CampaignDailyStats.objects.values_list('campaign', 'date', 'views', 'spend'))
+        creator_rows = list(
+            CreatorDailyStats.objects.order_by('campaign').values_list('creator', 'campaign', 'date', 'views', 'earnings')
+        )
+        return campaign_rows, creator_rows
+
+    def test_incremental_updates_match_rebuild(self):
+        self.application.set_status('approved')
+        self.application.update_views_and_earnings(3000)
+        self.application.update_views_and_earnings(2500)
+        content = Content.objects.create(creator=self.creator, title='Video')
+        content.update_views_and_earnings(1200)
+        self.client.force_login(self.creator.user)
+        self.client.post(
+            reverse('update_views_bulk'),
+            json.dumps([{'type': 'application', 'id': self.application.pk, 'views': 4000}]),
+            content_type='application/json',
+        )
+
+        today = timezone.localdate()
+        incremental = self.rollups()
+        self.assertEqual(incremental[0], [(self.campaign.pk, today, 4000, Decimal('400.00'))])
+        self.assertEqual(incremental[1], [
+            (self.creator.pk, None, today, 1200, Decimal('120.00')),
+            (self.creator.pk, self.campaign.pk, today, 4000, Decimal('400.00')),
+        ])
+        CampaignDailyStats.rebuild(Campaign.objects.all())
+        CreatorDailyStats.rebuild(UserProfile.objects.all())
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_content_deltas_come_from_the_stored_row(self):
+        content = Content.objects.create(creator=self.creator, title='Video')
+        stale = Content.objects.get(pk=content.pk)
+        content.update_views_and_earnings(1000)
+        stale.update_views_and_earnings(1500)
+        profile = UserProfile.objects.get(pk=self.creator.pk)
+        self.assertEqual((profile.total_views, profile.total_earnings), (1500, Decimal('150.00')))
+        self.assertEqual(CreatorDailyStats.objects.get().views, 1500)
+        self.assertEqual(sum(ViewEvent.objects.values_list('delta', flat=True)), 1500)
+
+    def test_unapproving_removes_earnings_from_today(self):
+        self.application.set_status('approved')
+        self.application.update_views_and_earnings(3000)
+        self.application.set_status('rejected')
+        row = CampaignDailyStats.objects.get()
+        self.assertEqual((row.views, row.spend), (0, Decimal('0.00')))
+
+    def test_analytics_and_leaderboard_read_rollups(self):
+        self.application.set_status('approved')
+        self.application.update_views_and_earnings(3000)
+        self.client.force_login(self.advertiser.user)
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('campaign_analytics', args=[self.campaign.pk]))
+        self.assertEqual(response.context['window_views'], 3000)
+        self.assertEqual(response.context['days'][-1]['cumulative_spend'], Decimal('300.00'))
+        self.assertEqual(response.context['top_creators'][0]['total_views'], 3000)
+
+        self.client.logout()
+        response = self.client.get(reverse('leaderboard'), {'period': '30d'})
+        self.assertContains(response, 'creator')
+        self.assertContains(response, '3000')
+
+    def test_other_advertisers_cannot_see_analytics(self):
+        other = create_profile('advertiser', 'other')
+        self.client.force_login(other.user)
+        response = self.client.get(reverse('campaign_analytics', args=[self.campaign.pk]))
+        self.assertEqual(response.status_code, 404)
+
+
+class ViewHistoryTests(TestCase):
+    def setUp(self):
+        self.creator = create_profile('creator')
+        self.content = Content.objects.create(creator=self.creator, title='Video')
+        # Ages count back from half past an hour, so events a few minutes apart share an hour
+        self.anchor = timezone.now().replace(minute=30, second=0, microsecond=0) - timedelta(hours=1)
+
+    def add_views(self, views, age):
+        self.content.update_views_and_earnings(self.content.views + views)
+        ViewEvent.objects.filter(pk=ViewEvent.objects.latest('pk').pk).update(recorded_at=self.anchor - age)
+
+    def test_compaction_keeps_history_and_bounds_storage(self):
+        self.add_views(100, timedelta(days=40))
+        self.add_views(50, timedelta(days=40, minutes=5))
+        self.add_views(30, timedelta(days=3))
+        self.add_views(20, timedelta(days=3, minutes=1))
+        self.add_views(7, timedelta(minutes=1))
+        since = timezone.localdate() - timedelta(days=45)
+        before = view_history.daily_views(since, content=self.content)
+
+        self.assertEqual(view_history.compact(), (4, 1))
+        self.assertEqual(view_history.daily_views(since, content=self.content), before)
+        self.assertEqual(sum(views for _, views in before), self.content.views)
+        # Recent events keep full resolution, 3-day old ones are hourly and the rest daily
+        self.assertEqual(list(ViewEvent.objects.values_list('delta', flat=True)), [7])
+        self.assertEqual(
+            sorted(ViewBucket.objects.values_list('resolution', 'views', 'updates')),
+            [('day', 150, 2), ('hour', 50, 2)],
+        )
+        self.assertEqual(view_history.compact(), (0, 0))
+
+    def test_creator_history_covers_content_and_applications(self):
+        advertiser = create_profile('advertiser')
+        campaign = create_campaign(advertiser)
+        application = Application.objects.create(
+            campaign=campaign, creator=self.creator, proposal='p', estimated_views=10, status='approved'
+        )
+        self.content.update_views_and_earnings(300)
+        application.update_views_and_earnings(200)
+        
+        since = timezone.localdate() - timedelta(days=1)
+        self.assertEqual(
+            view_history.creator_daily_views(self.creator, since), [(since, 0), (timezone.localdate(), 500)]
+        )
+
+    def test_growth_rate(self):
+        self.add_views(100, timedelta(days=10))
+        self.add_views(150, timedelta(days=2))
+        history = view_history.daily_views(timezone.localdate() - timedelta(days=13), content=self.content)
+        self.assertEqual(view_history.growth_rate(history), 0.5)
+        self.assertIsNone(view_history.growth_rate(history[-7:]))
+
+
+    def test_growth_rates_per_content(self):
+        other = Content.objects.create(creator=self.creator, title='Quiet video')
+        self.add_views(100, timedelta(days=10))
+        self.add_views(150, timedelta(days=2))
+        view_history.compact()
+        self.add_views(50, timedelta(minutes=1))
+        with self.assertNumQueries(2):
+            rates_by_id = view_history.growth_rates('content', [self.content.pk, other.pk])
+        self.assertEqual(rates_by_id, {self.content.pk: 1.0, other.pk: None})
+
+    def test_creator_dashboard_shows_item_growth(self):
+        self.add_views(100, timedelta(days=10))
+        self.add_views(150, timedelta(days=2))
+        self.client.force_login(self.creator.user)
+        response = self.client.get(reverse('creator_dashboard'))
+        self.assertEqual(response.context['contents'][0].view_growth, 50.0)
+        self.assertContains(response, '50%')
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        creator = create_profile('creator')
+        self.contents = [Content.objects.create(creator=creator, title=f'Video {index}') for index in range(7)]
+        # Rows sharing one created_at are told apart by id
+        shared = timezone.now()
+        Content.objects.filter(pk__in=[content.pk for content in self.contents[2:6]]).update(created_at=shared)
+        self.newest_first = list(Content.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+
+    def page(self, query=''):
+        return paginate_keyset(RequestFactory().get('/', QueryDict(query)), Content.objects.all(), page_size=3)
+
+    def ids(self, page):
+        return [content.pk for content in page.object_list]
+
+    def test_pages_walk_forward_and_back_through_ties(self):
+        first = self.page()
+        second = self.page(first.next_query)
+        third = self.page(second.next_query)
+        self.assertEqual(self.ids(first) + self.ids(second) + self.ids(third), self.newest_first)
+        self.assertFalse(first.has_previous)
+        self.assertFalse(third.has_next)
+        self.assertEqual(self.ids(self.page(third.previous_query)), self.ids(second))
+        self.assertEqual(self.ids(self.page(second.previous_query)), self.ids(first))
+
+    def test_tampered_cursor_starts_from_the_first_page(self):
+        next_query = QueryDict(self.page().next_query).copy()
+        next_query['cursor'] = next_query['cursor'][:-1] + ('A' if next_query['cursor'][-1] != 'A' else 'B')
+        page = self.page(next_query.urlencode())
+        self.assertEqual(self.ids(page), self.newest_first[:3])
+        self.assertFalse(page.has_previous)
+
+    def test_last_page(self):
+        # Six rows: the second page is full and offers no next page
+        Content.objects.filter(pk=self.newest_first[-1]).delete()
+        second = self.page(self.page().next_query)
+        self.assertEqual(len(second), 3)
+        self.assertFalse(second.has_next)
+
+        # A cursor past the oldest row gives an empty page with no links out of it
+        oldest = Content.objects.get(pk=self.newest_first[-2])
+        page = self.page(urlencode({'cursor': encode_cursor(oldest, 'created_at', 'next')}))
+        self.assertEqual(len(page), 0)
+        self.assertFalse(page.has_other_pages())
+
+
+class CampaignSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        advertiser = create_profile('advertiser')
+
+        def campaign(title, description='Post a video', status='active', **fields):
+            return create_campaign(
+                advertiser, title, description=description, requirements='One video', status=status, **fields
+            )
+
+        self.campaign = campaign
+        self.title_match = campaign('Momo festival')
+        self.description_match = campaign('Food week', description='Film yourself at the momo festival')
+        self.paused = campaign('Momo festival paused', status='paused')
+        self.private = campaign('Momo festival private', is_public=False)
+        self.unrelated = campaign('Winter jackets')
+        self.public = Campaign.objects.filter(is_public=True, status='active')
+
+    def search(self, query, queryset=None):
+        return list(search_campaigns(queryset if queryset is not None else self.public, query))
+
+    def test_ranked_prefix_matches_within_filters(self):
+        self.assertEqual(self.search('mom fest'), [self.title_match, self.description_match])
+        self.assertEqual(self.search('festival jacket'), [])
+        self.assertEqual(len(self.search('momo', Campaign.objects.all())), 4)
+
+    def test_broad_queries_keep_their_best_matches(self):
+        # The best match is also the oldest, so a cap by recency would drop it
+        with mock.patch('main.search.MAX_RANKED_MATCHES', 1):
+            self.assertEqual(self.search('momo', Campaign.objects.all()), [self.title_match])
+
+
+    def test_the_cap_counts_only_campaigns_that_pass_the_filters(self):
+        self.campaign('Momo', status='paused')
+        self.campaign('Momo momo', is_public=False)
+        with mock.patch('main.search.MAX_RANKED_MATCHES', 2):
+            self.assertEqual(len(self.search('momo', Campaign.objects.all())), 2)
+            self.assertEqual(self.search('momo'), [self.title_match, self.description_match])
+
+    def test_index_follows_edits_and_deletes(self):
+        self.unrelated.title = 'Momo jackets'
+        self.unrelated.save()
+        self.title_match.delete()
+        # Ledger updates don't touch the text columns
+        Campaign.objects.filter(pk=self.description_match.pk).update(spent=10)
+        self.assertEqual(self.search('momo'), [self.unrelated, self.description_match])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(self.search('momo" * ( -:'), self.search('momo'))
+        # OR is a search word like any other, not an operator
+        self.assertEqual(self.search('momo OR'), [])
+        self.assertEqual(self.search('"()'), [])
+
+    @skipUnless(connection.vendor == 'sqlite', 'FTS5 index is SQLite only')
+    def test_full_text_query_runs_once(self):
+        plan = search_campaigns(self.public, 'momo').values('pk').explain()
+        self.assertIn('SCAN main_campaign_fts', plan.splitlines()[0])
+        self.assertIn('INTEGER PRIMARY KEY', plan)
+
+    @skipUnless(connection.vendor == 'sqlite', 'FTS5 index is SQLite only')
+    def test_migrate_restores_index_triggers_dropped_by_table_rebuilds(self):
+        self.assertEqual(missing_index_triggers(connection), [])
+        with connection.cursor() as cursor:
+            for name in INDEX_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER {name}')
+        self.unrelated.title = 'Momo jackets'
+        self.unrelated.save()
+        self.assertEqual(sorted(missing_index_triggers(connection)), sorted(INDEX_TRIGGERS))
+        
+        restore_index_triggers(sender=None, using=connection.alias)
+        self.assertEqual(missing_index_triggers(connection), [])
+        # The edit made without triggers is indexed, and later ones are tracked again
+        self.title_match.delete()
+        self.assertEqual(self.search('momo'), [self.unrelated, self.description_match])
+
+    def test_campaigns_page_search(self):
+        response = self.client.get(reverse('campaigns'), {'q': 'momo'})
+        self.assertEqual(list(response.context['campaigns']), [self.title_match, self.description_match])
+        self.assertContains(response, 'value="momo"')
+        response = self.client.get(reverse('campaigns'), {'q': 'nothing'})
+        self.assertContains(response, 'No Matching Campaigns')
+
+
+class CampaignApiTests(TestCase):
+    def setUp(self):
+        advertiser = create_profile('advertiser')
+        self.campaigns = [
+            create_campaign(advertiser, f'Campaign {index}', status='active')
+            for index in range(3)
+        ]
+        self.url = reverse('api_campaigns')
+
+    def test_fields_are_selected(self):
+        response = self.client.get(self.url, {'fields': 'title,cpm'})
+        self.assertEqual(
+            response.json()['campaigns'][0], {'id': self.campaigns[2].pk, 'title': 'Campaign 2', 'cpm': '100.00'}
+        )
+        response = self.client.get(self.url, {'fields': 'title,advertiser'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'Unknown field: advertiser')
+
+    def test_unchanged_list_is_a_one_query_304(self):
+        etag = self.client.get(self.url).headers['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        # Ledger updates and campaigns leaving the list both change the validator
+        self.campaigns[0].record_spend(Decimal('5.00'))
+        response = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers['ETag']
+        self.campaigns[1].delete()
+        self.assertEqual(self.client.get(self.url, headers={'If-None-Match': etag}).status_code, 200)
+
+    def test_list_is_not_validated_by_date(self):
+        # Deleting the newest campaign moves no date forward, so a date would answer a stale 304
+        response = self.client.get(self.url)
+        self.assertNotIn('Last-Modified', response.headers)
+        self.campaigns[2].delete()
+        response = self.client.get(self.url, headers={'If-Modified-Since': http_date(time.time() + 60)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['campaigns']), 2)
+
+    def test_detail_is_one_query_and_honours_if_modified_since(self):
+        url = reverse('api_campaign_detail', args=[self.campaigns[0].pk])
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'fields': 'remaining'})
+        self.assertEqual(response.json()['campaign'], {'id': self.campaigns[0].pk, 'remaining': '1000.00'})
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                url, {'fields': 'remaining'}, headers={'If-Modified-Since': response.headers['Last-Modified']}
+            )
+        self.assertEqual(response.status_code, 304)
+
+        Campaign.objects.filter(pk=self.campaigns[1].pk).update(is_public=False)
+        self.assertEqual(self.client.get(reverse('api_campaign_detail', args=[self.campaigns[1].pk])).status_code, 404)
+
+
+class AssetBuildTests(TestCase):
+    def test_rewrite_moves_only_static_blocks(self):
+        source = (
+            "{% extends 'main/base.html' %}\n{% block content %}<style>\n.a { color: red; }\n</style>"
+            "<script>var a = 1;</script><script>var b = {{ b }};</script>"
+            "<script src=\"https://example.com/x.js\"></script><script type=\"application/json\">{}</script>"
+            "{% endblock %}"
+        )
+        built, extracted = rewrite('main/page.html', source)
+        self.assertEqual([extraction.path for extraction, _ in extracted], ['build/main/page.css', 'build/main/page.js'])
+        self.assertEqual(extracted[0][1], '.a { color: red; }\n')
+        self.assertTrue(built.startswith("{% extends 'main/base.html' %}{% load static %}"))
+        self.assertIn('<link rel="stylesheet" href="{% static \'build/main/page.css\' %}">', built)
+        self.assertIn('<script>var b = {{ b }};</script>', built)
+        self.assertIn('https://example.com/x.js', built)
+        self.assertIn('<script type="application/json">{}</script>', built)
+        self.assertEqual(rewrite('main/plain.html', '<p>{{ a }}</p>'), ('<p>{{ a }}</p>', []))
+
+    def test_built_pages_link_hashed_precompressed_assets(self):
+        build, static_root = tempfile.TemporaryDirectory(), tempfile.TemporaryDirectory()
+        self.addCleanup(build.cleanup)
+        self.addCleanup(static_root.cleanup)
+        with override_settings(ASSET_BUILD_DIR=build.name, STATIC_ROOT=static_root.name):
+            output = StringIO()
+            call_command('build_assets', stdout=output)
+        self.assertIn('main/login.html', output.getvalue())
+
+        templates = copy.deepcopy(settings.TEMPLATES)
+        templates[0]['DIRS'] = [f'{build.name}/templates']
+        with override_settings(
+            ASSET_BUILD_DIR=build.name, STATIC_ROOT=static_root.name, USE_BUILT_ASSETS=True, TEMPLATES=templates,
+            STORAGES={**settings.STORAGES, 'staticfiles': {'BACKEND': 'main.assets.PrecompressedManifestStaticFilesStorage'}},
+        ):
+            client = self.client_class()
+            response = client.get(reverse('login'))
+            self.assertNotContains(response, '<style>')
+            stylesheet = re.search(r'href="(/static/build/main/login\.[0-9a-f]{12}\.css)"', response.content.decode())
+            self.assertIsNotNone(stylesheet)
+
+            response = client.get(stylesheet.group(1), HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+            self.assertEqual(response['Vary'], 'Accept-Encoding')
+            self.assertIn(b'.login-container', gzip.decompress(b''.join(response.streaming_content)))
+
+            response = client.get('/static/build/main/login.css')
+            self.assertNotIn('Content-Encoding', response)
+            self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+
+
+class ResponsiveImageTests(TestCase):
+    def setUp(self):
+        self.build, self.static = tempfile.TemporaryDirectory(), tempfile.TemporaryDirectory()
+        self.addCleanup(self.build.cleanup)
+        self.addCleanup(self.static.cleanup)
+        settings_override = override_settings(ASSET_BUILD_DIR=self.build.name, STATICFILES_DIRS=[self.static.name])
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def render(self, arguments, **context):
+        return Template('{% load responsive_images %}{% responsive_image ' + arguments + ' %}').render(Context(context))
+
+    def test_plain_lazy_img_before_a_build(self):
+        self.assertHTMLEqual(
+            self.render("'hero.png' alt", alt='A "hero"'),
+            '<img src="/static/hero.png" alt="A &quot;hero&quot;" decoding="async" loading="lazy">',
+        )
+        self.assertNotIn('loading', self.render("'hero.png' 'Hero' lazy=False"))
+
+    @skipUnless(images.available_formats(), 'Pillow with WebP support is not installed')
+    def test_variants_at_each_width_up_to_the_original(self):
+        images.Image.new('RGB', (700, 350), 'red').save(f'{self.static.name}/hero.png')
+        output = StringIO()
+        call_command('build_images', stdout=output)
+        self.assertIn('hero.png', output.getvalue())
+
+        entry = images.load_manifest()['hero.png']
+        self.assertEqual([variant['width'] for variant in entry['variants']['webp']], [160, 320, 640, 700])
+        self.assertEqual(images.chosen_variant(entry, '96px', 390, 2)['width'], 320)
+        self.assertEqual(images.chosen_variant(entry, '100vw', 1440, 1)['width'], 700)
+
+        html = self.render("'hero.png' 'Hero' sizes='50vw'")
+        self.assertIn('<source type="image/webp" srcset="/static/images/hero-160w.webp 160w, ', html)
+        self.assertIn('/static/images/hero-700w.webp 700w" sizes="50vw">', html)
+        self.assertIn('<img src="/static/hero.png" alt="Hero" decoding="async" loading="lazy"></picture>', html)
+
+
+class GuestSessionTests(TestCase):
+    def session_cookie(self):
+        return self.client.cookies[settings.SESSION_COOKIE_NAME].value
+
+    def test_guest_sessions_stay_out_of_the_database(self):
+        with self.assertNumQueries(0):
+            self.client.get(reverse('guest_login'))
+            self.assertIs(self.client.session['guest_mode'], True)
+        self.assertIn(':', self.session_cookie())
+        self.assertFalse(Session.objects.exists())
+
+        # A tampered cookie starts an empty session instead of failing
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = self.session_cookie()[:-2] + 'xx'
+        self.assertNotIn('guest_mode', self.client.session)
+
+    def test_logging_in_moves_the_session_to_the_database_and_out_on_logout(self):
+        User.objects.create_user('creator', password='secret-pass-1')
+        self.client.get(reverse('guest_login'))
+        self.client.post(reverse('login'), {'username': 'creator', 'password': 'secret-pass-1'})
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), [self.session_cookie()])
+        self.assertIs(self.client.session['guest_mode'], True)
+
+        self.client.get(reverse('logout'))
+        self.assertFalse(Session.objects.exists())
+
+    def test_oversized_guest_sessions_fall_back_to_the_database(self):
+        session = SessionStore()
+        session['notes'] = get_random_string(4000)
+        session.save()
+        self.assertTrue(Session.objects.filter(session_key=session.session_key).exists())
+
+    def test_expired_rows_are_purged_in_batches(self):
+        now = timezone.now()
+        for index in range(5):
+            Session.objects.create(session_key=f'expired{index:025}', session_data='', expire_date=now - timedelta(days=1))
+        Session.objects.create(session_key='live'.ljust(32, '0'), session_data='', expire_date=now + timedelta(days=1))
+        self.assertEqual(SessionStore.clear_expired(batch_size=2), 5)
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['live'.ljust(32, '0')])
+
+
+class ProfileAccessTests(TestCase):
+    def setUp(self):
+        self.advertiser = create_profile('advertiser')
+        self.creator = create_profile('creator')
+
+    def test_dashboard_renders_the_role_dashboard_in_place(self):
+        for profile, template in ((self.advertiser, 'advertiser_dashboard'), (self.creator, 'creator_dashboard')):
+            self.client.force_login(profile.user)
+            response = self.client.get(reverse('dashboard'))
+            self.assertEqual(response.status_code, 200)
+            self.assertTemplateUsed(response, f'main/{template}.html')
+            self.assertEqual(response.context['profile'], profile)
+
+    def test_profile_is_loaded_with_the_user(self):
+        self.client.force_login(self.advertiser.user)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('create_campaign'))
+        self.assertFalse([query for query in queries if query['sql'].startswith('SELECT') and
+                          'FROM "main_userprofile"' in query['sql']])
+
+    def test_sessions_from_before_the_profile_backend_stay_logged_in(self):
+        self.client.force_login(self.creator.user, backend='django.contrib.auth.backends.ModelBackend')
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['profile'], self.creator)
+
+    def test_role_decorators_turn_away_other_roles(self):
+        self.client.force_login(self.creator.user)
+        response = self.client.get(reverse('advertiser_dashboard'))
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+        self.assertEqual(
+            [str(message) for message in response.wsgi_request._messages],
+            ['Access denied. Advertiser account required.'],
+        )
+        response = self.client.get(reverse('create_campaign'))
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+
+        self.client.force_login(User.objects.create_user('no-profile'))
+        response = self.client.get(reverse('add_content'))
+        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
+
+
+class KhaltiVerificationTests(TestCase):
+    """Exercise verify_khalti_payment against the local stub server"""
+
+    def start_stub(self, **kwargs):
+        server, url = start_in_thread(**kwargs)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        settings_override = override_settings(KHALTI_VERIFY_URL=url, KHALTI_RETRY_BACKOFF=0.01)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        return server
+
+    def setUp(self):
+        cache.clear()
+        khalti.breaker.reset()
+        self.addCleanup(khalti.breaker.reset)
+
+    def verify(self, token, amount=1000):
+        return self.client.post(
+            reverse('verify_khalti_payment'),
+            json.dumps({'token': token, 'amount': amount}),
+            content_type='application/json',
+        )
+
+    def test_verified_payment(self):
+        self.start_stub()
+        response = self.verify('token-1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'success': True})
+
+    def test_rejected_payment(self):
+        self.start_stub()
+        self.assertEqual(self.verify('invalid-token').status_code, 400)
+        self.assertEqual(Payment.objects.get(token='invalid-token').status, 'failed')
+
+    def test_verified_token_is_not_verified_twice(self):
+        server = self.start_stub()
+        self.assertEqual(self.verify('token-1').status_code, 200)
+        self.assertEqual(Payment.objects.get(token='token-1').status, 'verified')
+        cache.clear()
+        self.assertEqual(self.verify('token-1').status_code, 200)
+        self.assertEqual(self.verify('token-1', amount=5000).status_code, 400)
+        self.assertEqual(server.request_count, 1)
+
+    def test_concurrent_verifications_are_coalesced(self):
+        server = self.start_stub(latency=0.2)
+
+        async def verify_concurrently():
+            return await asyncio.gather(*(khalti.verify_payment_once('token-1', 1000) for _ in range(5)))
+
+        self.assertEqual(async_to_sync(verify_concurrently)(), [True] * 5)
+        self.assertEqual(server.request_count, 1)
+
+    def test_upstream_failures_are_retried_then_trip_the_breaker(self):
+        server = self.start_stub(failure_rate=1.0)
+        with override_settings(KHALTI_MAX_RETRIES=2):
+            self.assertEqual(self.verify('token-1').status_code, 503)
+            self.assertEqual(server.request_count, 3)
+            self.verify('token-2')
+        self.assertEqual(khalti.breaker.state, 'open')
+        requests_before = server.request_count
+        self.assertEqual(self.verify('token-3').status_code, 503)
+        self.assertEqual(server.request_count, requests_before)
+
+    def test_slow_upstream_times_out(self):
+        self.start_stub(latency=0.5)
+        with override_settings(KHALTI_READ_TIMEOUT=0.05, KHALTI_MAX_RETRIES=0):
+            self.assertEqual(self.verify('token-1').status_code, 503)
+
+
+class JobQueueTests(TestCase):
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_worker_warns_about_a_process_local_cache(self):
+        err = StringIO()
+        call_command('run_worker', once=True, threads=1, stdout=StringIO(), stderr=err)
+        self.assertIn('local to this process', err.getvalue())
+
+    def test_worker_accepts_the_shared_cache(self):
+        err = StringIO()
+        call_command('run_worker', once=True, threads=1, stdout=StringIO(), stderr=err)
+        self.assertEqual(err.getvalue(), '')
+
+    def enqueue(self, *args, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            enqueue(*args, **kwargs)
+
+    def expire_claims(self):
+        Job.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+
+    def test_a_queued_key_absorbs_duplicates_until_it_is_claimed(self):
+        self.enqueue('test', {'n': 1}, dedupe_key='key')
+        self.enqueue('test', {'n': 2}, dedupe_key='key')
+        self.assertEqual(list(Job.objects.values_list('payload', flat=True)), [{'n': 1}])
+        
+        claim_jobs('worker-a')
+        self.enqueue('test', {'n': 3}, dedupe_key='key')
+        self.assertEqual(Job.objects.count(), 2)
+
+    def test_a_job_is_claimed_by_one_worker_once_it_is_due(self):
+        self.enqueue('test', dedupe_key='later', delay=60)
+        self.enqueue('test', dedupe_key='now')
+        [job] = claim_jobs('worker-a')
+        self.assertEqual((job.dedupe_key, job.status, job.locked_by, job.attempts), ('now', 'running', 'worker-a', 1))
+        self.assertEqual(claim_jobs('worker-b'), [])
+
+    def test_an_expired_claim_is_handed_to_another_worker(self):
+        self.enqueue('test')
+        claim_jobs('worker-a', visibility_timeout=60)
+        self.assertEqual(claim_jobs('worker-b'), [])
+        
+        self.expire_claims()
+        [job] = claim_jobs('worker-b')
+        self.assertEqual((job.locked_by, job.attempts), ('worker-b', 2))
+
+    def test_a_failed_job_is_queued_again_until_its_attempts_run_out(self):
+        def fail():
+            raise RuntimeError('boom')
+        
+        self.enqueue('test')
+        Job.objects.update(max_attempts=2)
+        with mock.patch.dict('main.jobs._handlers', {'test': fail}), self.assertLogs('main.jobs', 'ERROR'):
+            [job] = claim_jobs('worker-a')
+            self.assertFalse(run_job(job))
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.locked_until), ('queued', None))
+            self.assertIn('boom', job.last_error)
+            self.assertGreater(job.run_after, timezone.now())
+            
+            Job.objects.update(run_after=timezone.now())
+            [job] = claim_jobs('worker-a')
+            self.assertFalse(run_job(job))
+        self.assertEqual(Job.objects.get().status, 'failed')
+
+    def test_a_stale_workers_completion_is_ignored(self):
+        calls = []
+        self.enqueue('test')
+        [stale] = claim_jobs('worker-a')
+        self.expire_claims()
+        [current] = claim_jobs('worker-b')
+        
+        with mock.patch.dict('main.jobs._handlers', {'test': lambda: calls.append(1)}):
+            self.assertTrue(run_job(stale))
+            self.assertEqual(Job.objects.get().locked_by, 'worker-b')
+            self.assertTrue(run_job(current))
+        self.assertFalse(Job.objects.exists())
+        self.assertEqual(len(calls), 2)
+
+
+@skipIf(
+    connection.vendor == 'sqlite' and connection.settings_dict['OPTIONS'].get('transaction_mode') != 'IMMEDIATE',
+    'Deferred SQLite transactions fail read-then-write races with "database is locked"',
+)
+class ConcurrentBudgetTests(TransactionTestCase):
+    def test_concurrent_view_updates_never_overspend(self):
+        out = StringIO()
+        # Raises CommandError if any campaign's ledger ends up overspent or inconsistent
+        call_command(
+            'stress_campaign_budget', campaigns=2, threads=6, updates=30, budget='100.00', stdout=out
+        )
+        self.assertIn('No campaign was overspent.', out.getvalue())
+        self.assertIn('spent 100.00 remaining 0.00', out.getvalue())
+        self.assertNotIn(' 0 updates,', out.getvalue())
+
+
+class EndpointQueryBudgetTests(TransactionTestCase):
+    """Every route stays within its query budget, and its query count doesn't grow with the data"""
+
+    SCALES = (1, 3)
+
+    def test_every_route_is_measured(self):
+        from .urls import urlpatterns
+        self.assertEqual({pattern.name for pattern in urlpatterns}, {endpoint.name for endpoint in ENDPOINTS})
+
+    def test_query_budgets(self):
+        counts = {}
+        for scale in self.SCALES:
+            seeding.clear()
+            seeded = seeding.seed(scale)
+            for endpoint in ENDPOINTS:
+                status, queries, _ = measure(endpoint, seeded)
+                counts.setdefault(endpoint, []).append(queries)
+                with self.subTest(endpoint=endpoint, scale=scale):
+                    self.assertLess(status, 500)
+                    self.assertLessEqual(queries, endpoint.budget)
+        for endpoint, measured in counts.items():
+            with self.subTest(endpoint=endpoint):
+                self.assertEqual(len(set(measured)), 1, f'query count grows with data: {measured}')
+
+
+class PlanFixtureTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_plans_fixture_fills_the_explore_page(self):
+        call_command('loaddata', 'plans', verbosity=0)
+        response = self.client.get(reverse('explore'))
+        for plan in Plan.objects.all():
+            self.assertContains(response, plan.name)
+
+
+class PublicPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_tests_do_not_share_the_configured_cache(self):
+        self.assertNotEqual(settings.CACHES, cache_config())
+
+    def test_saving_a_plan_invalidates_the_cached_page(self):
+        plan = Plan.objects.create(name='Starter', description='-', price=100, duration='1 month', features='-')
+        self.assertContains(self.client.get(reverse('explore')), 'Starter')
+        with self.assertNumQueries(0):
+            self.client.get(reverse('explore'))
+        
+        plan.name = 'Growth'
+        plan.save()
+        response = self.client.get(reverse('explore'))
+        self.assertContains(response, 'Growth')
+        self.assertNotContains(response, 'Starter')
+
+    def test_concurrent_misses_build_the_entry_once(self):
+        builds = []
+        start = threading.Barrier(5)
+        
+        def build():
+            builds.append(1)
+            time.sleep(0.2)
+            return 'page'
+        
+        def request():
+            start.wait()
+            return get_or_build('page:test', build)
+        
+        with ThreadPoolExecutor(5) as pool:
+            results = list(pool.map(lambda _: request(), range(5)))
+        self.assertEqual(results, ['page'] * 5)
+        self.assertEqual(len(builds), 1)
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+
+    def test_sampled_response_has_server_timing(self):
+        response = self.client.get(reverse('explore'))
+        self.assertIn('sql;dur=', response['Server-Timing'])
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+        self.assertIn('tpl;dur=', response['Server-Timing'])
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_still_counted(self):
+        response = self.client.get(reverse('explore'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertIn('neptok_request_duration_seconds_count{view="explore"} 1', registry.render())
+        self.assertNotIn('neptok_request_queries_count{view="explore"}', registry.render())
+
+    def test_metrics_are_staff_only(self):
+        self.client.get(reverse('explore'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('neptok_requests_total{view="explore",status="200"} 1', response.content.decode())
+        self.assertIn('neptok_request_queries_bucket{view="explore",le="1"} 1', response.content.decode())
+
+    @override_settings(METRICS_TOKEN='scrape-token')
+    def test_metrics_accept_bearer_token(self):
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-token').status_code, 200)
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+
+    def test_async_requests_are_measured(self):
+        async def view(request):
+            await Plan.objects.acount()
+            return HttpResponse()
+        
+        middleware = RequestMetricsMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = async_to_sync(middleware)(RequestFactory().get('/'))
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+        self.assertIn('neptok_requests_total{view="unmatched",status="200"} 1', registry.render())
+
+    def test_repeated_statements_are_reported_by_fingerprint(self):
+        def view(request):
+            for plan_id in (1, 2, 3):
+                list(Plan.objects.filter(pk=plan_id))
+            return HttpResponse()
+        
+        RequestMetricsMiddleware(view)(RequestFactory().get('/'))
+        [(digest, sql)] = registry.duplicate_statements().items()
+        self.assertIn('"main_plan"', sql)
+        self.assertEqual(digest, fingerprint(sql))
+        self.assertIn(f'neptok_duplicate_queries_total{{view="unmatched",fingerprint="{digest}"}} 2', registry.render())
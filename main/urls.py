@@ -35,10 +35,19 @@ urlpatterns = [
     path('create-campaign/', views.create_campaign, name='create_campaign'),
     path('campaign/<int:campaign_id>/', views.campaign_detail, name='campaign_detail'),
     path('apply-campaign/<int:campaign_id>/', views.apply_campaign, name='apply_campaign'),
+    path('campaign/<int:campaign_id>/analytics/', views.campaign_analytics, name='campaign_analytics'),
+    path('leaderboard/', views.leaderboard, name='leaderboard'),
+    
+    # JSON API
+    path('api/campaigns/', views.api_campaigns, name='api_campaigns'),
+    path('api/campaigns/<int:campaign_id>/', views.api_campaign_detail, name='api_campaign_detail'),
     
     # Content management
     path('add-content/', views.add_content, name='add_content'),
     path('update-views/<int:content_id>/', views.update_views, name='update_views'),
     path('update-application-views/<int:application_id>/', views.update_application_views, name='update_application_views'),
-    path('verify-khalti-payment/', views.verify_khalti_payment, name='verify_khalti_payment'),
+    path('update-views/bulk/', views.update_views_bulk, name='update_views_bulk'),
+    
+    # Monitoring
+    path('metrics', views.metrics, name='metrics'),
 ] 
\ No newline at end of file
@@ -0,0 +1,173 @@
+"""View history: compaction of the view event log and growth queries over it
+
+Every views update appends a ViewEvent. Compaction keeps storage bounded while recent history
+keeps full resolution:
+
+- events older than VIEW_EVENT_RETENTION are folded into hourly buckets and deleted
+- hourly buckets older than HOURLY_BUCKET_RETENTION are folded into daily buckets and deleted
+
+Daily buckets are kept. History queries read the buckets plus whatever events have not been
+compacted yet, so their answers don't change when compaction runs: daily_views() for one
+piece of content or application, and growth_rates() for a page of them at once, as on the
+creator dashboard. A creator's history across all their work comes from the CreatorDailyStats
+rollup instead, which is keyed by creator.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate, TruncDay, TruncHour
+from django.utils import timezone
+
+from .models import CreatorDailyStats, ViewBucket, ViewEvent
+
+
+VIEW_EVENT_RETENTION = timedelta(hours=getattr(settings, 'VIEW_EVENT_RETENTION_HOURS', 48))
+HOURLY_BUCKET_RETENTION = timedelta(days=getattr(settings, 'HOURLY_BUCKET_RETENTION_DAYS', 30))
+# Source rows folded per transaction: one day of events, or a week of hourly buckets
+COMPACTION_WINDOWS = {'hour': timedelta(days=1), 'day': timedelta(days=7)}
+
+
+def _floor(moment, resolution):
+    """Start of the hour or local day containing moment"""
+    moment = timezone.localtime(moment)
+    if resolution == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return timezone.make_aware(datetime.combine(moment.date(), time.min))
+
+
+def _fold(source, time_field, views, updates, resolution):
+    """Fold source rows before the retention cutoff into buckets of resolution, then delete them
+
+    Works through the backlog one window per transaction. Sums are added to buckets that
+    already exist, so a rerun after a partial failure is safe. Returns the source rows folded.
+    """
+    trunc = TruncHour if resolution == 'hour' else TruncDay
+    retention = VIEW_EVENT_RETENTION if resolution == 'hour' else HOURLY_BUCKET_RETENTION
+    cutoff = _floor(timezone.now() - retention, resolution)
+    folded = 0
+    while True:
+        oldest = source.filter(**{f'{time_field}__lt': cutoff}).order_by(time_field).values_list(
+            time_field, flat=True
+        ).first()
+        if oldest is None:
+            return folded
+        window_start = _floor(oldest, resolution)
+        window_end = min(window_start + COMPACTION_WINDOWS[resolution], cutoff)
+        window = {f'{time_field}__gte': window_start, f'{time_field}__lt': window_end}
+
+        with transaction.atomic():
+            rows = source.filter(**window)
+            sums = rows.values('content', 'application', bucket=trunc(time_field)).annotate(
+                total_views=Sum(views), total_updates=updates
+            )
+            existing = {
+                (bucket.content_id, bucket.application_id, bucket.start): bucket
+                for bucket in ViewBucket.objects.filter(
+                    resolution=resolution, start__gte=window_start, start__lt=window_end
+                )
+            }
+            changed, created = [], []
+            for row in sums:
+                bucket = existing.get((row['content'], row['application'], row['bucket']))
+                if bucket is None:
+                    created.append(ViewBucket(
+                        content_id=row['content'],
+                        application_id=row['application'],
+                        resolution=resolution,
+                        start=row['bucket'],
+                        views=row['total_views'],
+                        updates=row['total_updates'],
+                    ))
+                else:
+                    bucket.views += row['total_views']
+                    bucket.updates += row['total_updates']
+                    changed.append(bucket)
+            ViewBucket.objects.bulk_update(changed, ['views', 'updates'], batch_size=500)
+            ViewBucket.objects.bulk_create(created, batch_size=500)
+            folded += rows.delete()[0]
+
+
+def compact():
+    """Fold old events into hourly buckets and old hourly buckets into daily ones
+
+    Returns (events folded, hourly buckets folded).
+    """
+    events = _fold(ViewEvent.objects.all(), 'recorded_at', 'delta', Count('id'), 'hour')
+    hourly = _fold(ViewBucket.objects.filter(resolution='hour'), 'start', 'views', Sum('updates'), 'day')
+    return events, hourly
+
+
+def _series(since, totals):
+    """[(date, totals[date])] for every day from since to today"""
+    today = timezone.localdate()
+    return [(since + timedelta(days=offset), totals.get(since + timedelta(days=offset), 0))
+            for offset in range((today - since).days + 1)]
+
+
+def _daily_totals(since, group_by, **filters):
+    """{(group value, date): views} from the buckets and uncompacted events matching filters
+
+    group_by names a field to group by as well as by day, or is None.
+    """
+    start = timezone.make_aware(datetime.combine(since, time.min))
+    groups = [group_by] if group_by else []
+    totals = defaultdict(int)
+    # Naming both resolutions lets the per-target unique indexes seek on (target, resolution, start)
+    buckets = ViewBucket.objects.filter(resolution__in=('hour', 'day'), start__gte=start, **filters).values(
+        *groups, day=TruncDate('start')
+    ).annotate(total=Sum('views'))
+    events = ViewEvent.objects.filter(recorded_at__gte=start, **filters).values(
+        *groups, day=TruncDate('recorded_at')
+    ).annotate(total=Sum('delta'))
+    for rows in (buckets, events):
+        for row in rows:
+            totals[(row[group_by] if group_by else None, row['day'])] += row['total']
+    return totals
+
+
+def daily_views(since, **filters):
+    """[(date, views gained)] for every day from since to today
+
+    filters select the events and buckets, e.g. content=... or application=...
+    """
+    totals = _daily_totals(since, None, **filters)
+    return _series(since, {day: views for (_, day), views in totals.items()})
+
+
+def growth_rates(target, ids, days=7):
+    """{id: growth_rate()} for the last days of views of each content or application in ids
+
+    target is 'content' or 'application'. Two queries, whatever the number of ids.
+    """
+    since = timezone.localdate() - timedelta(days=2 * days - 1)
+    totals = _daily_totals(since, target, **{f'{target}__in': ids})
+    series = defaultdict(dict)
+    for (pk, day), views in totals.items():
+        series[pk][day] = views
+    return {pk: growth_rate(_series(since, series[pk]), days) for pk in ids}
+
+
+def creator_daily_views(creator, since):
+    """[(date, views credited)] for every day from since to today, over all of a creator's work
+
+    Read from the rollup, so views an application gains or loses on approval count on that day.
+    """
+    totals = CreatorDailyStats.objects.filter(creator=creator, date__gte=since).values('date').annotate(
+        total=Sum('views')
+    ).values_list('date', 'total')
+    return _series(since, dict(totals))
+
+
+def growth_rate(series, days=7):
+    """Relative change in views between the last days of a daily_views() series and the days before
+
+    0.25 means 25% more views. None when the earlier period had no views to compare against.
+    """
+    recent = sum(views for _, views in series[-days:])
+    previous = sum(views for _, views in series[-2 * days:-days])
+    if previous <= 0:
+        return None
+    return (recent - previous) / previous
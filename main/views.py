@@ -3,23 +3,33 @@ from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib import messages
-from django.http import JsonResponse
-from django.views.decorators.http import require_POST
-from django.db.models import Sum, Count
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from django.views.decorators.http import condition, require_POST, require_safe
+from django.db.models import Avg, Sum, Count, Prefetch, F, Q, Value
+from django.db.models.functions import Coalesce
 from django.core.exceptions import ValidationError
-import requests
-from .models import UserProfile, Campaign, Application, Content
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.crypto import constant_time_compare
+from django.conf import settings
+from .models import UserProfile, Campaign, Application, Content, CampaignDailyStats, CreatorDailyStats, ViewEvent, record_daily_stats
 from .forms import UserProfileForm, CampaignForm, ApplicationForm, ContentForm
+from .pagination import paginate_keyset, paginate_offset
+from .search import search_campaigns
+from .cache import cache_public_page
+from .auth import advertiser_required, creator_required, get_profile, role_required
+from .jobs import enqueue
+from . import api, khalti, rates, view_history
+from .metrics import registry
 import json
+from datetime import timedelta
 from decimal import Decimal
 from django.views.decorators.csrf import csrf_exempt
 from .models import Plan
 
 
-#Replace with your khalti secret key
-KHALTI_SECRET_KEY="YOUR_SECRET_KEY"
-KHALTI_VERIFY_URL="https://khalti.com/api/v2/epayment/"
-
+@cache_public_page('home')
 def home(request):
     """Home page with platform introduction"""
     return render(request, 'main/home.html')
@@ -84,123 +94,164 @@ def guest_login(request):
 
 @login_required
 def my_applications(request):
-    applications = Application.objects.filter(creator=request.user.userprofile)
-
+    applications = Application.objects.filter(creator=request.user.userprofile).select_related('campaign')
     
     if request.method == 'POST':
         app_id = request.POST.get('application_id')
         action = request.POST.get('action')  # "accept" or "decline"
         application = get_object_or_404(Application, id=app_id, creator=request.user.userprofile)
         if action == 'accept':
-            application.status = 'accepted'
+            application.set_status('accepted')
         elif action == 'decline':
-            application.status = 'declined'
-        application.save()
+            application.set_status('declined')
         return redirect('my_applications')  # redirect to same page after response
 
-    return render(request, 'main/my_applications.html', {'applications': applications})
+    page = paginate_keyset(request, applications, field='applied_at')
+    return render(request, 'main/my_applications.html', {'applications': page.object_list, 'page': page})
 
-@login_required
+@role_required('advertiser', 'Access denied.')
 def advertiser_applications(request):
-    profile = request.user.userprofile
-    if profile.user_type != 'advertiser':
-        messages.error(request, 'Access denied.')
-        return redirect('dashboard')
-    
     # Get all applications related to this advertiser's campaigns
-    applications = Application.objects.filter(campaign__advertiser=profile).order_by('-applied_at')
+    applications = Application.objects.filter(campaign__advertiser=request.profile).select_related('campaign', 'creator__user')
     
     if request.method == 'POST':
-        app_id = request.POST.get('application_id')
-        action = request.POST.get('action')  # "approve" or "reject"
-        application = get_object_or_404(Application, id=app_id, campaign__advertiser=profile)
-        
-        if action == 'approve':
-            application.status = 'approved'
-        elif action == 'reject':
-            application.status = 'rejected'
-        application.save()
-        return redirect('advertiser_applications')
+        return _set_application_statuses(request, applications)
     
-    return render(request, 'main/advertiser_applications.html', {'applications': applications})
+    page = paginate_keyset(request, applications, field='applied_at')
+    return render(request, 'main/advertiser_applications.html', {'applications': page.object_list, 'page': page})
+
+
+BULK_STATUS_ACTIONS = {'approve': 'approved', 'reject': 'rejected'}
 
+def _set_application_statuses(request, applications):
+    """Apply an approve/reject action to every selected application in one UPDATE
+    
+    The form posts one application_id per selected application. Requests sent with
+    X-Requested-With: XMLHttpRequest get a JSON answer so the page updates in place;
+    plain form posts are redirected back to the list.
+    """
+    partial = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+    status = BULK_STATUS_ACTIONS.get(request.POST.get('action'))
+    try:
+        ids = {int(value) for value in request.POST.getlist('application_id')}
+    except ValueError:
+        ids = set()
+    
+    error = None
+    if status is None:
+        error = 'Unknown action'
+    elif not ids:
+        error = 'Select at least one application'
+    elif len(ids) > BULK_UPDATE_MAX_ITEMS:
+        error = f'At most {BULK_UPDATE_MAX_ITEMS} applications per action'
+    else:
+        try:
+            # Other advertisers' applications are excluded by the queryset's campaign filter
+            updated = applications.filter(pk__in=ids).set_status(status)
+        except ValidationError as e:
+            error = e.messages[0]
+    
+    if partial:
+        if error:
+            return JsonResponse({'success': False, 'error': error})
+        return JsonResponse({'success': True, 'status': status, 'updated': sorted(updated)})
+    if error:
+        messages.error(request, error)
+    else:
+        messages.success(request, f'{len(updated)} application(s) {status}.')
+    return redirect('advertiser_applications')
 
 @login_required
 def dashboard(request):
-    """Main dashboard - redirects based on user type"""
-    try:
-        profile = request.user.userprofile
-        if profile.user_type == 'advertiser':
-            return redirect('advertiser_dashboard')
-        elif profile.user_type == 'creator':
-            return redirect('creator_dashboard')
-        else:
-            return redirect('campaigns')
-    except UserProfile.DoesNotExist:
+    """Main dashboard - renders the advertiser or creator dashboard in place, without a redirect"""
+    profile = get_profile(request)
+    if profile is None:
         # Create profile if it doesn't exist
-        profile = UserProfile.objects.create(user=request.user, user_type='guest')
+        UserProfile.objects.create(user=request.user, user_type='guest')
+        return redirect('campaigns')
+    if profile.user_type == 'advertiser':
+        return advertiser_dashboard(request)
+    elif profile.user_type == 'creator':
+        return creator_dashboard(request)
+    else:
         return redirect('campaigns')
 
-@login_required
+@advertiser_required
 def advertiser_dashboard(request):
     """Dashboard for advertisers"""
-    try:
-        profile = request.user.userprofile
-        if profile.user_type != 'advertiser':
-            messages.error(request, 'Access denied. Advertiser account required.')
-            return redirect('dashboard')
-        
-        campaigns = Campaign.objects.filter(advertiser=profile).order_by('-created_at')
-        total_campaigns = campaigns.count()
-        active_campaigns = campaigns.filter(status='active').count()
-        total_applications = Application.objects.filter(campaign__advertiser=profile).count()
-        
-        context = {
-            'profile': profile,
-            'campaigns': campaigns,
-            'total_campaigns': total_campaigns,
-            'active_campaigns': active_campaigns,
-            'total_applications': total_applications,
-        }
-        return render(request, 'main/advertiser_dashboard.html', context)
-    except UserProfile.DoesNotExist:
-        messages.error(request, 'Profile not found.')
-        return redirect('home')
+    profile = request.profile
+    campaigns = Campaign.objects.filter(advertiser=profile)
+    campaign_stats = campaigns.aggregate(
+        total=Count('id'), active=Count('id', filter=Q(status='active')), average_cpm=Avg('cpm_paisa')
+    )
+    total_applications = Application.objects.filter(campaign__advertiser=profile).count()
+    page = paginate_keyset(request, campaigns.with_stats())
+    
+    context = {
+        'profile': profile,
+        'campaigns': page.object_list,
+        'page': page,
+        'total_campaigns': campaign_stats['total'],
+        'active_campaigns': campaign_stats['active'],
+        'average_cpm': rates.to_rupees(round(campaign_stats['average_cpm'] or rates.DEFAULT_CPM_PAISA)),
+        'total_applications': total_applications,
+    }
+    return render(request, 'main/advertiser_dashboard.html', context)
 
-@login_required
+@creator_required
 def creator_dashboard(request):
     """Dashboard for creators"""
-    try:
-        profile = request.user.userprofile
-        if profile.user_type != 'creator':
-            messages.error(request, 'Access denied. Creator account required.')
-            return redirect('dashboard')
-        
-        applications = Application.objects.filter(creator=request.user.userprofile)
-        contents = Content.objects.filter(creator=profile).order_by('-created_at')
-        
-        # Calculate total earnings from both content and applications using the new formula
-        content_earnings = sum(content.calculate_earnings() for content in contents)
-        application_earnings = sum(app.calculate_earnings() for app in applications)
-        total_earnings = content_earnings + application_earnings
-        
-        # Calculate total views from both content and applications
-        content_views = contents.aggregate(Sum('views'))['views__sum'] or 0
-        application_views = applications.aggregate(Sum('views'))['views__sum'] or 0
-        total_views = content_views + application_views
-        
-        context = {
-            'profile': profile,
-            'applications': applications,
-            'contents': contents,
-            'total_earnings': total_earnings,
-            'total_views': total_views,
-        }
-        return render(request, 'main/creator_dashboard.html', context)
-    except UserProfile.DoesNotExist:
-        messages.error(request, 'Profile not found.')
-        return redirect('home')
+    profile = request.profile
+    applications = Application.objects.filter(creator=profile).prefetch_related(
+        Prefetch('campaign', queryset=Campaign.objects.with_stats())
+    )
+    contents = Content.objects.filter(creator=profile)
+    
+    # Counts, views and earnings (in paisa, at each campaign's rate) summed in the database
+    content_stats = contents.aggregate(
+        count=Count('id'),
+        views_sum=Sum('views'),
+        earnings_sum=Sum(rates.EarningsPaisa(
+            F('views'), Coalesce(F('campaign__cpm_paisa'), Value(rates.DEFAULT_CPM_PAISA))
+        )),
+    )
+    application_stats = applications.aggregate(
+        count=Count('id'),
+        views_sum=Sum('views'),
+        earnings_sum=Sum(rates.EarningsPaisa(F('views'), F('campaign__cpm_paisa'))),
+    )
+    total_earnings = rates.to_rupees((content_stats['earnings_sum'] or 0) + (application_stats['earnings_sum'] or 0))
+    total_views = (content_stats['views_sum'] or 0) + (application_stats['views_sum'] or 0)
+    
+    # Two weeks of daily gains, from the creator's rollup rows
+    history = view_history.creator_daily_views(profile, timezone.localdate() - timedelta(days=13))
+    growth = view_history.growth_rate(history)
+    
+    content_page = paginate_keyset(request, contents, param='content_cursor')
+    application_page = paginate_keyset(request, applications, field='applied_at', param='application_cursor')
+    # Each listed item's week-on-week growth, from its compacted view history
+    for target, page in (('content', content_page), ('application', application_page)):
+        rates_by_id = view_history.growth_rates(target, [item.pk for item in page.object_list])
+        for item in page.object_list:
+            rate = rates_by_id[item.pk]
+            item.view_growth = rate * 100 if rate is not None else None
+    
+    context = {
+        'profile': profile,
+        'applications': application_page.object_list,
+        'application_page': application_page,
+        'application_count': application_stats['count'],
+        'contents': content_page.object_list,
+        'content_page': content_page,
+        'content_count': content_stats['count'],
+        'total_earnings': total_earnings,
+        'total_views': total_views,
+        'views_yesterday': history[-2][1],
+        'view_growth': growth * 100 if growth is not None else None,
+    }
+    return render(request, 'main/creator_dashboard.html', context)
 
+@cache_public_page('carousel')
 def carousel(request):
     return render(request, 'main/carousel.html')
 
@@ -208,160 +259,267 @@ def carousel(request):
      
 #      return render(request, 'main/explore.html')
 
+@cache_public_page('explore')
 def Plans(request):
     plans=Plan.objects.all()
     return render(request,'main/explore.html',{'plans':plans})
 
+@cache_public_page('campaigns')
 def campaigns(request):
-    """Public campaigns page"""
-    campaigns = Campaign.objects.filter(is_public=True, status='active').order_by('-created_at')
-    
-    # Check if user is logged in and has a profile
-    user_profile = None
-    if request.user.is_authenticated:
-        try:
-            user_profile = request.user.userprofile
-        except UserProfile.DoesNotExist:
-            pass
+    """Public campaigns page, with full-text search over active public campaigns"""
+    campaigns = Campaign.objects.filter(is_public=True, status='active')
+    query = request.GET.get('q', '').strip()
+    if query:
+        # Rank ids only, so the stats subquery runs for the page rather than for every match
+        page = paginate_offset(request, search_campaigns(campaigns, query).values_list('pk', flat=True))
+        found = Campaign.objects.with_stats().in_bulk(page.object_list)
+        page.object_list = [found[pk] for pk in page.object_list]
+    else:
+        page = paginate_keyset(request, campaigns.with_stats())
     
     context = {
-        'campaigns': campaigns,
-        'user_profile': user_profile,
+        'campaigns': page.object_list,
+        'page': page,
+        'query': query,
+        'user_profile': get_profile(request),
         'is_guest': request.session.get('guest_mode', False)
     }
     return render(request, 'main/campaigns.html', context)
 
-@login_required
+@role_required('advertiser', 'Only advertisers can create campaigns.')
 def create_campaign(request):
     """Create new campaign (advertisers only)"""
-    try:
-        profile = request.user.userprofile
-        if profile.user_type != 'advertiser':
-            messages.error(request, 'Only advertisers can create campaigns.')
-            return redirect('dashboard')
-        
-        if request.method == 'POST':
-            form = CampaignForm(request.POST)
-            if form.is_valid():
-                campaign = form.save(commit=False)
-                campaign.advertiser = profile
-                campaign.save()
-                messages.success(request, 'Campaign created successfully!')
-                return redirect('advertiser_dashboard')
-        else:
-            form = CampaignForm()
-        
-        return render(request, 'main/create_campaign.html', {'form': form})
-    except UserProfile.DoesNotExist:
-        messages.error(request, 'Profile not found.')
-        return redirect('home')
+    profile = request.profile
+    if request.method == 'POST':
+        form = CampaignForm(request.POST)
+        if form.is_valid():
+            campaign = form.save(commit=False)
+            campaign.advertiser = profile
+            campaign.save()
+            messages.success(request, 'Campaign created successfully!')
+            return redirect('advertiser_dashboard')
+    else:
+        form = CampaignForm()
+    
+    return render(request, 'main/create_campaign.html', {'form': form})
 
-@login_required
+@role_required('creator', 'Only creators can apply for campaigns.', redirect_to='campaigns')
 def apply_campaign(request, campaign_id):
     """Apply for a campaign (creators only)"""
-    try:
-        profile = request.user.userprofile
-        if profile.user_type != 'creator':
-            messages.error(request, 'Only creators can apply for campaigns.')
-            return redirect('campaigns')
-        
-        campaign = get_object_or_404(Campaign, id=campaign_id, is_public=True)
-        
-        # Check if already applied
-        if Application.objects.filter(creator=profile, campaign=campaign).exists():
-            messages.warning(request, 'You have already applied for this campaign.')
-            return redirect('campaigns')
-        
-        if request.method == 'POST':
-            form = ApplicationForm(request.POST)
-            if form.is_valid():
-                application = form.save(commit=False)
-                application.creator = profile
-                application.campaign = campaign
-                application.save()
-                messages.success(request, 'Application submitted successfully!')
-                return redirect('creator_dashboard')
-        else:
-            form = ApplicationForm()
-        
-        return render(request, 'main/apply_campaign.html', {
-            'form': form,
-            'campaign': campaign
-        })
-    except UserProfile.DoesNotExist:
-        messages.error(request, 'Profile not found.')
-        return redirect('home')
+    profile = request.profile
+    campaign = get_object_or_404(Campaign.objects.with_stats(), id=campaign_id, is_public=True)
+    
+    # Check if already applied
+    if Application.objects.filter(creator=profile, campaign=campaign).exists():
+        messages.warning(request, 'You have already applied for this campaign.')
+        return redirect('campaigns')
+    
+    if request.method == 'POST':
+        form = ApplicationForm(request.POST)
+        if form.is_valid():
+            application = form.save(commit=False)
+            application.creator = profile
+            application.campaign = campaign
+            try:
+                with transaction.atomic():
+                    application.save()
+            except IntegrityError:
+                # A concurrent submission won the unique (creator, campaign) constraint
+                messages.warning(request, 'You have already applied for this campaign.')
+                return redirect('campaigns')
+            messages.success(request, 'Application submitted successfully!')
+            return redirect('creator_dashboard')
+    else:
+        form = ApplicationForm()
+    
+    return render(request, 'main/apply_campaign.html', {
+        'form': form,
+        'campaign': campaign
+    })
 
-@login_required
+@role_required('creator', 'Only creators can add content.')
 def add_content(request):
     """Add new content (creators only)"""
-    try:
-        profile = request.user.userprofile
-        if profile.user_type != 'creator':
-            messages.error(request, 'Only creators can add content.')
-            return redirect('dashboard')
-        
-        if request.method == 'POST':
-            form = ContentForm(request.POST)
-            if form.is_valid():
-                content = form.save(commit=False)
-                content.creator = profile
+    profile = request.profile
+    if request.method == 'POST':
+        form = ContentForm(request.POST)
+        if form.is_valid():
+            content = form.save(commit=False)
+            content.creator = profile
+            content.earnings = content.calculate_earnings()
+            with transaction.atomic():
                 content.save()
-                messages.success(request, 'Content added successfully!')
-                return redirect('creator_dashboard')
-        else:
-            form = ContentForm()
-        
-        return render(request, 'main/add_content.html', {'form': form})
-    except UserProfile.DoesNotExist:
-        messages.error(request, 'Profile not found.')
-        return redirect('home')
+                UserProfile.add_to_totals(profile.id, views=content.views, earnings=content.earnings)
+                record_daily_stats(profile.id, views=content.views, earnings=content.earnings)
+                ViewEvent.record(content.views, content=content)
+            messages.success(request, 'Content added successfully!')
+            return redirect('creator_dashboard')
+    else:
+        form = ContentForm()
+    
+    return render(request, 'main/add_content.html', {'form': form})
 
+@cache_public_page('campaign_detail')
 def campaign_detail(request, campaign_id):
     """Campaign detail view - accessible to all users"""
-    campaign = get_object_or_404(Campaign, id=campaign_id, is_public=True)
-    
-    # Check if user is logged in and has a profile
-    user_profile = None
-    if request.user.is_authenticated:
-        try:
-            user_profile = request.user.userprofile
-        except UserProfile.DoesNotExist:
-            pass
+    campaign = get_object_or_404(
+        Campaign.objects.with_stats().select_related('advertiser__user'), id=campaign_id, is_public=True
+    )
     
     context = {
         'campaign': campaign,
-        'user_profile': user_profile,
+        'user_profile': get_profile(request),
         'is_guest': request.session.get('guest_mode', False)
     }
     return render(request, 'main/campaign_detail.html', context)
 
+def _api_response(data, status=200):
+    response = JsonResponse(data, status=status)
+    # Clients may keep the body, but must revalidate it with the ETag before each use
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+@require_safe
+@condition(etag_func=api.list_etag)
+def api_campaigns(request):
+    """Public campaigns as JSON, with ?fields=, ?q= search and cursor pagination as on the campaigns page
+
+    Unchanged polls are answered 304 by the condition decorator after one aggregate query.
+    """
+    try:
+        fields = api.selected_fields(request)
+    except ValueError as e:
+        return _api_response({'success': False, 'error': str(e)}, status=400)
+
+    campaigns = Campaign.objects.filter(api.LISTED).only(*api.columns(fields))
+    query = request.GET.get('q', '').strip()
+    if query:
+        page = paginate_offset(request, search_campaigns(campaigns, query).values_list('pk', flat=True))
+        found = campaigns.in_bulk(page.object_list)
+        page.object_list = [found[pk] for pk in page.object_list]
+    else:
+        page = paginate_keyset(request, campaigns)
+
+    return _api_response({
+        'success': True,
+        'campaigns': [api.serialize(campaign, fields) for campaign in page.object_list],
+        'next': page.next_query,
+        'previous': page.previous_query,
+    })
+
+@require_safe
+@condition(etag_func=api.detail_etag, last_modified_func=api.detail_last_modified)
+def api_campaign_detail(request, campaign_id):
+    """One public campaign as JSON, with ?fields= selection; its single query also yields the validator"""
+    try:
+        fields = api.selected_fields(request)
+    except ValueError as e:
+        return _api_response({'success': False, 'error': str(e)}, status=400)
+
+    campaign = api.detail_campaign(request, campaign_id)
+    if campaign is None:
+        return _api_response({'success': False, 'error': 'Campaign not found'}, status=404)
+    return _api_response({'success': True, 'campaign': api.serialize(campaign, fields)})
+
+
+
+# Days of history shown on the analytics page and the leaderboard periods; both read only rollups
+ANALYTICS_DAYS = 30
+TOP_CREATORS = 10
+LEADERBOARD_PERIODS = {'7d': 7, '30d': 30}
+LEADERBOARD_SIZE = 25
+# Rollups change with every view update, so the cached leaderboard simply expires
+LEADERBOARD_CACHE_TIMEOUT = 60
+
+@advertiser_required
+def campaign_analytics(request, campaign_id):
+    """Daily views, spend curve and top creators for one of the advertiser's campaigns"""
+    campaign = get_object_or_404(Campaign, id=campaign_id, advertiser=request.profile)
+    today = timezone.localdate()
+    since = today - timedelta(days=ANALYTICS_DAYS - 1)
+    stats = {row.date: row for row in CampaignDailyStats.objects.filter(campaign=campaign, date__gte=since)}
+    
+    # The spend curve ends at the ledger's current total, so it starts at what was spent before the window
+    window_spend = sum((row.spend for row in stats.values()), Decimal('0.00'))
+    cumulative = campaign.spent - window_spend
+    peak_views = max([row.views for row in stats.values()] + [1])
+    days = []
+    for offset in range(ANALYTICS_DAYS):
+        date = since + timedelta(days=offset)
+        row = stats.get(date)
+        views, spend = (row.views, row.spend) if row else (0, Decimal('0.00'))
+        cumulative += spend
+        days.append({
+            'date': date,
+            'views': views,
+            'spend': spend,
+            'cumulative_spend': cumulative,
+            'bar_width': max(views, 0) * 100 // peak_views,
+        })
+    
+    top_creators = (
+        CreatorDailyStats.objects.filter(campaign=campaign, date__gte=since)
+        .values('creator', 'creator__user__username', 'creator__tiktok_handle')
+        .annotate(total_views=Sum('views'), total_earnings=Sum('earnings'))
+        .order_by('-total_views', 'creator')[:TOP_CREATORS]
+    )
+    
+    context = {
+        'campaign': campaign,
+        'days': days,
+        'window_days': ANALYTICS_DAYS,
+        'window_views': sum(day['views'] for day in days),
+        'window_spend': window_spend,
+        'top_creators': top_creators,
+    }
+    return render(request, 'main/campaign_analytics.html', context)
+
+@cache_public_page('leaderboard', timeout=LEADERBOARD_CACHE_TIMEOUT)
+def leaderboard(request):
+    """Creators with the most views over the last 7 or 30 days"""
+    period = request.GET.get('period')
+    if period not in LEADERBOARD_PERIODS:
+        period = '7d'
+    since = timezone.localdate() - timedelta(days=LEADERBOARD_PERIODS[period] - 1)
+    creators = (
+        CreatorDailyStats.objects.filter(date__gte=since)
+        .values('creator', 'creator__user__username', 'creator__tiktok_handle')
+        .annotate(total_views=Sum('views'))
+        .filter(total_views__gt=0)
+        .order_by('-total_views', 'creator')[:LEADERBOARD_SIZE]
+    )
+    context = {
+        'creators': creators,
+        'period': period,
+        'periods': list(LEADERBOARD_PERIODS),
+    }
+    return render(request, 'main/leaderboard.html', context)
+
 
+# Delay before a creator's totals are re-checked against the raw rows; bursts share one job
+PROFILE_RECONCILE_DELAY = 60
+
+def _queue_profile_reconcile(profile_id):
+    enqueue(
+        'reconcile_profile_totals',
+        {'profile_id': profile_id},
+        dedupe_key=f'reconcile_profile_totals:{profile_id}',
+        delay=PROFILE_RECONCILE_DELAY,
+    )
 
 @require_POST
 @login_required
 def update_views(request, content_id):
     """Update content views and earnings (AJAX)"""
     try:
-        content = get_object_or_404(Content, id=content_id, creator__user=request.user)
+        content = get_object_or_404(Content.objects.select_related('campaign'), id=content_id, creator__user=request.user)
         data = json.loads(request.body)
         new_views = int(data.get('views', 0))
         
         if new_views >= 0:
-            content.views = new_views
-            content.earnings = content.calculate_earnings()
-            content.save()
-            
-            # Update creator's total views and earnings from both Content and Application
-            profile = request.user.userprofile
-            total_content_views = Content.objects.filter(creator=profile).aggregate(Sum('views'))['views__sum'] or 0
-            total_content_earnings = Content.objects.filter(creator=profile).aggregate(Sum('earnings'))['earnings__sum'] or 0
-            approved_applications = Application.objects.filter(creator=profile, status='approved')
-            total_app_views = approved_applications.aggregate(Sum('views'))['views__sum'] or 0
-            total_app_earnings = approved_applications.aggregate(Sum('earnings'))['earnings__sum'] or 0
-            profile.total_views = total_content_views + total_app_views
-            profile.total_earnings = total_content_earnings + total_app_earnings
-            profile.save()
+            # Saves the content and applies the change to the creator's totals
+            content.update_views_and_earnings(new_views)
+            _queue_profile_reconcile(content.creator_id)
             
             return JsonResponse({
                 'success': True,
@@ -381,7 +539,9 @@ def update_application_views(request, application_id):
     """Update application views and earnings with budget validation (AJAX)"""
     try:
         # Get application and validate ownership
-        application = get_object_or_404(Application, id=application_id, creator__user=request.user)
+        application = get_object_or_404(
+            Application.objects.select_related('campaign'), id=application_id, creator__user=request.user
+        )
 
         # Parse request data
         data = json.loads(request.body)
@@ -404,17 +564,7 @@ def update_application_views(request, application_id):
             new_earnings = application.update_views_and_earnings(new_views)
         except ValidationError as e:
             return JsonResponse({'success': False, 'error': str(e)})
-
-        # Update creator's total views and earnings from both Content and Application
-        profile = request.user.userprofile
-        total_content_views = Content.objects.filter(creator=profile).aggregate(Sum('views'))['views__sum'] or 0
-        total_content_earnings = Content.objects.filter(creator=profile).aggregate(Sum('earnings'))['earnings__sum'] or 0
-        approved_applications = Application.objects.filter(creator=profile, status='approved')
-        total_app_views = approved_applications.aggregate(Sum('views'))['views__sum'] or 0
-        total_app_earnings = approved_applications.aggregate(Sum('earnings'))['earnings__sum'] or 0
-        profile.total_views = total_content_views + total_app_views
-        profile.total_earnings = total_content_earnings + total_app_earnings
-        profile.save()
+        _queue_profile_reconcile(application.creator_id)
 
         # Get updated campaign budget
         campaign = application.campaign
@@ -438,34 +588,205 @@ def update_application_views(request, application_id):
         return JsonResponse({'success': False, 'error': f'Unexpected error: {str(e)}'})
 
 
-@csrf_exempt
-def verify_khalti_payment(request):
-    if request.method == "POST":
+BULK_UPDATE_MAX_ITEMS = 500
+
+@require_POST
+@login_required
+def update_views_bulk(request):
+    """Update views for many contents/applications in one request (AJAX)
+    
+    Expects a JSON array of {"type": "content" | "application", "id": ..., "views": ...}
+    and returns one result per entry, in the same order.
+    """
+    try:
+        entries = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'error': 'Invalid data format'})
+    if not isinstance(entries, list):
+        return JsonResponse({'success': False, 'error': 'Expected a list of updates'})
+    if len(entries) > BULK_UPDATE_MAX_ITEMS:
+        return JsonResponse({'success': False, 'error': f'At most {BULK_UPDATE_MAX_ITEMS} updates per request'})
+    
+    profile = request.user.userprofile
+    results = [None] * len(entries)
+    parsed = []
+    for index, entry in enumerate(entries):
         try:
-            payload =json.loads(request.body)
-
-            response = requests.post(
-                KHALTI_VERIFY_URL,
-                json={
-                    'token': payload.get("token"),
-                    'amount':payload.get("amount")
-
-                },
-                headers={
-                    'Authorization':f'Bearer{KHALTI_SECRET_KEY}',
-                    'Content-Type':'application/json'
-                }
-            )
-            verification_data = response.json()
-
-            if response.status_code == 200 and verification_data.get('status') == 'success':
-                return JsonResponse({"success":True})
-            else:
-                return JsonResponse({"success":False},status=400)
+            kind = entry['type']
+            object_id = int(entry['id'])
+            new_views = int(entry['views'])
+        except (KeyError, TypeError, ValueError):
+            results[index] = {'success': False, 'error': 'Invalid data'}
+            continue
+        if kind not in ('content', 'application'):
+            results[index] = {'success': False, 'error': 'Unknown type'}
+        elif new_views < 0:
+            results[index] = {'success': False, 'error': 'Views must be non-negative'}
+        else:
+            parsed.append((index, kind, object_id, new_views))
+    
+    changed_contents = {}
+    changed_applications = {}
+    campaigns = {}
+    # Spend requested in this batch, and the entries it pays for, per campaign
+    campaign_spend = {}
+    campaign_entries = {}
+    views_delta, earnings_delta = 0, Decimal('0.00')
+    content_views_delta, content_earnings_delta = 0, Decimal('0.00')
+    view_events = []
+    with transaction.atomic():
+        # Ownership is enforced by the creator filter: one query per object type. Both are
+        # locked so view and earnings deltas are taken against current values.
+        content_ids = {object_id for _, kind, object_id, _ in parsed if kind == 'content'}
+        application_ids = {object_id for _, kind, object_id, _ in parsed if kind == 'application'}
+        contents = (
+            Content.objects.filter(id__in=content_ids, creator=profile)
+            .select_related('campaign').select_for_update(of=('self',)).in_bulk()
+            if content_ids else {}
+        )
+        applications = (
+            Application.objects.filter(id__in=application_ids, creator=profile)
+            .select_related('campaign').select_for_update(of=('self',)).in_bulk()
+            if application_ids else {}
+        )
+        
+        for index, kind, object_id, new_views in parsed:
+            if kind == 'content':
+                content = contents.get(object_id)
+                if content is None:
+                    results[index] = {'success': False, 'error': 'Content not found'}
+                    continue
+                old_views, old_earnings = content.views, content.earnings
+                content.views = new_views
+                content.earnings = content.calculate_earnings()
+                content_views_delta += content.views - old_views
+                if content.views != old_views:
+                    view_events.append(ViewEvent(content=content, delta=content.views - old_views))
+                content_earnings_delta += content.earnings - old_earnings
+                changed_contents[content.id] = content
+                results[index] = {'success': True, 'views': content.views, 'earnings': float(content.earnings)}
+                continue
             
-        except Exception as e:
-            return JsonResponse({"success":False,"error":str(e)},status=400)
+            application = applications.get(object_id)
+            if application is None:
+                results[index] = {'success': False, 'error': 'Application not found'}
+                continue
+            if application.status != 'approved':
+                results[index] = {'success': False, 'error': 'Can only update views for approved applications'}
+                continue
+            campaign = campaigns.setdefault(application.campaign_id, application.campaign)
+            old_views, old_earnings = application.views, application.earnings
+            application.views = new_views
+            application.earnings = application.calculate_earnings()
+            increase = application.earnings - old_earnings
+            requested = campaign_spend.get(campaign.id, Decimal('0.00'))
+            if increase > 0 and campaign.remaining - requested < increase:
+                application.views, application.earnings = old_views, old_earnings
+                results[index] = {'success': False, 'error': 'Campaign budget insufficient to pay the earnings increase'}
+                continue
+            campaign_spend[campaign.id] = requested + increase
+            campaign_entries.setdefault(campaign.id, []).append((index, application, old_views, old_earnings))
+            results[index] = {
+                'success': True,
+                'views': application.views,
+                'earnings': float(application.earnings),
+                'campaign_id': campaign.id,
+            }
+        
+        # The remaining figures read above may already be stale; the conditional UPDATE decides
+        for campaign_id, spend in campaign_spend.items():
+            campaign = campaigns[campaign_id]
+            if spend > 0 and not campaign.spend_within_budget(spend):
+                for index, application, old_views, old_earnings in reversed(campaign_entries[campaign_id]):
+                    application.views, application.earnings = old_views, old_earnings
+                    results[index] = {
+                        'success': False,
+                        'error': 'Campaign budget insufficient to pay the earnings increase',
+                    }
+                continue
+            if spend < 0:
+                campaign.record_spend(spend)
+            # An application listed more than once moves from the views it had before its first entry
+            first_views = {}
+            for _, application, old_views, _ in campaign_entries[campaign_id]:
+                first_views.setdefault(application.id, (application, old_views))
+            campaign_views = 0
+            for application, old_views in first_views.values():
+                campaign_views += application.views - old_views
+                changed_applications[application.id] = application
+                if application.views != old_views:
+                    view_events.append(ViewEvent(application=application, delta=application.views - old_views))
+            record_daily_stats(profile.id, campaign_id, views=campaign_views, earnings=spend)
+            views_delta += campaign_views
+            earnings_delta += spend
+        
+        if changed_contents:
+            Content.objects.bulk_update(changed_contents.values(), ['views', 'earnings'])
+        if changed_applications:
+            now = timezone.now()
+            for application in changed_applications.values():
+                application.updated_at = now
+            Application.objects.bulk_update(changed_applications.values(), ['views', 'earnings', 'updated_at'])
+        record_daily_stats(profile.id, views=content_views_delta, earnings=content_earnings_delta)
+        ViewEvent.objects.bulk_create(view_events)
+        UserProfile.add_to_totals(
+            profile.id, views=views_delta + content_views_delta, earnings=earnings_delta + content_earnings_delta
+        )
+    if changed_applications:
+        # bulk_update and the ledger's F() updates don't send post_save
+        enqueue(
+            'invalidate_pages',
+            {'pages': ['campaigns', 'campaign_detail']},
+            dedupe_key='invalidate_pages:application',
+        )
+    if changed_contents or changed_applications:
+        _queue_profile_reconcile(profile.id)
+    
+    for result in results:
+        if result.get('campaign_id') in campaigns:
+            result['remaining_budget'] = float(campaigns[result['campaign_id']].remaining)
     
-    return JsonResponse({"success":False},status=400)
+    return JsonResponse({'success': True, 'results': results})
+
+
+@csrf_exempt
+async def verify_khalti_payment(request):
+    """Verify a Khalti payment without tying up a worker while Khalti responds
+    
+    Verification is idempotent per token: repeats of a verified token are answered locally.
+    """
+    if request.method != "POST":
+        return JsonResponse({"success": False}, status=400)
+    
+    try:
+        payload = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({"success": False, "error": "Invalid data format"}, status=400)
+    
+    token = payload.get("token")
+    try:
+        amount = int(payload.get("amount"))
+    except (TypeError, ValueError):
+        amount = None
+    if not token or amount is None or amount <= 0:
+        return JsonResponse({"success": False, "error": "Token and amount are required"}, status=400)
+    
+    user = await request.auser()
+    try:
+        verified = await khalti.verify_payment_once(token, amount, user.pk if user.is_authenticated else None)
+    except khalti.KhaltiUnavailable as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=503)
     
-    
\ No newline at end of file
+    if verified:
+        return JsonResponse({"success": True})
+    return JsonResponse({"success": False}, status=400)
+
+
+def metrics(request):
+    """Request metrics in Prometheus text format, for staff users or a METRICS_TOKEN bearer"""
+    token = settings.METRICS_TOKEN
+    authorization = request.headers.get('Authorization', '')
+    has_token = bool(token) and constant_time_compare(authorization, f'Bearer {token}')
+    if not has_token and not request.user.is_staff:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,66 @@
+"""The cache shared by the web and worker processes, selected with environment variables
+
+    REDIS_URL   Redis at this URL, for deployments spanning several hosts
+    CACHE_DIR   otherwise, a directory of cache files shared by every process on the host
+                (default: cache/ next to manage.py)
+
+main/cache.py keeps page generations and rebuild locks in this cache, so it has to be one
+cache for all processes; per-process memory would leave every other process serving stale
+pages. FileCache is Django's file-based cache with an add() that is atomic across processes,
+which is what the rebuild lock relies on.
+
+Tests and benchmarks clear the cache freely, so they run on a temporary one instead; see
+neptok/testing.py.
+"""
+import os
+import tempfile
+from pathlib import Path
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+class FileCache(FileBasedCache):
+    """FileBasedCache whose add() only succeeds for one of several racing processes"""
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._createdir()
+        fname = self._key_to_file(key, version)
+        # Write the entry beside its final name, then link it into place: link() fails if the
+        # name exists, and readers never see a half-written file
+        fd, tmp_path = tempfile.mkstemp(dir=self._dir)
+        try:
+            with open(fd, 'wb') as f:
+                self._write_content(f, timeout, value)
+            # A second attempt covers an expired entry, which has_key() deletes
+            for _ in range(2):
+                try:
+                    os.link(tmp_path, fname)
+                    return True
+                except FileExistsError:
+                    if self.has_key(key, version):
+                        return False
+            return False
+        finally:
+            os.remove(tmp_path)
+
+
+def cache_config():
+    """Build the CACHES setting from the environment"""
+    if os.environ.get('REDIS_URL'):
+        default = {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    else:
+        default = {
+            'BACKEND': 'neptok.cache.FileCache',
+            'LOCATION': os.environ.get('CACHE_DIR') or BASE_DIR / 'cache',
+            # Every page variant is a file; culling would scan the directory on each set
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    return {'default': default}
+
@@ -0,0 +1,85 @@
+"""Database profiles, selected with the DB_PROFILE environment variable
+
+    sqlite-wal  (default) SQLite in WAL mode with tuned pragmas and IMMEDIATE transactions
+    sqlite      SQLite with Django's stock settings (rollback journal, deferred transactions),
+                kept as a baseline for `manage.py bench_db`
+    postgres    PostgreSQL, configured with DB_NAME, DB_USER, DB_PASSWORD, DB_HOST and DB_PORT
+
+DB_CONN_MAX_AGE sets how long connections persist between requests (seconds, default 60;
+0 closes them after every request). SQLite pragmas are applied to each new connection by
+apply_sqlite_pragmas(), which main.apps connects to connection_created.
+"""
+import os
+from pathlib import Path
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+SQLITE_WAL_PRAGMAS = {
+    'journal_mode': 'WAL',
+    # Durable across application crashes; only an OS crash can lose the last commits
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+    'mmap_size': 128 * 1024 * 1024,
+    # Negative values are KiB, so this is a 64 MiB page cache per connection
+    'cache_size': -64000,
+    'temp_store': 'MEMORY',
+}
+
+PROFILES = ('sqlite-wal', 'sqlite', 'postgres')
+
+
+def database_config(profile=None, name=None):
+    """Build a DATABASES entry for the given profile, defaulting to DB_PROFILE"""
+    profile = profile or os.environ.get('DB_PROFILE', 'sqlite-wal')
+    conn_max_age = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+    sqlite_name = name or os.environ.get('DB_NAME') or BASE_DIR / 'db.sqlite3'
+    # A file, not shared-cache memory, so threaded tests see real SQLite locking
+    sqlite_test = {'NAME': BASE_DIR / 'test_db.sqlite3'}
+
+    if profile == 'postgres':
+        return {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': name or os.environ.get('DB_NAME', 'neptok'),
+            'USER': os.environ.get('DB_USER', 'neptok'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            'CONN_MAX_AGE': conn_max_age,
+            'CONN_HEALTH_CHECKS': conn_max_age > 0,
+        }
+
+    if profile == 'sqlite':
+        return {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': sqlite_name,
+            'CONN_MAX_AGE': conn_max_age,
+            'TEST': sqlite_test,
+        }
+
+    if profile == 'sqlite-wal':
+        return {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': sqlite_name,
+            'OPTIONS': {
+                # Take the write lock at BEGIN, so read-then-write transactions queue on the busy
+                # timeout instead of failing with "database is locked" when they upgrade
+                'transaction_mode': 'IMMEDIATE',
+            },
+            'CONN_MAX_AGE': conn_max_age,
+            'CONN_HEALTH_CHECKS': conn_max_age > 0,
+            'PRAGMAS': SQLITE_WAL_PRAGMAS,
+            'TEST': sqlite_test,
+        }
+
+    raise ValueError(f'Unknown DB_PROFILE {profile!r}; expected one of {", ".join(PROFILES)}')
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """connection_created receiver applying the profile's PRAGMAS to new SQLite connections"""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = connection.settings_dict.get('PRAGMAS') or {}
+    with connection.cursor() as cursor:
+        for pragma, value in pragmas.items():
+            cursor.execute(f'PRAGMA {pragma} = {value}')
@@ -13,6 +13,9 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 from pathlib import Path
 import os
 
+from .cache import cache_config
+from .db import database_config
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -43,6 +46,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'main.middleware.StaticAssetsMiddleware',
+    'main.middleware.RequestMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -55,7 +60,8 @@ ROOT_URLCONF = 'neptok.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates with render timing for the request metrics
+        'BACKEND': 'main.metrics.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -75,14 +81,19 @@ WSGI_APPLICATION = 'neptok.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Profiles (SQLite WAL, stock SQLite, PostgreSQL) are chosen with DB_PROFILE; see neptok/db.py
+
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_config(),
 }
 
 
+# One cache for the web and worker processes; see neptok/cache.py
+CACHES = cache_config()
+# Tests run on a temporary cache; see neptok/testing.py
+TEST_RUNNER = 'neptok.testing.TestRunner'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -119,13 +130,58 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR,'static')]
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+STATICFILES_FINDERS = [
+    'django.contrib.staticfiles.finders.FileSystemFinder',
+    'django.contrib.staticfiles.finders.AppDirectoriesFinder',
+    # The CSS and JS that manage.py build_assets moves out of the templates
+    'main.assets.BuildFinder',
+]
+
+# manage.py build_assets writes templates without their inline CSS and JS to ASSET_BUILD_DIR and
+# collects hashed, precompressed static files into STATIC_ROOT. USE_BUILT_ASSETS serves both.
+ASSET_BUILD_DIR = BASE_DIR / 'build'
+USE_BUILT_ASSETS = os.environ.get('USE_BUILT_ASSETS') == '1'
+# Cache lifetime of static files without a content hash in their name
+STATIC_MAX_AGE = 60
+if USE_BUILT_ASSETS:
+    TEMPLATES[0]['DIRS'] = [ASSET_BUILD_DIR / 'templates']
+    STORAGES = {
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'main.assets.PrecompressedManifestStaticFilesStorage'},
+    }
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Guest sessions live in signed cookies, logged-in sessions in the database; see main/sessions.py
+SESSION_ENGINE = 'main.sessions'
+
+# Request users are loaded with their UserProfile in the same query; see main/auth.py.
+# ModelBackend stays listed so sessions that recorded it as their backend remain valid.
+AUTHENTICATION_BACKENDS = ['main.auth.ProfileBackend', 'django.contrib.auth.backends.ModelBackend']
+
 # Login/Logout URLs
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/dashboard/'
 LOGOUT_REDIRECT_URL = '/'
+
+# Khalti payment verification
+KHALTI_SECRET_KEY = os.environ.get('KHALTI_SECRET_KEY', 'YOUR_SECRET_KEY')
+KHALTI_VERIFY_URL = os.environ.get('KHALTI_VERIFY_URL', 'https://khalti.com/api/v2/epayment/')
+KHALTI_CONNECT_TIMEOUT = 3
+KHALTI_READ_TIMEOUT = 10
+KHALTI_POOL_SIZE = 20
+KHALTI_MAX_RETRIES = 2
+KHALTI_RETRY_BACKOFF = 0.5
+KHALTI_BREAKER_THRESHOLD = 5
+KHALTI_BREAKER_RESET = 30
+
+# Request metrics, exposed in Prometheus text format at /metrics to staff or METRICS_TOKEN
+METRICS_ENABLED = True
+# Fraction of requests whose SQL and template time is measured and sent as Server-Timing
+METRICS_SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', 1.0))
+METRICS_SERVER_TIMING = True
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
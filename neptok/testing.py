@@ -0,0 +1,32 @@
+"""Test and benchmark setup that keeps off resources shared with running servers
+
+The tests and `manage.py bench_endpoints` clear the cache before measuring pages. Run on the
+configured cache, that would wipe the page cache and verified payment tokens of any server
+sharing it, so both swap in a temporary cache for their run.
+"""
+import tempfile
+from contextlib import ExitStack, contextmanager
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+@contextmanager
+def temporary_cache():
+    """Swap the default cache for a FileCache in a fresh temporary directory, removed afterwards"""
+    with tempfile.TemporaryDirectory(prefix='neptok-cache-') as directory:
+        with override_settings(CACHES={'default': {'BACKEND': 'neptok.cache.FileCache', 'LOCATION': directory}}):
+            yield
+
+
+class TestRunner(DiscoverRunner):
+    """The default test runner, on a temporary cache rather than the one servers share"""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._cache_stack = ExitStack()
+        self._cache_stack.enter_context(temporary_cache())
+
+    def teardown_test_environment(self, **kwargs):
+        self._cache_stack.close()
+        super().teardown_test_environment(**kwargs)